@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Path, Response
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional
 
 from app.services import LibraryService
-from app.db.session import get_db
-from app.schemas import BookCreate, BookUpdate, BookResponse
+from app.services.catalog_import import CatalogImporter, PARSERS, iter_lines
+from app.services.search import SearchService
+from app.db.session import get_db, get_read_db, read_session_factory
+from app.schemas import (
+    BookCreate, BookUpdate, BookResponse, BookPage, CatalogImportResult, BulkBookDelete, BulkBookDeleteResult,
+    BookSearchHit, BookSearchPage, SearchSuggestion
+)
 from app.models import Book
 
 router = APIRouter()
@@ -34,13 +42,103 @@ async def create_book(
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/available", response_model=List[BookResponse])
-async def list_available_books(
+@router.post("/import", response_model=CatalogImportResult)
+async def import_catalog(
+        request: Request,
+        format: Optional[str] = Query(None, pattern="^(csv|jsonl)$"),
+        db: AsyncSession = Depends(get_db)
+):
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "jsonl"
+    rows = PARSERS[format](iter_lines(request.stream()))
+    return await CatalogImporter(db).import_rows(rows)
+
+
+@router.post("/bulk-delete", response_model=BulkBookDeleteResult)
+async def delete_books_bulk(
+        request: BulkBookDelete,
         db: AsyncSession = Depends(get_db)
 ):
     service = LibraryService(db)
-    books = await service.get_available_books()
-    return [BookResponse.model_validate(b) for b in books]
+    return await service.delete_books_bulk(**request.model_dump())
+
+
+def _ndjson_books(request: Request, **params) -> StreamingResponse:
+    # Сессия открывается внутри генератора: зависимость get_read_db закрывается
+    # до того, как ответ будет отправлен
+    sessions = read_session_factory(request)
+
+    async def rows():
+        async with sessions() as db:
+            async for book in LibraryService(db).stream_books(**params):
+                yield json.dumps(book) + "\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+@router.get("/", response_model=BookPage)
+async def list_books(
+        request: Request,
+        cursor: int = Query(0, ge=0),
+        limit: int = Query(50, ge=1, le=500),
+        genre: Optional[str] = None,
+        author: Optional[str] = None,
+        title_prefix: Optional[str] = None,
+        stream: bool = False,
+        db: AsyncSession = Depends(get_read_db)
+):
+    filters = {"genre": genre, "author": author, "title_prefix": title_prefix}
+    if stream:
+        return _ndjson_books(request, after_id=cursor, **filters)
+
+    service = LibraryService(db)
+    books, next_cursor = await service.list_books(after_id=cursor, limit=limit, **filters)
+    return BookPage(items=[BookResponse.model_validate(b) for b in books], next_cursor=next_cursor)
+
+
+@router.get("/available", response_model=BookPage)
+async def list_available_books(
+        request: Request,
+        cursor: int = Query(0, ge=0),
+        limit: int = Query(50, ge=1, le=500),
+        genre: Optional[str] = None,
+        author: Optional[str] = None,
+        title_prefix: Optional[str] = None,
+        stream: bool = False,
+        db: AsyncSession = Depends(get_read_db)
+):
+    filters = {"genre": genre, "author": author, "title_prefix": title_prefix}
+    if stream:
+        return _ndjson_books(request, after_id=cursor, available_only=True, **filters)
+
+    service = LibraryService(db)
+    books, next_cursor = await service.get_available_books(after_id=cursor, limit=limit, **filters)
+    return BookPage(items=[BookResponse.model_validate(b) for b in books], next_cursor=next_cursor)
+
+
+@router.get("/search", response_model=BookSearchPage)
+async def search_books(
+        q: str = Query(..., min_length=1, max_length=200),
+        cursor: int = Query(0, ge=0),
+        limit: int = Query(20, ge=1, le=100),
+        available_only: bool = False,
+        db: AsyncSession = Depends(get_read_db)
+):
+    service = SearchService(db)
+    hits, next_cursor = await service.search(q, cursor=cursor, limit=limit, available_only=available_only)
+    return BookSearchPage(
+        items=[BookSearchHit.model_validate(hit, from_attributes=True) for hit in hits],
+        next_cursor=next_cursor
+    )
+
+
+@router.get("/autocomplete", response_model=List[SearchSuggestion])
+async def autocomplete_books(
+        q: str = Query(..., min_length=1, max_length=100),
+        limit: int = Query(10, ge=1, le=50),
+        db: AsyncSession = Depends(get_read_db)
+):
+    return await SearchService(db).autocomplete(q, limit=limit)
 
 
 @router.get("/{book_id}/rating")
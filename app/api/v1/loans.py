@@ -1,11 +1,116 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.services import LibraryService
-from app.schemas import LoanCreate, LoanResponse
-from app.db.session import get_db
+from app.services.overdue import OverdueService
+from app.schemas import (
+    LoanCreate, LoanResponse, BulkLoanCreate, BulkLoanReturn,
+    BulkCheckoutItem, BulkReturnItem, BulkCheckoutResponse, BulkReturnResponse,
+    OverdueLoanPage, ReaderOverduePage, HoldCreate, HoldResponse
+)
+from app.models import Loan
+from app.db.session import get_db, get_read_db
 
 router = APIRouter(tags=["loans"])
 
+
+# Маршруты /bulk объявлены раньше /{loan_id}/..., иначе "bulk" попадёт в loan_id
+@router.post("/bulk", response_model=BulkCheckoutResponse)
+async def create_loans_bulk(
+    cart: BulkLoanCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    service = LibraryService(db)
+    results = await service.create_loans_bulk(cart.reader_id, cart.book_ids, atomic=cart.atomic)
+    items = [
+        BulkCheckoutItem(book_id=book_id, loan=LoanResponse.model_validate(result))
+        if isinstance(result, Loan) else BulkCheckoutItem(book_id=book_id, error=result)
+        for book_id, result in results.items()
+    ]
+    succeeded = sum(1 for item in items if item.loan)
+    return BulkCheckoutResponse(succeeded=succeeded, failed=len(items) - succeeded, items=items)
+
+
+@router.put("/bulk/return", response_model=BulkReturnResponse)
+async def return_loans_bulk(
+    request: BulkLoanReturn,
+    db: AsyncSession = Depends(get_db)
+):
+    service = LibraryService(db)
+    results = await service.return_loans_bulk(request.loan_ids, atomic=request.atomic)
+    items = [
+        BulkReturnItem(loan_id=loan_id, loan=LoanResponse.model_validate(result))
+        if isinstance(result, Loan) else BulkReturnItem(loan_id=loan_id, error=result)
+        for loan_id, result in results.items()
+    ]
+    succeeded = sum(1 for item in items if item.loan)
+    return BulkReturnResponse(succeeded=succeeded, failed=len(items) - succeeded, items=items)
+
+
+@router.get("/overdue", response_model=OverdueLoanPage)
+async def list_overdue_loans(
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    as_of: Optional[date] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    items, next_cursor = await OverdueService(db).list_overdue(after_id=cursor, limit=limit, as_of=as_of)
+    return OverdueLoanPage(items=items, next_cursor=next_cursor)
+
+
+@router.get("/overdue/readers", response_model=ReaderOverduePage)
+async def overdue_by_reader(
+    reader_id: Optional[int] = None,
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    as_of: Optional[date] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    items, next_cursor = await OverdueService(db).reader_summaries(
+        reader_id=reader_id, after_reader_id=cursor, limit=limit, as_of=as_of
+    )
+    return ReaderOverduePage(items=items, next_cursor=next_cursor)
+
+
+@router.post("/holds", response_model=HoldResponse, status_code=201)
+async def place_hold(
+    request: HoldCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    service = LibraryService(db)
+    try:
+        return await service.place_hold(request.reader_id, request.book_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/holds", response_model=List[HoldResponse])
+async def list_holds(
+    reader_id: Optional[int] = None,
+    book_id: Optional[int] = None,
+    waiting_only: bool = True,
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_db)
+):
+    service = LibraryService(db)
+    return await service.list_holds(reader_id=reader_id, book_id=book_id, waiting_only=waiting_only, limit=limit)
+
+
+@router.delete("/holds/{hold_id}", status_code=204)
+async def cancel_hold(
+    hold_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    service = LibraryService(db)
+    try:
+        await service.cancel_hold(hold_id)
+        return Response(status_code=204)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @router.post("/", response_model=LoanResponse)
 async def create_loan(
     loan_data: LoanCreate,
@@ -3,7 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services import LibraryService
 from app.schemas import ReaderCreate, ReaderUpdate, ReaderResponse
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 
 router = APIRouter(tags=["readers"])
 
@@ -24,7 +24,7 @@ async def create_reader(
 @router.get("/{reader_id}", response_model=ReaderResponse)
 async def get_reader(
     reader_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     service = LibraryService(db)
     reader = await service.get_reader(reader_id)
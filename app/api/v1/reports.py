@@ -1,50 +1,101 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import FileResponse
+import os
+from datetime import date
+from typing import Optional
+
+from celery.result import AsyncResult
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.tasks.celery import generate_report_task
-from app.db.session import get_db
-from app.services.reports import ReportService
+from app.tasks.celery import celery, generate_report_task
+from app.db.session import get_read_db
+from app.services.reports import ReportService, geojson_report_path
 
 router = APIRouter(tags=["reports"])
 
 
+def report_window(
+        date_from: Optional[date] = Query(None, alias="from"),
+        date_to: Optional[date] = Query(None, alias="to"),
+        bucket: Optional[str] = Query(None, pattern="^(day|week|month)$")
+) -> dict:
+    """Окно по дате выдачи и шаг группировки для отчётов по истории займов."""
+    return {"date_from": date_from, "date_to": date_to, "bucket": bucket}
+
+
 @router.post("/geojson")
 async def trigger_geojson_report():
     task = generate_report_task.delay()
     return {"task_id": task.id}
 
 
+# Обращения к бэкенду результатов Celery блокирующие, поэтому обработчики
+# ниже синхронные и выполняются в пуле потоков
+@router.get("/geojson/{task_id}/status")
+def get_geojson_report_status(task_id: str):
+    result = AsyncResult(task_id, app=celery)
+    status = {"task_id": task_id, "status": result.state}
+    if result.state == "PROGRESS" and isinstance(result.info, dict):
+        status.update(result.info)
+    elif result.failed():
+        status["error"] = str(result.result)
+    return status
+
+
 @router.get("/geojson/{task_id}")
-async def get_geojson_report(task_id: str):
-    try:
-        return FileResponse(f"reports/geojson_{task_id}.geojson")
-    except FileNotFoundError:
-        return {"status": "Report not ready yet"}
+def get_geojson_report(task_id: str):
+    result = AsyncResult(task_id, app=celery)
+    if result.successful():
+        filename = result.result["filename"]
+    elif result.failed():
+        raise HTTPException(status_code=500, detail=f"Report generation failed: {result.result}")
+    else:
+        # Запись о задаче могла истечь в бэкенде результатов
+        filename = geojson_report_path(task_id)
+        if not os.path.exists(filename):
+            return JSONResponse(
+                status_code=202,
+                content={"status": "Report not ready yet", "state": result.state}
+            )
+
+    if not os.path.exists(filename):
+        raise HTTPException(status_code=404, detail="Report file not found")
+    return FileResponse(filename, media_type="application/geo+json")
 
 @router.get("/summary")
-async def summary(db: AsyncSession = Depends(get_db)):
+async def summary(db: AsyncSession = Depends(get_read_db)):
     return await ReportService(db).count_books_and_readers()
 
 @router.get("/books-by-readers")
-async def books_by_readers(db: AsyncSession = Depends(get_db)):
-    return await ReportService(db).books_taken_by_readers()
+async def books_by_readers(window: dict = Depends(report_window), db: AsyncSession = Depends(get_read_db)):
+    return await ReportService(db).books_taken_by_readers(**window)
 
 @router.get("/books-on-hands")
-async def books_on_hands(db: AsyncSession = Depends(get_db)):
+async def books_on_hands(db: AsyncSession = Depends(get_read_db)):
     return await ReportService(db).books_currently_held_by_readers()
 
 @router.get("/last-visits")
-async def last_visits(db: AsyncSession = Depends(get_db)):
+async def last_visits(db: AsyncSession = Depends(get_read_db)):
     return await ReportService(db).last_visit_dates()
 
 @router.get("/top-author")
-async def top_author(db: AsyncSession = Depends(get_db)):
-    return await ReportService(db).most_read_author()
+async def top_author(window: dict = Depends(report_window), db: AsyncSession = Depends(get_read_db)):
+    return await ReportService(db).most_read_author(**window)
 
 @router.get("/popular-genres")
-async def popular_genres(db: AsyncSession = Depends(get_db)):
-    return await ReportService(db).popular_genres()
+async def popular_genres(window: dict = Depends(report_window), db: AsyncSession = Depends(get_read_db)):
+    return await ReportService(db).popular_genres(**window)
 
 @router.get("/favorite-genres")
-async def favorite_genres(db: AsyncSession = Depends(get_db)):
-    return await ReportService(db).favorite_genre_per_reader()
\ No newline at end of file
+async def favorite_genres(
+        top_n: int = Query(1, ge=1, le=20),
+        ties: str = Query("all", pattern="^(all|alphabetical)$"),
+        date_from: Optional[date] = Query(None, alias="from"),
+        date_to: Optional[date] = Query(None, alias="to"),
+        cursor: int = Query(0, ge=0),
+        limit: int = Query(100, ge=1, le=1000),
+        db: AsyncSession = Depends(get_read_db)
+):
+    return await ReportService(db).favorite_genre_per_reader(
+        top_n=top_n, ties=ties, date_from=date_from, date_to=date_to,
+        after_reader_id=cursor, limit=limit
+    )
@@ -0,0 +1,34 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.instrumentation import render_metrics
+from app.db.session import engine, read_engine
+from app.services.entity_cache import entity_cache
+from app.services.report_cache import report_cache
+
+router = APIRouter(tags=["system"])
+# /metrics отдаётся от корня, как его ожидает Prometheus
+metrics_router = APIRouter(tags=["system"])
+
+
+@router.get("/pool")
+async def pool_stats():
+    """Состояние пулов соединений: занятые, переполнение, ожидание выдачи."""
+    stats = {"primary": engine.pool.stats()}
+    if read_engine is not engine:
+        stats["replica"] = read_engine.pool.stats()
+    return stats
+
+
+@router.get("/cache")
+async def cache_stats():
+    """Размер и доля попаданий кэшей сущностей и отчётов в этом процессе."""
+    return {"entities": entity_cache.stats(), "reports": report_cache.stats()}
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    engines = {"primary": engine}
+    if read_engine is not engine:
+        engines["replica"] = read_engine
+    return PlainTextResponse(render_metrics(engines), media_type="text/plain; version=0.0.4")
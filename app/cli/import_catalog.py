@@ -0,0 +1,52 @@
+"""Загрузка каталога книг из CSV или JSONL.
+
+    python -m app.cli.import_catalog catalog.csv
+    python -m app.cli.import_catalog catalog.jsonl --batch-size 10000
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from app.core.config import settings
+from app.db.session import SessionLocal, engine
+from app.schemas import CatalogImportResult
+from app.services.catalog_import import CatalogImporter, PARSERS, iter_lines
+
+READ_CHUNK_SIZE = 1 << 20
+
+
+async def _read_chunks(path: str):
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_CHUNK_SIZE):
+            yield chunk
+
+
+async def main(path: str, fmt: str, batch_size: int) -> CatalogImportResult:
+    started = time.perf_counter()
+
+    def progress(result: CatalogImportResult):
+        rate = result.imported / (time.perf_counter() - started)
+        print(f"\r{result.imported} imported, {result.skipped} skipped ({rate:.0f} rows/s)",
+              end="", file=sys.stderr, flush=True)
+
+    try:
+        async with SessionLocal() as db:
+            rows = PARSERS[fmt](iter_lines(_read_chunks(path)))
+            result = await CatalogImporter(db, batch_size=batch_size).import_rows(rows, progress=progress)
+    finally:
+        await engine.dispose()
+    print(file=sys.stderr)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=sorted(PARSERS), help="по умолчанию — по расширению файла")
+    parser.add_argument("--batch-size", type=int, default=settings.CATALOG_IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "jsonl")
+    result = asyncio.run(main(args.path, fmt, args.batch_size))
+    print(result.model_dump_json(indent=2))
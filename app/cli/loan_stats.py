@@ -0,0 +1,40 @@
+"""Проверка и пересчёт счётчиков займов.
+
+    python -m app.cli.loan_stats verify
+    python -m app.cli.loan_stats rebuild
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from app.db.session import SessionLocal, engine
+from app.services.loan_stats import LoanStatsService
+from app.services.report_cache import report_cache
+
+
+async def main(command: str) -> int:
+    try:
+        async with SessionLocal() as db:
+            service = LoanStatsService(db)
+            if command == "rebuild":
+                await service.rebuild()
+                await report_cache.bump("loans")
+                print("Loan counters rebuilt", file=sys.stderr)
+                return 0
+
+            mismatches = await service.verify()
+            for mismatch in mismatches:
+                print(json.dumps(mismatch))
+            print(f"{len(mismatches)} mismatches", file=sys.stderr)
+            return 1 if mismatches else 0
+    finally:
+        await report_cache.close()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.command)))
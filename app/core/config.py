@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -7,16 +9,79 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_HOST: str = "localhost"
     POSTGRES_PORT: str = "5432"
+    # Реплика только для чтения; без неё чтение идёт в основную БД
+    READ_REPLICA_HOST: Optional[str] = None
+    READ_REPLICA_PORT: Optional[str] = None
+    READ_YOUR_WRITES_WINDOW: int = 5
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = False
+    # Кэш подготовленных выражений asyncpg на соединение
+    DB_STATEMENT_CACHE_SIZE: int = 500
+    DB_PGBOUNCER: bool = False
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
     GEOCODING_TIMEOUT: int = 10
+    GEOCODING_CACHE_TTL_DAYS: int = 180
+    GEOCODING_NEGATIVE_CACHE_TTL_DAYS: int = 7
+    GEOCODING_CONCURRENCY: int = 4
+    # Политика Nominatim: не чаще одного запроса в секунду
+    GEOCODING_MIN_INTERVAL: float = 1.0
+    REPORT_STREAM_BATCH_SIZE: int = 500
+    REPORTS_DIR: str = "reports"
+    REPORTS_QUEUE: str = "reports"
+    REPORT_RESULT_EXPIRES: int = 7 * 24 * 3600
+    REPORT_CACHE_SIZE: int = 256
+    REPORT_CACHE_TTL: int = 300
+    REPORT_CACHE_REDIS_URL: Optional[str] = None
+    BOOK_STREAM_BATCH_SIZE: int = 1000
+    CATALOG_IMPORT_BATCH_SIZE: int = 5000
+    CATALOG_IMPORT_USE_COPY: bool = True
+    BOOK_DELETE_BATCH_SIZE: int = 1000
     GOOGLE_BOOKS_API_KEY: str
+    RATING_CACHE_SIZE: int = 10000
+    RATING_CACHE_TTL: int = 24 * 3600
+    RATING_CACHE_PATH: Optional[str] = None
+    RATING_REQUEST_TIMEOUT: float = 5.0
+    RATING_MAX_CONNECTIONS: int = 20
+    RATING_BATCH_CONCURRENCY: int = 10
+    RATING_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    RATING_CIRCUIT_RESET_TIMEOUT: float = 30.0
+    RATING_STALE_AFTER: int = 7 * 24 * 3600
+    RATING_REFRESH_INTERVAL: int = 3600
+    RATING_REFRESH_BATCH_SIZE: int = 200
+    LOAN_ARCHIVE_AFTER_DAYS: int = 365
+    LOAN_ARCHIVE_BATCH_SIZE: int = 1000
+    LOAN_ARCHIVE_INTERVAL: int = 24 * 3600
+    OVERDUE_NOTIFIER: str = "log"
+    OVERDUE_NOTIFY_PATH: str = "notifications/overdue.jsonl"
+    OVERDUE_NOTIFY_BATCH_SIZE: int = 1000
+    OVERDUE_SCAN_INTERVAL: int = 24 * 3600
+    VISIT_FLUSH_INTERVAL: float = 30.0
+    VISIT_TRACKER_REDIS_URL: Optional[str] = None
+    INSTRUMENTATION_ENABLED: bool = False
+    SLOW_QUERY_MS: float = 200.0
+    N_PLUS_ONE_THRESHOLD: int = 10
+    ENTITY_CACHE_SIZE: int = 10000
+    ENTITY_CACHE_TTL: int = 60
+    ENTITY_CACHE_REDIS_URL: Optional[str] = None
+    SEARCH_MAX_CANDIDATES: int = 10000
+    SEARCH_FALLBACK_TTL: int = 60
     PROJECT_NAME: str = "LibraryAPI"
 
     @property
     def DATABASE_URL(self):
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    @property
+    def READ_DATABASE_URL(self) -> Optional[str]:
+        if not self.READ_REPLICA_HOST:
+            return None
+        port = self.READ_REPLICA_PORT or self.POSTGRES_PORT
+        return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.READ_REPLICA_HOST}:{port}/{self.POSTGRES_DB}"
+
     class Config:
         env_file = ".env"
         case_sensitive = True
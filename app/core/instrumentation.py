@@ -0,0 +1,187 @@
+"""Замеры запросов: время обработки, SQL, внешние вызовы, отчёты.
+
+Всё включается настройкой INSTRUMENTATION_ENABLED. Без неё middleware и
+обработчики событий движка не подключаются, а track_external и timed_report
+сводятся к одной проверке флага.
+"""
+import functools
+import logging
+import time
+from collections import Counter as StatementCounter
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram, render_gauges
+
+logger = logging.getLogger(__name__)
+
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request handling time", ("method", "route")
+)
+REQUESTS = Counter("http_requests_total", "Handled requests", ("method", "route", "status"))
+REQUEST_SQL_DURATION = Histogram(
+    "http_request_sql_seconds", "Time spent in SQL per request", ("method", "route")
+)
+REQUEST_SQL_QUERIES = Histogram(
+    "http_request_sql_queries", "SQL statements per request", ("method", "route"), buckets=COUNT_BUCKETS
+)
+EXTERNAL_DURATION = Histogram("external_call_duration_seconds", "External service call time", ("service",))
+REPORT_DURATION = Histogram("report_duration_seconds", "ReportService method time", ("report",))
+SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS", ("route",))
+N_PLUS_ONE = Counter("db_n_plus_one_total", "Requests repeating one statement N_PLUS_ONE_THRESHOLD+ times",
+                     ("route",))
+
+_METRICS = [
+    REQUEST_DURATION, REQUESTS, REQUEST_SQL_DURATION, REQUEST_SQL_QUERIES,
+    EXTERNAL_DURATION, REPORT_DURATION, SLOW_QUERIES, N_PLUS_ONE,
+]
+
+
+class RequestStats:
+    __slots__ = ("route", "sql_count", "sql_time", "external_time", "statements")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.external_time = 0.0
+        self.statements = StatementCounter()
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def enabled() -> bool:
+    return settings.INSTRUMENTATION_ENABLED
+
+
+# === SQL ===
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - context._query_started
+    stats = _current.get()
+    route = stats.route if stats else "-"
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_time += duration
+        stats.statements[statement] += 1
+    if duration * 1000 >= settings.SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(route)
+        logger.warning(f"Slow query ({duration * 1000:.1f} ms) in {route}: {statement[:500]}")
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Подписывает движок на замер SQL; повторный вызов для того же движка безопасен."""
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# === Requests ===
+def start_request(route: str) -> RequestStats:
+    stats = RequestStats(route)
+    _current.set(stats)
+    return stats
+
+
+def finish_request(stats: RequestStats, method: str, status: int, duration: float) -> str:
+    """Записывает метрики запроса и возвращает значение заголовка Server-Timing."""
+    REQUEST_DURATION.observe(duration, method, stats.route)
+    REQUESTS.inc(method, stats.route, status)
+    REQUEST_SQL_DURATION.observe(stats.sql_time, method, stats.route)
+    REQUEST_SQL_QUERIES.observe(stats.sql_count, method, stats.route)
+
+    # Один и тот же запрос много раз за обработку — признак N+1
+    repeated = [(statement, count) for statement, count in stats.statements.items()
+                if count >= settings.N_PLUS_ONE_THRESHOLD]
+    if repeated:
+        N_PLUS_ONE.inc(stats.route)
+        for statement, count in repeated:
+            logger.warning(f"Possible N+1 in {method} {stats.route}: {count} x {statement[:300]}")
+
+    # Остаток — код приложения и сериализация ответа
+    app_time = max(duration - stats.sql_time - stats.external_time, 0.0)
+    return (
+        f'sql;dur={stats.sql_time * 1000:.1f};desc="{stats.sql_count} queries", '
+        f"ext;dur={stats.external_time * 1000:.1f}, "
+        f"app;dur={app_time * 1000:.1f}, "
+        f"total;dur={duration * 1000:.1f}"
+    )
+
+
+# === External calls and reports ===
+class track_external:
+    """async with track_external("google_books"): ... — время вызова внешнего сервиса."""
+    __slots__ = ("service", "started")
+
+    def __init__(self, service: str):
+        self.service = service
+        self.started = 0.0
+
+    async def __aenter__(self):
+        if settings.INSTRUMENTATION_ENABLED:
+            self.started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.started:
+            duration = time.perf_counter() - self.started
+            EXTERNAL_DURATION.observe(duration, self.service)
+            stats = _current.get()
+            if stats is not None:
+                stats.external_time += duration
+        return False
+
+
+def timed_report(name: str):
+    """Замер времени асинхронного метода ReportService."""
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            if not settings.INSTRUMENTATION_ENABLED:
+                return await method(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                REPORT_DURATION.observe(time.perf_counter() - started, name)
+        return wrapper
+
+    return decorator
+
+
+# === Export ===
+def render_metrics(engines: dict) -> str:
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    pools = {name: engine.pool.stats() for name, engine in engines.items() if hasattr(engine.pool, "stats")}
+    for key, documentation in (
+            ("checked_out", "Connections in use"),
+            ("overflow", "Connections opened above pool size"),
+            ("checkouts", "Connection checkouts"),
+            ("timeouts", "Connection checkout timeouts"),
+            ("wait_avg_ms", "Average connection checkout wait"),
+            ("wait_max_ms", "Maximum connection checkout wait"),
+    ):
+        lines.extend(render_gauges(
+            f"db_pool_{key}", documentation, ("engine",),
+            (((name,), pool_stats[key]) for name, pool_stats in pools.items())
+        ))
+    return "\n".join(lines) + "\n"
+
+
+__all__ = [
+    "enabled", "instrument_engine", "start_request", "finish_request",
+    "track_external", "timed_report", "render_metrics",
+]
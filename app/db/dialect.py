@@ -0,0 +1,20 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def dialect_name(db: AsyncSession) -> str:
+    return db.get_bind().dialect.name
+
+
+def upsert_insert(db: AsyncSession, table):
+    """INSERT с поддержкой ON CONFLICT для текущего диалекта."""
+    name = dialect_name(db)
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upsert is not supported for dialect {name}")
+    return insert(table)
+
+
+__all__ = ["dialect_name", "upsert_insert"]
@@ -1,15 +1,76 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import time
+import uuid
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.pool import InstrumentedQueuePool
 from app.models.base import Base
 
-engine = create_async_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine,
-    class_=AsyncSession
-)
+# Cookie с временем последней записи клиента: пока не истекло окно
+# READ_YOUR_WRITES_WINDOW, его чтения идут в основную БД, а не в реплику
+LAST_WRITE_COOKIE = "last_write"
+
+
+def _connect_args() -> dict:
+    if settings.DB_PGBOUNCER:
+        # PgBouncer в режиме transaction: соединение сервера меняется между
+        # транзакциями, поэтому подготовленные выражения не кэшируются,
+        # а их имена уникальны
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return {
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+
+
+def _engine_kwargs(url: str) -> dict:
+    parsed = make_url(url)
+    # SQLite (тесты, бенчмарки) работает со своим пулом по умолчанию
+    if parsed.get_backend_name() == "sqlite":
+        return {}
+    kwargs = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    # Параметры кэша подготовленных выражений понимает только asyncpg
+    if parsed.get_driver_name() == "asyncpg":
+        kwargs["connect_args"] = _connect_args()
+    return kwargs
+
+
+def make_engine(url: Optional[str] = None) -> AsyncEngine:
+    url = url or settings.DATABASE_URL
+    return create_async_engine(url, **_engine_kwargs(url))
+
+
+def make_session_factory(bind: AsyncEngine) -> sessionmaker:
+    return sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        # Объекты остаются доступными после commit без повторного SELECT
+        expire_on_commit=False,
+        bind=bind,
+        class_=AsyncSession
+    )
+
+
+engine = make_engine()
+SessionLocal = make_session_factory(engine)
+
+read_engine = make_engine(settings.READ_DATABASE_URL) if settings.READ_DATABASE_URL else engine
+ReadSessionLocal = make_session_factory(read_engine) if read_engine is not engine else SessionLocal
 
 
 async def get_db():
@@ -20,4 +81,29 @@ async def get_db():
         await db.close()
 
 
-__all__ = ["engine", "SessionLocal", "Base", "get_db"]
+def wrote_recently(request: Request) -> bool:
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, 0))
+    except ValueError:
+        return False
+    return time.time() - last_write < settings.READ_YOUR_WRITES_WINDOW
+
+
+def read_session_factory(request: Request) -> sessionmaker:
+    return SessionLocal if wrote_recently(request) else ReadSessionLocal
+
+
+async def get_read_db(request: Request):
+    """Сессия для отчётов и списков: реплика, если клиент недавно ничего не писал."""
+    db = read_session_factory(request)()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+__all__ = [
+    "engine", "SessionLocal", "read_engine", "ReadSessionLocal", "Base",
+    "get_db", "get_read_db", "read_session_factory", "make_engine", "make_session_factory",
+    "LAST_WRITE_COOKIE"
+]
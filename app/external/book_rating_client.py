@@ -1,20 +1,151 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, Optional
+
 import aiohttp
-from typing import Optional
+from app.core.cache import TTLCache, MISSING
 from app.core.config import settings
+from app.core.instrumentation import track_external
+
+logger = logging.getLogger(__name__)
 
 
 class BookRatingClient:
+    """Клиент Google Books с общим пулом соединений и кэшем рейтингов.
+
+    Один экземпляр живёт всё время работы приложения: сессия aiohttp создаётся
+    при первом запросе и закрывается в close(). Одновременные запросы одного
+    и того же названия объединяются, а после серии ошибок внешний API
+    временно не опрашивается (circuit breaker).
+    """
     BASE_URL = "https://www.googleapis.com/books/v1/volumes"
     API_KEY = settings.GOOGLE_BOOKS_API_KEY
 
+    def __init__(self, cache_path: Optional[str] = settings.RATING_CACHE_PATH):
+        self.cache_path = cache_path
+        self._cache = TTLCache(maxsize=settings.RATING_CACHE_SIZE, ttl=settings.RATING_CACHE_TTL)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._failures = 0
+        self._circuit_open_until = 0.0
+
+    # === Lifecycle ===
+    async def start(self) -> None:
+        if self.cache_path and os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path) as f:
+                    for key, expires_at, rating in json.load(f):
+                        self._cache.restore(key, expires_at, rating)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to load rating cache from {self.cache_path}: {e}")
+
+    async def close(self) -> None:
+        if self.cache_path:
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(list(self._cache.items()), f)
+            os.replace(tmp_path, self.cache_path)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=settings.RATING_MAX_CONNECTIONS, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=settings.RATING_REQUEST_TIMEOUT)
+            )
+        return self._session
+
+    # === Ratings ===
     async def get_rating(self, title: str) -> Optional[float]:
-        url = f"{self.BASE_URL}?q={title}&key={self.API_KEY}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    items = data.get("items")
-                    if items:
-                        volume_info = items[0].get("volumeInfo", {})
-                        return volume_info.get("averageRating")
-        return None
+        rating = await self._lookup(title)
+        return None if rating is MISSING else rating
+
+    async def get_ratings(
+            self, titles: Iterable[str], include_failed: bool = True
+    ) -> Dict[str, Optional[float]]:
+        """Рейтинги для набора названий.
+
+        При include_failed=False названия, для которых внешний API не ответил,
+        в результат не попадают — так их можно отличить от книг без рейтинга.
+        """
+        semaphore = asyncio.Semaphore(settings.RATING_BATCH_CONCURRENCY)
+
+        async def fetch(title: str):
+            async with semaphore:
+                return title, await self._lookup(title)
+
+        unique_titles = list(dict.fromkeys(titles))
+        results = await asyncio.gather(*(fetch(title) for title in unique_titles))
+        return {
+            title: None if rating is MISSING else rating
+            for title, rating in results
+            if include_failed or rating is not MISSING
+        }
+
+    def cache_stats(self) -> dict:
+        return self._cache.stats()
+
+    async def _lookup(self, title: str):
+        key = self._cache_key(title)
+        rating = self._cache.get(key, MISSING)
+        if rating is not MISSING:
+            return rating
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_cache(key, title))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: отмена одного из ожидающих не прерывает общий запрос
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _cache_key(title: str) -> str:
+        return " ".join(title.split()).casefold()
+
+    async def _fetch_and_cache(self, key: str, title: str):
+        # MISSING — внешний API недоступен, None — у книги нет рейтинга
+        if time.monotonic() < self._circuit_open_until:
+            return MISSING
+
+        try:
+            session = self._get_session()
+            params = {"q": title, "key": self.API_KEY}
+            async with track_external("google_books"), session.get(self.BASE_URL, params=params) as response:
+                if response.status == 429 or response.status >= 500:
+                    self._record_failure(f"HTTP {response.status}")
+                    return MISSING
+                if response.status != 200:
+                    logger.warning(f"Google Books returned HTTP {response.status} for '{title}'")
+                    return MISSING
+                data = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._record_failure(repr(e))
+            return MISSING
+
+        self._failures = 0
+        rating = None
+        items = data.get("items")
+        if items:
+            volume_info = items[0].get("volumeInfo", {})
+            rating = volume_info.get("averageRating")
+        self._cache.set(key, rating)
+        return rating
+
+    def _record_failure(self, reason: str) -> None:
+        self._failures += 1
+        logger.warning(f"Google Books request failed ({reason}), consecutive failures: {self._failures}")
+        if self._failures >= settings.RATING_CIRCUIT_FAILURE_THRESHOLD:
+            self._circuit_open_until = time.monotonic() + settings.RATING_CIRCUIT_RESET_TIMEOUT
+            self._failures = 0
+            logger.warning(f"Google Books circuit opened for {settings.RATING_CIRCUIT_RESET_TIMEOUT}s")
+
+
+rating_client = BookRatingClient()
+
+__all__ = ["BookRatingClient", "rating_client"]
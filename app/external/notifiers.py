@@ -0,0 +1,59 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Type
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Notifier:
+    """Получатель пачек уведомлений о просрочке.
+
+    Уведомление — словарь с полями займа, книги и читателя. Свой канал
+    (почта, SMS) подключается подклассом и записью в NOTIFIERS.
+    """
+
+    async def send(self, notices: List[dict]) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LogNotifier(Notifier):
+    async def send(self, notices: List[dict]) -> None:
+        for notice in notices:
+            logger.info(
+                f"Overdue loan {notice['loan_id']}: reader {notice['reader_id']} "
+                f"({notice['reader_name']}), book \"{notice['title']}\", {notice['days_overdue']} days overdue"
+            )
+
+
+class FileNotifier(Notifier):
+    """Дописывает уведомления в JSONL-файл — для локальной проверки рассылки."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.OVERDUE_NOTIFY_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    async def send(self, notices: List[dict]) -> None:
+        with open(self.path, "a") as f:
+            for notice in notices:
+                f.write(json.dumps(notice, default=str) + "\n")
+
+
+NOTIFIERS: Dict[str, Type[Notifier]] = {
+    "log": LogNotifier,
+    "file": FileNotifier,
+}
+
+
+def get_notifier(name: Optional[str] = None) -> Notifier:
+    name = name or settings.OVERDUE_NOTIFIER
+    if name not in NOTIFIERS:
+        raise ValueError(f"Unknown notifier: {name}")
+    return NOTIFIERS[name]()
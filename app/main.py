@@ -2,27 +2,75 @@ from contextlib import asynccontextmanager
 
 # print("Task is from:", asyncio.Task.__module__)
 # print("Task:", asyncio.Task)
-from fastapi import FastAPI
-from app.db.session import engine, Base
-from app.api.v1 import books_router, readers_router, loans_router, reports_router
+import time
+
+from fastapi import FastAPI, Request
+from app.core.config import settings
+from app.db.session import engine, read_engine, LAST_WRITE_COOKIE
+from app.api.v1 import books_router, readers_router, loans_router, reports_router, system_router, metrics_router
+from app.core import instrumentation
+from app.external.book_rating_client import rating_client
+from app.services.entity_cache import entity_cache
+from app.services.report_cache import report_cache
+from app.services.visit_tracker import visit_tracker
 import uvicorn
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        print("✅ Таблицы созданы")
+    # Схема БД управляется миграциями: alembic upgrade head
+    await rating_client.start()
+    await visit_tracker.start()
+    await entity_cache.start()
     yield
+    await visit_tracker.close()
+    await entity_cache.close()
+    await rating_client.close()
+    await report_cache.close()
+    if read_engine is not engine:
+        await read_engine.dispose()
     await engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
 
+
+@app.middleware("http")
+async def remember_writes(request: Request, call_next):
+    response = await call_next(request)
+    # Чтения клиента после успешной записи идут в основную БД (read-your-writes)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        response.set_cookie(
+            LAST_WRITE_COOKIE, str(time.time()),
+            max_age=settings.READ_YOUR_WRITES_WINDOW, httponly=True
+        )
+    return response
+
+
+if instrumentation.enabled():
+    instrumentation.instrument_engine(engine)
+    if read_engine is not engine:
+        instrumentation.instrument_engine(read_engine)
+
+    @app.middleware("http")
+    async def instrument_requests(request: Request, call_next):
+        stats = instrumentation.start_request(request.url.path)
+        started = time.perf_counter()
+        response = await call_next(request)
+        # Шаблон маршрута известен только после сопоставления: /books/{book_id}, а не /books/42
+        route = request.scope.get("route")
+        stats.route = getattr(route, "path", "unmatched")
+        response.headers["Server-Timing"] = instrumentation.finish_request(
+            stats, request.method, response.status_code, time.perf_counter() - started
+        )
+        return response
+
 app.include_router(books_router, prefix="/api/v1/books")
 app.include_router(readers_router, prefix="/api/v1/readers")
 app.include_router(loans_router, prefix="/api/v1/loans")
 app.include_router(reports_router, prefix="/api/v1/reports")
+app.include_router(system_router, prefix="/api/v1/system")
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8080)
@@ -3,10 +3,19 @@ from app.models.book import Book
 from app.models.author import Author
 from app.models.reader import Reader
 from app.models.address import Address
+from app.models.address_geocode import AddressGeocode
 from app.models.loan import Loan
+from app.models.hold import Hold
 from app.models.archived_loan import ArchivedLoan
 from app.models.archived_book import ArchivedBook
+from app.models.reader_loan_stats import ReaderLoanStats
+from app.models.author_loan_stats import AuthorLoanStats
+from app.models.genre_loan_stats import GenreLoanStats
+from app.models.reader_genre_stats import ReaderGenreStats
+from app.models.daily_loan_stats import DailyLoanStats
 
 __all__ = ["Base", "Book", "Author",
-           "Reader", "Address", "Loan",
-           "ArchivedLoan", "ArchivedBook"]
+           "Reader", "Address", "AddressGeocode", "Loan", "Hold",
+           "ArchivedLoan", "ArchivedBook",
+           "ReaderLoanStats", "AuthorLoanStats", "GenreLoanStats", "ReaderGenreStats",
+           "DailyLoanStats"]
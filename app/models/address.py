@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .base import Base
 
 
 class Address(Base):
     __tablename__ = "addresses"
+    __table_args__ = (
+        UniqueConstraint("city", "street", name="uq_addresses_city_street"),
+    )
 
     id = Column(Integer, primary_key=True)
     city = Column(String)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, UniqueConstraint
+from .base import Base
+
+
+class AddressGeocode(Base):
+    __tablename__ = "address_geocodes"
+    __table_args__ = (
+        UniqueConstraint("city_key", "street_key", name="uq_address_geocodes_key"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    city_key = Column(String, nullable=False)
+    street_key = Column(String, nullable=False)
+    # Пустые координаты — закэшированный отрицательный результат
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    fetched_at = Column(DateTime, nullable=False)
+
+    @property
+    def is_negative(self) -> bool:
+        return self.latitude is None or self.longitude is None
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Date
+from sqlalchemy import Column, Integer, Date, Boolean, false
 from .base import Base
 
 
@@ -7,8 +7,11 @@ class ArchivedLoan(Base):
 
     id = Column(Integer, primary_key=True)
     original_loan_id = Column(Integer, index=True, nullable=False)
-    book_id = Column(Integer, nullable=False)
-    reader_id = Column(Integer, nullable=False)
-    loan_date = Column(Date, nullable=False)
+    book_id = Column(Integer, index=True, nullable=False)
+    reader_id = Column(Integer, index=True, nullable=False)
+    loan_date = Column(Date, index=True, nullable=False)
     expected_return_date = Column(Date, nullable=False)
     return_date = Column(Date, nullable=True)
+    # Книга списана: займ остаётся в архиве, но не входит в историю и счётчики.
+    # Отдельный флаг, потому что id удалённой книги может достаться новой (SQLite)
+    book_deleted = Column(Boolean, nullable=False, default=False, server_default=false())
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Integer
+from .base import Base
+
+
+class AuthorLoanStats(Base):
+    __tablename__ = "author_loan_stats"
+
+    author_id = Column(Integer, primary_key=True)
+    loan_count = Column(Integer, nullable=False, default=0, index=True)
@@ -1,16 +1,38 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Float, DateTime, Index, Text, CheckConstraint, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from .base import Base
 
 
 class Book(Base):
     __tablename__ = "books"
+    __table_args__ = (
+        # Keyset-пагинация по id с фильтрами
+        Index("ix_books_available_id", "id",
+              postgresql_where=text("is_available"), sqlite_where=text("is_available")),
+        Index("ix_books_genre_id", "genre", "id"),
+        Index("ix_books_author_id_id", "author_id", "id"),
+        Index("ix_books_title_prefix", "title", postgresql_ops={"title": "text_pattern_ops"}),
+        # Полнотекстовый поиск и автодополнение без учёта регистра (pg_trgm)
+        Index("ix_books_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_books_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        CheckConstraint("available_copies >= 0 AND available_copies <= total_copies", name="ck_books_copies"),
+    )
 
     id = Column(Integer, primary_key=True)
     title = Column(String)
     genre = Column(String)
     author_id = Column(Integer, ForeignKey("authors.id"))
+    # Экземпляры книги: всего и на полке. is_available = available_copies > 0,
+    # хранится отдельно для частичного индекса ix_books_available_id
+    total_copies = Column(Integer, nullable=False, default=1, server_default="1")
+    available_copies = Column(Integer, nullable=False, default=1, server_default="1")
     is_available = Column(Boolean, default=True)
+    # Рейтинг Google Books, обновляется фоновой задачей
+    average_rating = Column(Float, nullable=True)
+    rating_fetched_at = Column(DateTime, nullable=True)
+    # Название, автор и жанр для полнотекстового поиска; заполняется триггером БД
+    search_vector = deferred(Column(TSVECTOR().with_variant(Text(), "sqlite"), nullable=True))
 
     author = relationship("Author", back_populates="books")
     loans = relationship("Loan", back_populates="book")
\ No newline at end of file
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, Date
+from .base import Base
+
+
+class DailyLoanStats(Base):
+    """Число выдач за день по автору и жанру книги."""
+    __tablename__ = "daily_loan_stats"
+
+    day = Column(Date, primary_key=True)
+    author_id = Column(Integer, primary_key=True)
+    genre = Column(String, primary_key=True)
+    loan_count = Column(Integer, nullable=False, default=0)
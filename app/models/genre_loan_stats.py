@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Integer, String
+from .base import Base
+
+
+class GenreLoanStats(Base):
+    __tablename__ = "genre_loan_stats"
+
+    genre = Column(String, primary_key=True)
+    loan_count = Column(Integer, nullable=False, default=0)
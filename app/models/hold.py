@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index, text
+from .base import Base
+
+
+class Hold(Base):
+    """Место читателя в очереди на книгу, у которой нет свободных экземпляров."""
+    __tablename__ = "holds"
+    __table_args__ = (
+        # Очередь ожидающих по книге в порядке постановки (FIFO)
+        Index("ix_holds_waiting", "book_id", "id",
+              postgresql_where=text("fulfilled_at IS NULL"), sqlite_where=text("fulfilled_at IS NULL")),
+        # Один читатель стоит в очереди на книгу не больше одного раза
+        Index("ux_holds_waiting_reader", "book_id", "reader_id", unique=True,
+              postgresql_where=text("fulfilled_at IS NULL"), sqlite_where=text("fulfilled_at IS NULL")),
+    )
+
+    id = Column(Integer, primary_key=True)
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
+    reader_id = Column(Integer, ForeignKey("readers.id"), nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False)
+    # Заполняются, когда вернувшийся экземпляр выдан читателю из очереди
+    fulfilled_at = Column(DateTime, nullable=True)
+    loan_id = Column(Integer, nullable=True)
@@ -1,14 +1,27 @@
-from sqlalchemy import Column, Integer, Date, ForeignKey
+from sqlalchemy import Column, Integer, Date, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from .base import Base
 
 class Loan(Base):
     __tablename__ = "loans"
+    __table_args__ = (
+        # Частичные индексы по открытым займам: проверки доступности и активных выдач
+        Index("ix_loans_open_book_id", "book_id",
+              postgresql_where=text("return_date IS NULL"), sqlite_where=text("return_date IS NULL")),
+        Index("ix_loans_open_reader_id", "reader_id",
+              postgresql_where=text("return_date IS NULL"), sqlite_where=text("return_date IS NULL")),
+        # Открытые займы по сроку возврата: поиск просроченных
+        Index("ix_loans_overdue", "expected_return_date", "id",
+              postgresql_where=text("return_date IS NULL"), sqlite_where=text("return_date IS NULL")),
+        # Возвращённые займы в порядке возврата: выборка кандидатов в архив
+        Index("ix_loans_returned", "return_date",
+              postgresql_where=text("return_date IS NOT NULL"), sqlite_where=text("return_date IS NOT NULL")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    book_id = Column(Integer, ForeignKey("books.id"))
-    reader_id = Column(Integer, ForeignKey("readers.id"))
-    loan_date = Column(Date)
+    book_id = Column(Integer, ForeignKey("books.id"), index=True)
+    reader_id = Column(Integer, ForeignKey("readers.id"), index=True)
+    loan_date = Column(Date, index=True)
     expected_return_date = Column(Date)
     return_date = Column(Date)
 
@@ -8,7 +8,7 @@ class Reader(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
-    address_id = Column(Integer, ForeignKey("addresses.id"))
+    address_id = Column(Integer, ForeignKey("addresses.id"), index=True)
     last_visit = Column(Date)
 
     address = relationship("Address", back_populates="readers")
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String
+from .base import Base
+
+
+class ReaderGenreStats(Base):
+    __tablename__ = "reader_genre_stats"
+
+    reader_id = Column(Integer, primary_key=True)
+    genre = Column(String, primary_key=True)
+    loan_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer
+from .base import Base
+
+
+class ReaderLoanStats(Base):
+    __tablename__ = "reader_loan_stats"
+
+    reader_id = Column(Integer, primary_key=True)
+    total_loans = Column(Integer, nullable=False, default=0)
+    on_hand = Column(Integer, nullable=False, default=0)
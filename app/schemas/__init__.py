@@ -1,13 +1,24 @@
 from .address import AddressBase, AddressCreate, AddressResponse
 from .author import AuthorBase, AuthorCreate, AuthorResponse
-from .book import BookCreate, BookUpdate, BookResponse
-from .loan import LoanCreate, LoanResponse
+from .book import (
+    BookCreate, BookUpdate, BookResponse, BookPage, CatalogImportResult, BulkBookDelete, BulkBookDeleteResult,
+    BookSearchHit, BookSearchPage, SearchSuggestion
+)
+from .loan import (
+    LoanCreate, LoanResponse, BulkLoanCreate, BulkLoanReturn,
+    BulkCheckoutItem, BulkReturnItem, BulkCheckoutResponse, BulkReturnResponse,
+    OverdueLoan, OverdueLoanPage, ReaderOverdueSummary, ReaderOverduePage, HoldCreate, HoldResponse
+)
 from .reader import ReaderBase, ReaderCreate, ReaderUpdate, ReaderResponse
 
 __all__ = [
     'AddressBase', 'AddressCreate', 'AddressResponse',
     'AuthorBase', 'AuthorCreate', 'AuthorResponse',
-    'BookCreate', 'BookUpdate', 'BookResponse',
+    'BookCreate', 'BookUpdate', 'BookResponse', 'BookPage', 'CatalogImportResult',
+    'BulkBookDelete', 'BulkBookDeleteResult', 'BookSearchHit', 'BookSearchPage', 'SearchSuggestion',
     'ReaderBase', 'ReaderCreate', 'ReaderUpdate', 'ReaderResponse',
-    'LoanCreate', 'LoanResponse'
+    'LoanCreate', 'LoanResponse', 'BulkLoanCreate', 'BulkLoanReturn',
+    'BulkCheckoutItem', 'BulkReturnItem', 'BulkCheckoutResponse', 'BulkReturnResponse',
+    'OverdueLoan', 'OverdueLoanPage', 'ReaderOverdueSummary', 'ReaderOverduePage',
+    'HoldCreate', 'HoldResponse'
 ]
\ No newline at end of file
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, constr
+from pydantic import BaseModel, Field, constr, model_validator
 from .author import AuthorResponse
-from typing import Optional
+from typing import Dict, List, Literal, Optional
 
 
 class BookBase(BaseModel):
@@ -10,12 +10,15 @@ class BookBase(BaseModel):
 
 class BookCreate(BookBase):
     author_name: str
+    total_copies: int = Field(1, ge=1)
 
 
 class BookUpdate(BaseModel):
     title: constr(max_length=2)
     genre: Optional[str]
     author_name: Optional[str]
+    # Новое число экземпляров; уменьшить можно только за счёт стоящих на полке
+    total_copies: Optional[int] = Field(None, ge=1)
 
 
 class BookResponse(BaseModel):
@@ -24,6 +27,58 @@ class BookResponse(BaseModel):
     genre: str
     author: AuthorResponse
     is_available: bool
+    total_copies: int = 1
+    available_copies: int = 1
+    average_rating: Optional[float] = None
 
     class Config:
         from_attributes = True
+
+
+class BookPage(BaseModel):
+    items: List[BookResponse]
+    next_cursor: Optional[int] = None
+
+
+class CatalogImportResult(BaseModel):
+    rows: int = 0
+    imported: int = 0
+    skipped: int = 0
+    errors: List[str] = []
+
+
+class BulkBookDelete(BaseModel):
+    """Фильтр списания книг; пустой фильтр запрещён, чтобы не удалить весь каталог."""
+    book_ids: Optional[List[int]] = Field(None, min_length=1)
+    genre: Optional[str] = None
+    author: Optional[str] = None
+    title_prefix: Optional[str] = None
+
+    @model_validator(mode="after")
+    def require_filter(self):
+        if self.book_ids is None and self.genre is None and self.author is None and not self.title_prefix:
+            raise ValueError("At least one filter is required")
+        return self
+
+
+class BulkBookDeleteResult(BaseModel):
+    deleted: int = 0
+    skipped_on_loan: int = 0
+    loans_archived: int = 0
+
+
+class BookSearchHit(BookResponse):
+    rank: float
+    # Поля title, author и genre с совпадениями, обёрнутыми в <mark>
+    highlight: Dict[str, Optional[str]] = {}
+
+
+class BookSearchPage(BaseModel):
+    items: List[BookSearchHit]
+    next_cursor: Optional[int] = None
+
+
+class SearchSuggestion(BaseModel):
+    kind: Literal["book", "author"]
+    id: int
+    text: str
@@ -1,6 +1,6 @@
-from datetime import date
-from pydantic import BaseModel
-from typing import Optional
+from datetime import date, datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 
 class LoanBase(BaseModel):
@@ -19,3 +19,84 @@ class LoanResponse(LoanBase):
 
     class Config:
         from_attributes = True
+
+
+class BulkLoanCreate(BaseModel):
+    reader_id: int
+    book_ids: List[int] = Field(..., min_length=1, max_length=100)
+    # При atomic=True ошибка по любой книге отменяет выдачу всей корзины
+    atomic: bool = False
+
+
+class BulkLoanReturn(BaseModel):
+    loan_ids: List[int] = Field(..., min_length=1, max_length=100)
+    atomic: bool = False
+
+
+class BulkCheckoutItem(BaseModel):
+    book_id: int
+    loan: Optional[LoanResponse] = None
+    error: Optional[str] = None
+
+
+class BulkReturnItem(BaseModel):
+    loan_id: int
+    loan: Optional[LoanResponse] = None
+    error: Optional[str] = None
+
+
+class BulkCheckoutResponse(BaseModel):
+    succeeded: int
+    failed: int
+    items: List[BulkCheckoutItem]
+
+
+class BulkReturnResponse(BaseModel):
+    succeeded: int
+    failed: int
+    items: List[BulkReturnItem]
+
+
+class OverdueLoan(BaseModel):
+    loan_id: int
+    book_id: int
+    title: Optional[str] = None
+    reader_id: int
+    reader_name: Optional[str] = None
+    loan_date: date
+    expected_return_date: date
+    days_overdue: int
+
+
+class OverdueLoanPage(BaseModel):
+    items: List[OverdueLoan]
+    next_cursor: Optional[int] = None
+
+
+class ReaderOverdueSummary(BaseModel):
+    reader_id: int
+    name: Optional[str] = None
+    overdue_loans: int
+    oldest_due_date: date
+    max_days_overdue: int
+
+
+class ReaderOverduePage(BaseModel):
+    items: List[ReaderOverdueSummary]
+    next_cursor: Optional[int] = None
+
+
+class HoldCreate(BaseModel):
+    book_id: int
+    reader_id: int
+
+
+class HoldResponse(BaseModel):
+    id: int
+    book_id: int
+    reader_id: int
+    created_at: datetime
+    # Место в очереди, пока экземпляр не выдан; после выдачи — займ
+    position: Optional[int] = None
+    fulfilled_at: Optional[datetime] = None
+    loan_id: Optional[int] = None
@@ -0,0 +1,144 @@
+import codecs
+import csv
+import json
+import logging
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.dialect import dialect_name, upsert_insert
+from app.models import Author, Book
+from app.schemas import CatalogImportResult
+from app.services.report_cache import report_cache
+
+logger = logging.getLogger(__name__)
+
+MAX_REPORTED_ERRORS = 100
+BOOK_COLUMNS = ["title", "genre", "author_id", "is_available"]
+
+
+async def iter_lines(chunks: AsyncIterable[bytes], encoding: str = "utf-8") -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder(encoding)()
+    tail = ""
+    async for chunk in chunks:
+        tail += decoder.decode(chunk)
+        *lines, tail = tail.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail.rstrip("\r")
+
+
+async def parse_csv(lines: AsyncIterable[str]) -> AsyncIterator[dict]:
+    """Строки CSV с заголовком title,genre,author_name.
+
+    Записи разбираются построчно, поэтому переводы строк внутри кавычек
+    не поддерживаются.
+    """
+    header = None
+    async for line in lines:
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        yield dict(zip(header, values))
+
+
+async def parse_jsonl(lines: AsyncIterable[str]) -> AsyncIterator[dict]:
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        # Некорректная строка или не объект будет отклонена при проверке записи
+        yield row if isinstance(row, dict) else {}
+
+
+PARSERS = {"csv": parse_csv, "jsonl": parse_jsonl}
+
+
+class CatalogImporter:
+    """Пакетная загрузка каталога книг.
+
+    Авторы каждой пачки создаются одним INSERT ... ON CONFLICT DO NOTHING,
+    книги вставляются через COPY (PostgreSQL) или многострочным INSERT.
+    Каждая пачка фиксируется отдельной транзакцией.
+    """
+
+    def __init__(self, db: AsyncSession, batch_size: int = settings.CATALOG_IMPORT_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self.use_copy = settings.CATALOG_IMPORT_USE_COPY and dialect_name(db) == "postgresql"
+
+    async def import_rows(
+            self,
+            rows: AsyncIterable[dict],
+            progress: Optional[Callable[[CatalogImportResult], None]] = None
+    ) -> CatalogImportResult:
+        result = CatalogImportResult()
+        batch: List[dict] = []
+
+        async for row in rows:
+            result.rows += 1
+            book = self._validate(row)
+            if book is None:
+                result.skipped += 1
+                if len(result.errors) < MAX_REPORTED_ERRORS:
+                    result.errors.append(f"Row {result.rows}: title, genre and author_name are required")
+                continue
+            batch.append(book)
+            if len(batch) >= self.batch_size:
+                await self._import_batch(batch, result)
+                batch = []
+                if progress:
+                    progress(result)
+
+        if batch:
+            await self._import_batch(batch, result)
+            if progress:
+                progress(result)
+        return result
+
+    @staticmethod
+    def _validate(row: dict) -> Optional[dict]:
+        values = [row.get("title"), row.get("genre"), row.get("author_name") or row.get("author")]
+        # Поля JSONL могут оказаться числами, списками и т.п. — такая запись пропускается
+        if not all(isinstance(value, str) for value in values):
+            return None
+        title, genre, author_name = (value.strip() for value in values)
+        if not title or not genre or not author_name:
+            return None
+        return {"title": title, "genre": genre, "author_name": author_name}
+
+    async def _import_batch(self, batch: List[dict], result: CatalogImportResult) -> None:
+        author_ids = await self._resolve_authors({book["author_name"] for book in batch})
+        records = [
+            (book["title"], book["genre"], author_ids[book["author_name"]], True)
+            for book in batch
+        ]
+
+        if self.use_copy:
+            connection = await self.db.connection()
+            raw = await connection.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                Book.__tablename__, records=records, columns=BOOK_COLUMNS
+            )
+        else:
+            await self.db.execute(insert(Book), [dict(zip(BOOK_COLUMNS, record)) for record in records])
+
+        await self.db.commit()
+        await report_cache.bump("books")
+        result.imported += len(records)
+
+    async def _resolve_authors(self, names: set) -> Dict[str, int]:
+        stmt = upsert_insert(self.db, Author).on_conflict_do_nothing(index_elements=[Author.name])
+        await self.db.execute(stmt, [{"name": name} for name in names])
+        rows = await self.db.execute(select(Author.name, Author.id).where(Author.name.in_(names)))
+        return dict(rows.all())
@@ -0,0 +1,137 @@
+import asyncio
+import copy
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Авторы: имя -> id; книги: метаданные без доступности; читатели: карточка с адресом
+KINDS = ("author", "book", "reader")
+
+
+class EntityCache:
+    """Кэш редко меняющихся сущностей в памяти процесса.
+
+    Хранит снимки в виде словарей, а не ORM-объекты, привязанные к сессии.
+    Одновременные промахи по одному ключу ждут одну загрузку из БД. Запись,
+    загруженная до инвалидации, в кэш не попадает (счётчик поколений), так
+    что устаревшее значение живёт не дольше загрузки, начатой до записи.
+    Если задан ENTITY_CACHE_REDIS_URL, инвалидации рассылаются остальным
+    процессам через Redis pub/sub.
+    """
+    CHANNEL = "entity-cache:invalidate"
+
+    def __init__(self, redis_url: Optional[str] = settings.ENTITY_CACHE_REDIS_URL):
+        self._caches = {
+            kind: TTLCache(maxsize=settings.ENTITY_CACHE_SIZE, ttl=settings.ENTITY_CACHE_TTL)
+            for kind in KINDS
+        }
+        self._generations = {kind: 0 for kind in KINDS}
+        # Ключ -> [блокировка, число ожидающих]; удаляется, когда ожидающих нет
+        self._loading: Dict[Tuple[str, Hashable], list] = {}
+        self._origin = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(redis_url)
+
+    # === Lifecycle ===
+    async def start(self) -> None:
+        if self._redis is not None and self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.CHANNEL)
+                    # Пока подписки не было, инвалидации могли потеряться
+                    self.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._apply(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Entity cache invalidation channel failed, reconnecting: {e}")
+                await asyncio.sleep(1)
+
+    def _apply(self, payload: dict) -> None:
+        if payload.get("origin") == self._origin:
+            return
+        self._drop(payload["kind"], payload["keys"])
+
+    # === Lookups ===
+    async def get_or_load(
+            self, kind: str, key: Hashable, load: Callable[[], Awaitable[Optional[Any]]]
+    ) -> Optional[Any]:
+        """Значение из кэша или из load(); None (сущности нет) не кэшируется."""
+        cache = self._caches[kind]
+        value = cache.get(key, MISSING)
+        if value is not MISSING:
+            return copy.deepcopy(value)
+
+        slot = self._loading.setdefault((kind, key), [asyncio.Lock(), 0])
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                value = cache.peek(key, MISSING)
+                if value is MISSING:
+                    generation = self._generations[kind]
+                    value = await load()
+                    if value is not None and generation == self._generations[kind]:
+                        cache.set(key, value)
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                del self._loading[(kind, key)]
+        return copy.deepcopy(value)
+
+    # === Invalidation ===
+    def _drop(self, kind: str, keys: List[Hashable]) -> None:
+        self._generations[kind] += 1
+        cache = self._caches[kind]
+        for key in keys:
+            cache.pop(key)
+
+    async def invalidate(self, kind: str, *keys: Hashable) -> None:
+        """Удаляет ключи здесь и, при наличии Redis, во всех процессах; вызывать после commit."""
+        if not keys:
+            return
+        self._drop(kind, list(keys))
+        if self._redis is not None:
+            payload = json.dumps({"origin": self._origin, "kind": kind, "keys": list(keys)})
+            try:
+                await self._redis.publish(self.CHANNEL, payload)
+            except Exception as e:
+                logger.warning(f"Failed to publish entity cache invalidation for {kind}: {e}")
+
+    def clear(self) -> None:
+        for kind, cache in self._caches.items():
+            self._generations[kind] += 1
+            cache.clear()
+
+    def stats(self) -> dict:
+        return {kind: cache.stats() for kind, cache in self._caches.items()}
+
+
+entity_cache = EntityCache()
+
+__all__ = ["EntityCache", "entity_cache"]
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from geopy.exc import GeocoderServiceError, GeocoderTimedOut
+from geopy.geocoders import Nominatim
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.instrumentation import track_external
+from app.db.dialect import upsert_insert
+from app.models import AddressGeocode
+
+logger = logging.getLogger(__name__)
+
+AddressKey = Tuple[str, str]
+Coordinates = Tuple[float, float]
+
+_LOOKUP_CHUNK_SIZE = 500
+
+
+def normalize_address(city: Optional[str], street: Optional[str]) -> AddressKey:
+    def _norm(value: Optional[str]) -> str:
+        return " ".join((value or "").split()).casefold()
+
+    return _norm(city), _norm(street)
+
+
+class GeocodingService:
+    """Геокодирование адресов с кэшем в таблице address_geocodes.
+
+    Промахи кэша разрешаются пачкой: запросы к геокодеру выполняются в пуле
+    потоков, не более GEOCODING_CONCURRENCY одновременно и не чаще одного
+    раза в GEOCODING_MIN_INTERVAL секунд.
+    """
+
+    def __init__(self, db: AsyncSession, geolocator=None):
+        self.db = db
+        self.geolocator = geolocator or Nominatim(
+            user_agent=settings.PROJECT_NAME,
+            timeout=settings.GEOCODING_TIMEOUT
+        )
+        self._rate_lock = asyncio.Lock()
+        self._next_request_at = 0.0
+
+    async def geocode_many(
+            self, addresses: Iterable[Tuple[str, str]]
+    ) -> Dict[AddressKey, Optional[Coordinates]]:
+        """Возвращает координаты по нормализованному ключу адреса.
+
+        None означает, что адрес не найден; ключ отсутствует в результате,
+        если геокодер был недоступен.
+        """
+        queries: Dict[AddressKey, str] = {}
+        for city, street in addresses:
+            queries.setdefault(normalize_address(city, street), f"{street}, {city}")
+
+        if not queries:
+            return {}
+
+        resolved = await self._load_cached(list(queries))
+        misses = {key: query for key, query in queries.items() if key not in resolved}
+        if misses:
+            fetched = await self._resolve_batch(misses)
+            await self._store(fetched)
+            resolved.update(fetched)
+
+        return resolved
+
+    async def _load_cached(self, keys: List[AddressKey]) -> Dict[AddressKey, Optional[Coordinates]]:
+        now = datetime.utcnow()
+        positive_cutoff = now - timedelta(days=settings.GEOCODING_CACHE_TTL_DAYS)
+        negative_cutoff = now - timedelta(days=settings.GEOCODING_NEGATIVE_CACHE_TTL_DAYS)
+
+        cached: Dict[AddressKey, Optional[Coordinates]] = {}
+        for start in range(0, len(keys), _LOOKUP_CHUNK_SIZE):
+            chunk = keys[start:start + _LOOKUP_CHUNK_SIZE]
+            result = await self.db.execute(
+                select(AddressGeocode)
+                .where(tuple_(AddressGeocode.city_key, AddressGeocode.street_key).in_(chunk))
+            )
+            for entry in result.scalars():
+                cutoff = negative_cutoff if entry.is_negative else positive_cutoff
+                if entry.fetched_at < cutoff:
+                    continue
+                key = (entry.city_key, entry.street_key)
+                cached[key] = None if entry.is_negative else (entry.latitude, entry.longitude)
+        return cached
+
+    async def _resolve_batch(self, queries: Dict[AddressKey, str]) -> Dict[AddressKey, Optional[Coordinates]]:
+        semaphore = asyncio.Semaphore(max(1, settings.GEOCODING_CONCURRENCY))
+
+        async def resolve(key: AddressKey, query: str):
+            async with semaphore:
+                await self._throttle()
+                try:
+                    async with track_external("nominatim"):
+                        location = await asyncio.to_thread(self.geolocator.geocode, query)
+                except (GeocoderTimedOut, GeocoderServiceError) as e:
+                    # Временные ошибки не кэшируем, адрес будет запрошен снова
+                    logger.warning(f"Geocoding failed for '{query}': {e}")
+                    return key, False, None
+            if location is None:
+                return key, True, None
+            return key, True, (location.latitude, location.longitude)
+
+        results = await asyncio.gather(*(resolve(key, query) for key, query in queries.items()))
+        return {key: coordinates for key, ok, coordinates in results if ok}
+
+    async def _throttle(self) -> None:
+        async with self._rate_lock:
+            now = time.monotonic()
+            delay = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + settings.GEOCODING_MIN_INTERVAL
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _store(self, resolved: Dict[AddressKey, Optional[Coordinates]]) -> None:
+        if not resolved:
+            return
+
+        now = datetime.utcnow()
+        rows = [
+            {
+                "city_key": city_key,
+                "street_key": street_key,
+                "latitude": coordinates[0] if coordinates else None,
+                "longitude": coordinates[1] if coordinates else None,
+                "fetched_at": now,
+            }
+            for (city_key, street_key), coordinates in resolved.items()
+        ]
+        stmt = upsert_insert(self.db, AddressGeocode)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AddressGeocode.city_key, AddressGeocode.street_key],
+            set_={
+                "latitude": stmt.excluded.latitude,
+                "longitude": stmt.excluded.longitude,
+                "fetched_at": stmt.excluded.fetched_at,
+            }
+        )
+        # Фиксация транзакции остаётся за вызывающим кодом: отчёт может
+        # держать открытый серверный курсор в этой же сессии
+        await self.db.execute(stmt, rows)
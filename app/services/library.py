@@ -1,50 +1,60 @@
+from collections import Counter
 from datetime import date, datetime, timedelta
-from typing import Optional, Any, Sequence
-from sqlalchemy import select, and_, delete, Row, RowMapping
+from typing import Optional, Dict, List, Sequence, Tuple, Union, AsyncIterator
+from sqlalchemy import select, insert, and_, or_, delete, update, exists, literal, bindparam, func, case
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from app.models import Book, Reader, Loan, Address, Author, ArchivedLoan, ArchivedBook
+from sqlalchemy.orm import selectinload, contains_eager, aliased
+from app.models import Book, Reader, Loan, Address, Author, ArchivedLoan, ArchivedBook, Hold
 from app.schemas import BookCreate, ReaderCreate, ReaderUpdate, LoanCreate, BookUpdate
 from fastapi import HTTPException
-from app.external.book_rating_client import BookRatingClient
+from app.core.config import settings
+from app.db.dialect import dialect_name, upsert_insert
+from app.external.book_rating_client import rating_client
+from app.services.loan_archive import loan_history
+from app.services.entity_cache import entity_cache
+from app.services.loan_stats import LoanStatsService
+from app.services.report_cache import report_cache
+from app.services.visit_tracker import visit_tracker
 import logging
 
 logger = logging.getLogger(__name__)
 
+AVERAGE_LOAN_PERIOD_BY_WEEKS = 2
+
 
 class LibraryService:
     def __init__(self, db: AsyncSession):
         self.db = db
-        self.rating_client = BookRatingClient()
+        self.rating_client = rating_client
+        self.stats = LoanStatsService(db)
 
     # === Address Operations ===
     async def _get_or_create_address(self, city: str, street: str) -> int:
-        result = await self.db.execute(
-            select(Address.id).where(and_(Address.city == city, Address.street == street))
-        )
-        address_id = result.scalar_one_or_none()
-
-        if not address_id:
-            new_address = Address(city=city, street=street)
-            self.db.add(new_address)
-            await self.db.commit()
-            await self.db.refresh(new_address)
-            address_id = new_address.id
-
-        return address_id
+        # Адреса уникальны по (city, street); DO UPDATE нужен, чтобы RETURNING
+        # вернул id и для уже существующей строки
+        stmt = upsert_insert(self.db, Address).values(city=city, street=street)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Address.city, Address.street],
+            set_={"city": stmt.excluded.city}
+        ).returning(Address.id)
+        return await self.db.scalar(stmt)
 
     # === Book Operations ===
     async def create_book(self, book_data: BookCreate) -> Book:
-        author = await self._get_or_create_author(book_data.author_name)
+        author_id = await self._get_or_create_author_id(book_data.author_name)
 
         book = Book(
             title=book_data.title,
             genre=book_data.genre,
-            author_id=author.id,
+            author_id=author_id,
+            total_copies=book_data.total_copies,
+            available_copies=book_data.total_copies,
             is_available=True
         )
         self.db.add(book)
         await self.db.commit()
+        await report_cache.bump("books")
         await self.db.refresh(book)
 
         result = await self.db.execute(
@@ -52,131 +62,410 @@ class LibraryService:
         )
         return result.scalar_one()
 
-    async def _get_or_create_author(self, author_name: str) -> Author:
-        result = await self.db.execute(select(Author).where(Author.name == author_name))
-        author = result.scalar_one_or_none()
-        if not author:
+    async def _get_or_create_author_id(self, author_name: str) -> int:
+        async def load():
+            return await self.db.scalar(select(Author.id).where(Author.name == author_name))
+
+        author_id = await entity_cache.get_or_load("author", author_name, load)
+        if author_id is None:
             author = Author(name=author_name)
             self.db.add(author)
-            await self.db.commit()
-            await self.db.refresh(author)
-        return author
+            # Фиксирует вызывающий метод вместе с книгой; в кэш новый автор
+            # попадёт при следующем поиске, уже после фиксации
+            await self.db.flush()
+            author_id = author.id
+        return author_id
 
-    async def get_book(self, book_id: int) -> Optional[Book]:
+    async def _load_book(self, book_id: int) -> Optional[Book]:
         result = await self.db.execute(
             select(Book).options(selectinload(Book.author)).where(Book.id == book_id)
         )
         return result.scalar_one_or_none()
 
+    @staticmethod
+    def _book_snapshot(book: Book) -> dict:
+        # Без числа экземпляров: оно меняется при каждой выдаче
+        return {
+            "id": book.id,
+            "title": book.title,
+            "genre": book.genre,
+            "author": {"id": book.author.id, "name": book.author.name} if book.author else None,
+            "average_rating": book.average_rating,
+            "rating_fetched_at": book.rating_fetched_at
+        }
+
+    async def get_book(self, book_id: int) -> Optional[dict]:
+        """Метаданные книги из кэша сущностей; доступность сюда не входит."""
+        async def load():
+            book = await self._load_book(book_id)
+            return self._book_snapshot(book) if book else None
+
+        return await entity_cache.get_or_load("book", book_id, load)
+
     async def get_book_with_rating(self, book_id: int) -> dict:
-        result = await self.db.execute(
-            select(Book).options(selectinload(Book.author)).where(Book.id == book_id)
-        )
-        book = result.scalar_one_or_none()
+        book = await self.get_book(book_id)
 
         if not book:
             raise HTTPException(status_code=404, detail="Книга не найдена")
 
-        rating = await self.rating_client.get_rating(book.title)
+        # Внешний API опрашивается, только если сохранённый рейтинг устарел
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.RATING_STALE_AFTER)
+        if book["rating_fetched_at"] is None or book["rating_fetched_at"] < stale_before:
+            ratings = await self.rating_client.get_ratings([book["title"]], include_failed=False)
+            if book["title"] in ratings:
+                book["average_rating"] = ratings[book["title"]]
+                await self.db.execute(
+                    update(Book)
+                    .where(Book.id == book_id)
+                    .values(average_rating=book["average_rating"], rating_fetched_at=datetime.utcnow())
+                )
+                await self.db.commit()
+                await entity_cache.invalidate("book", book_id)
 
         return {
-            "id": book.id,
-            "title": book.title,
-            "genre": book.genre,
-            "author": book.author.name,
-            "average_rating": rating
+            "id": book["id"],
+            "title": book["title"],
+            "genre": book["genre"],
+            "author": book["author"]["name"] if book["author"] else None,
+            "average_rating": book["average_rating"]
         }
 
+    async def refresh_stale_ratings(self, batch_size: int = settings.RATING_REFRESH_BATCH_SIZE) -> int:
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.RATING_STALE_AFTER)
+        refreshed = 0
+        last_id = 0
+
+        while True:
+            result = await self.db.execute(
+                select(Book.id, Book.title)
+                .where(
+                    Book.id > last_id,
+                    or_(Book.rating_fetched_at.is_(None), Book.rating_fetched_at < stale_before)
+                )
+                .order_by(Book.id)
+                .limit(batch_size)
+            )
+            batch = result.all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            ratings = await self.rating_client.get_ratings(
+                (row.title for row in batch), include_failed=False
+            )
+            fetched_at = datetime.utcnow()
+            updates = [
+                {"book_id": row.id, "rating": ratings[row.title], "fetched_at": fetched_at}
+                for row in batch if row.title in ratings
+            ]
+            if updates:
+                await self.db.execute(
+                    update(Book)
+                    .where(Book.id == bindparam("book_id"))
+                    .values(average_rating=bindparam("rating"), rating_fetched_at=bindparam("fetched_at"))
+                    .execution_options(synchronize_session=False),
+                    updates
+                )
+                await self.db.commit()
+                await entity_cache.invalidate("book", *(row["book_id"] for row in updates))
+                refreshed += len(updates)
+
+        return refreshed
+
     async def update_book(self, book_id: int, book_data: BookUpdate) -> Book:
-        book = await self.get_book(book_id)
+        book = await self._load_book(book_id)
         if not book:
             raise ValueError("Book not found")
 
+        old_author_id, old_genre = book.author_id, book.genre
         if book_data.title is not None:
             book.title = book_data.title
         if book_data.genre is not None:
             book.genre = book_data.genre
         if book_data.author_name is not None:
-            author = await self._get_or_create_author(book_data.author_name)
-            book.author_id = author.id
+            book.author_id = await self._get_or_create_author_id(book_data.author_name)
+        assigned = []
+        if book_data.total_copies is not None:
+            assigned = await self._set_total_copies(book.id, book_data.total_copies)
 
+        await self.stats.book_reclassified(book.id, old_author_id, old_genre, book.author_id, book.genre)
         await self.db.commit()
+        await report_cache.bump(*(("books", "loans") if assigned else ("books",)))
+        await entity_cache.invalidate("book", book.id)
         await self.db.refresh(book)
         return book
 
-    async def delete_book(self, book_id: int) -> None:
-        result = await self.db.execute(
-            select(Book)
-            .options(selectinload(Book.loans), selectinload(Book.author))
-            .where(Book.id == book_id)
+    async def _set_total_copies(self, book_id: int, total_copies: int) -> List[Loan]:
+        """Меняет число экземпляров; добавленные сразу уходят читателям из очереди."""
+        row = (await self.db.execute(
+            select(Book.total_copies, Book.available_copies).where(Book.id == book_id).with_for_update()
+        )).one()
+        added = total_copies - row.total_copies
+        if added == 0:
+            return []
+        available = row.available_copies + added
+        if available < 0:
+            raise HTTPException(status_code=400, detail="Нельзя списать экземпляры, которые выданы читателям")
+
+        await self.db.execute(
+            update(Book.__table__)
+            .where(Book.__table__.c.id == book_id)
+            .values(total_copies=total_copies, available_copies=available, is_available=available > 0)
+        )
+        if added < 0:
+            return []
+        return await self._assign_holds({book_id: added})
+
+    async def _lock_books(self, conditions: list, after_id: int = 0, limit: Optional[int] = None) -> List[int]:
+        # Блокировка строк книг не даёт выдать их, пока идёт удаление
+        stmt = (
+            select(Book.id)
+            .outerjoin(Author, Author.id == Book.author_id)
+            .where(Book.id > after_id, *conditions)
+            .order_by(Book.id)
+            .with_for_update(of=Book)
+        )
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return list((await self.db.scalars(stmt)).all())
+
+    async def _books_on_loan(self, book_ids: List[int]) -> set:
+        return set((await self.db.scalars(
+            select(Loan.book_id).where(Loan.book_id.in_(book_ids), Loan.return_date.is_(None)).distinct()
+        )).all())
+
+    async def _archive_and_delete_books(self, book_ids: List[int]) -> int:
+        """Переносит книги и их займы в архив и удаляет их; возвращает число архивированных займов.
+
+        Число запросов не зависит от длины истории займов: счётчики,
+        архив и удаление — по одному INSERT ... SELECT или DELETE на таблицу.
+        Книги должны быть заблокированы и без открытых займов.
+        """
+        # Счётчики — до записи в архив, иначе история книги посчитается дважды
+        history = loan_history()
+        removed = await self.db.execute(
+            select(history.c.reader_id, Book.author_id, Book.genre, history.c.loan_date, func.count())
+            .join(Book, Book.id == history.c.book_id)
+            .where(Book.id.in_(book_ids))
+            .group_by(history.c.reader_id, Book.author_id, Book.genre, history.c.loan_date)
+        )
+        await self.stats.loans_removed(removed.all())
+
+        # Архив списанной книги помечается явно: её id может получить новая книга
+        await self.db.execute(
+            update(ArchivedLoan)
+            .where(ArchivedLoan.book_id.in_(book_ids), ArchivedLoan.book_deleted.is_(False))
+            .values(book_deleted=True)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.execute(
+            insert(ArchivedLoan).from_select(
+                ["original_loan_id", "book_id", "reader_id", "loan_date", "expected_return_date", "return_date",
+                 "book_deleted"],
+                select(Loan.id, Loan.book_id, Loan.reader_id, Loan.loan_date, Loan.expected_return_date,
+                       Loan.return_date, literal(True))
+                .where(Loan.book_id.in_(book_ids))
+            )
+        )
+        await self.db.execute(
+            insert(ArchivedBook).from_select(
+                ["original_book_id", "title", "genre", "author_name"],
+                select(Book.id, Book.title, func.coalesce(Book.genre, ""), func.coalesce(Author.name, ""))
+                .outerjoin(Author, Author.id == Book.author_id)
+                .where(Book.id.in_(book_ids))
+            )
         )
-        book = result.scalar_one_or_none()
+        loans_archived = (await self.db.execute(delete(Loan).where(Loan.book_id.in_(book_ids)))).rowcount
+        # Очередь на списанную книгу больше не будет разобрана
+        await self.db.execute(delete(Hold).where(Hold.book_id.in_(book_ids)))
+        await self.db.execute(delete(Book).where(Book.id.in_(book_ids)))
+        return loans_archived
 
-        if not book:
+    async def delete_book(self, book_id: int) -> None:
+        if not await self._lock_books([Book.id == book_id]):
             raise HTTPException(status_code=404, detail="Книга не найдена")
 
-        for loan in book.loans:
-            if loan.return_date is None:
-                raise HTTPException(status_code=400, detail="Нельзя удалить книгу: она всё ещё в займе")
-
-        for loan in book.loans:
-            archived_loan = ArchivedLoan(
-                original_loan_id=loan.id,
-                book_id=loan.book_id,
-                reader_id=loan.reader_id,
-                loan_date=loan.loan_date,
-                expected_return_date=loan.expected_return_date,
-                return_date=loan.return_date,
-            )
-            self.db.add(archived_loan)
-
-        archived_book = ArchivedBook(
-            original_book_id=book.id,
-            title=book.title,
-            genre=book.genre,
-            author_name=book.author.name,
-        )
-        self.db.add(archived_book)
+        if await self._books_on_loan([book_id]):
+            raise HTTPException(status_code=400, detail="Нельзя удалить книгу: она всё ещё в займе")
 
-        await self.db.execute(delete(Loan).where(Loan.book_id == book.id))
-        await self.db.delete(book)
+        await self._archive_and_delete_books([book_id])
         await self.db.commit()
+        await report_cache.bump("books", "loans")
+        await entity_cache.invalidate("book", book_id)
+
+    async def delete_books_bulk(
+            self,
+            book_ids: Optional[List[int]] = None,
+            genre: Optional[str] = None,
+            author: Optional[str] = None,
+            title_prefix: Optional[str] = None
+    ) -> Dict[str, int]:
+        """Списывает книги по фильтру в одной транзакции, пропуская выданные.
+
+        Книги обрабатываются группами по BOOK_DELETE_BATCH_SIZE, поэтому память
+        и размер списков параметров не растут с размером списания.
+        """
+        conditions = self._book_filters(genre=genre, author=author, title_prefix=title_prefix)
+        if book_ids is not None:
+            conditions.append(Book.id.in_(book_ids))
+
+        result = {"deleted": 0, "skipped_on_loan": 0, "loans_archived": 0}
+        deleted_ids = []
+        last_id = 0
+        while True:
+            locked = await self._lock_books(conditions, after_id=last_id, limit=settings.BOOK_DELETE_BATCH_SIZE)
+            if not locked:
+                break
+            last_id = locked[-1]
+            on_loan = await self._books_on_loan(locked)
+            deletable = [book_id for book_id in locked if book_id not in on_loan]
+            if deletable:
+                result["loans_archived"] += await self._archive_and_delete_books(deletable)
+                deleted_ids.extend(deletable)
+            result["deleted"] += len(deletable)
+            result["skipped_on_loan"] += len(on_loan)
 
-    async def get_available_books(self) -> Sequence[Row[Any] | RowMapping | Any]:
+        await self.db.commit()
+        if result["deleted"]:
+            await report_cache.bump("books", "loans")
+            await entity_cache.invalidate("book", *deleted_ids)
+        logger.info(f"Bulk book deletion: {result}")
+        return result
+
+    @staticmethod
+    def _book_filters(
+            genre: Optional[str] = None,
+            author: Optional[str] = None,
+            title_prefix: Optional[str] = None,
+            available_only: bool = False
+    ) -> list:
+        conditions = []
+        if available_only:
+            conditions.append(Book.is_available == True)
+        if genre is not None:
+            conditions.append(Book.genre == genre)
+        if author is not None:
+            conditions.append(Author.name == author)
+        if title_prefix:
+            conditions.append(Book.title.startswith(title_prefix, autoescape=True))
+        return conditions
+
+    async def list_books(
+            self,
+            after_id: int = 0,
+            limit: int = 50,
+            genre: Optional[str] = None,
+            author: Optional[str] = None,
+            title_prefix: Optional[str] = None,
+            available_only: bool = False
+    ) -> Tuple[Sequence[Book], Optional[int]]:
+        """Страница книг после after_id и курсор следующей страницы."""
+        # outerjoin: книги без автора (author_id IS NULL) тоже попадают в список
         result = await self.db.execute(
-            select(Book).options(selectinload(Book.author)).where(Book.is_available == True)
+            select(Book)
+            .outerjoin(Book.author)
+            .options(contains_eager(Book.author))
+            .where(Book.id > after_id, *self._book_filters(genre, author, title_prefix, available_only))
+            .order_by(Book.id)
+            .limit(limit + 1)
+        )
+        books = result.scalars().all()
+        if len(books) > limit:
+            return books[:limit], books[limit - 1].id
+        return books, None
+
+    async def get_available_books(self, after_id: int = 0, limit: int = 50, **filters) -> Tuple[Sequence[Book], Optional[int]]:
+        return await self.list_books(after_id, limit, available_only=True, **filters)
+
+    async def stream_books(
+            self,
+            after_id: int = 0,
+            genre: Optional[str] = None,
+            author: Optional[str] = None,
+            title_prefix: Optional[str] = None,
+            available_only: bool = False
+    ) -> AsyncIterator[dict]:
+        """Книги по мере чтения серверным курсором, без загрузки ORM-объектов."""
+        stmt = (
+            select(
+                Book.id,
+                Book.title,
+                Book.genre,
+                Book.is_available,
+                Book.total_copies,
+                Book.available_copies,
+                Book.average_rating,
+                Author.id.label("author_id"),
+                Author.name.label("author_name")
+            )
+            .outerjoin(Book.author)
+            .where(Book.id > after_id, *self._book_filters(genre, author, title_prefix, available_only))
+            .order_by(Book.id)
+            .execution_options(yield_per=settings.BOOK_STREAM_BATCH_SIZE)
         )
-        return result.scalars().all()
+        result = await self.db.stream(stmt)
+        async for row in result:
+            yield {
+                "id": row.id,
+                "title": row.title,
+                "genre": row.genre,
+                "author": {"id": row.author_id, "name": row.author_name} if row.author_id is not None else None,
+                "is_available": row.is_available,
+                "total_copies": row.total_copies,
+                "available_copies": row.available_copies,
+                "average_rating": row.average_rating
+            }
 
     # === Reader Operations ===
     async def create_reader(self, reader_data: ReaderCreate) -> Reader:
-        address = Address(**reader_data.address.model_dump())
-        self.db.add(address)
-        await self.db.flush()
+        address_id = await self._get_or_create_address(
+            reader_data.address.city,
+            reader_data.address.street
+        )
 
-        reader = Reader(name=reader_data.name, address=address, last_visit=datetime.utcnow())
+        reader = Reader(name=reader_data.name, address_id=address_id, last_visit=date.today())
         self.db.add(reader)
         await self.db.flush()
         reader_id = reader.id
         await self.db.commit()
+        await report_cache.bump("readers")
 
         stmt = select(Reader).options(selectinload(Reader.address)).where(Reader.id == reader_id)
         result = await self.db.execute(stmt)
         return result.scalar_one()
 
-    async def get_reader(self, reader_id: int) -> Optional[Reader]:
+    async def _load_reader(self, reader_id: int) -> Optional[Reader]:
         result = await self.db.execute(
             select(Reader).options(selectinload(Reader.address)).where(Reader.id == reader_id)
         )
-        reader = result.scalar_one_or_none()
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    def _reader_snapshot(reader: Reader) -> dict:
+        return {
+            "id": reader.id,
+            "name": reader.name,
+            "last_visit": reader.last_visit,
+            "address": {"id": reader.address.id, "city": reader.address.city, "street": reader.address.street}
+        }
+
+    async def get_reader(self, reader_id: int) -> Optional[dict]:
+        """Карточка читателя из кэша сущностей.
+
+        Только чтение: визит записывается в БД позже пачкой (VisitTracker),
+        после записи карточка удаляется из кэша.
+        """
+        async def load():
+            reader = await self._load_reader(reader_id)
+            return self._reader_snapshot(reader) if reader else None
+
+        reader = await entity_cache.get_or_load("reader", reader_id, load)
         if reader:
-            reader.last_visit = datetime.utcnow()
-            await self.db.commit()
-            await self.db.refresh(reader)
+            await visit_tracker.record(reader_id)
         return reader
 
     async def update_reader(self, reader_id: int, reader_data: ReaderUpdate) -> Reader:
-        reader = await self.get_reader(reader_id)
+        reader = await self._load_reader(reader_id)
         if not reader:
             raise ValueError("Reader not found")
 
@@ -187,9 +476,12 @@ class LibraryService:
 
         reader.name = reader_data.name
         reader.address_id = address_id
-        reader.last_visit = datetime.utcnow()
+        # last_visit — столбец Date: datetime остался бы в объекте и после commit
+        reader.last_visit = date.today()
 
         await self.db.commit()
+        await report_cache.bump("readers")
+        await entity_cache.invalidate("reader", reader_id)
         await self.db.refresh(reader)
         return reader
 
@@ -200,53 +492,340 @@ class LibraryService:
         if result.scalar_one_or_none():
             raise ValueError("Cannot delete a reader with active loans")
 
+        await self.db.execute(delete(Hold).where(Hold.reader_id == reader_id))
         await self.db.execute(delete(Reader).where(Reader.id == reader_id))
         await self.db.commit()
+        await report_cache.bump("readers")
+        await entity_cache.invalidate("reader", reader_id)
 
     # === Loan Operations ===
-    async def create_loan(self, loan_data: LoanCreate) -> Loan:
-        AVERAGE_LOAN_PERIOD_BY_WEEKS = 2
-        book = await self.get_book(loan_data.book_id)
-        if not book or not book.is_available:
-            raise ValueError("Book not available or already loaned out")
-
-        reader = await self.get_reader(loan_data.reader_id)
-        if not reader:
-            raise ValueError("Reader not found")
-
+    async def _checkout_books(self, reader_id: int, book_ids: List[int]) -> List[Loan]:
+        """Выдаёт читателю доступные книги из book_ids.
+
+        Экземпляр списывается условным UPDATE ... WHERE available_copies > 0 по
+        первичному ключу, поэтому последний экземпляр достаётся ровно одной из
+        одновременных выдач. Возвращает созданные займы; транзакцию фиксирует
+        вызывающий код.
+        """
         today = date.today()
         expected_return = today + timedelta(weeks=AVERAGE_LOAN_PERIOD_BY_WEEKS)
+        books, readers = Book.__table__, Reader.__table__
+
+        if dialect_name(self.db) == "postgresql":
+            # Один запрос: захват книг и вставка займов
+            claimed = (
+                update(books)
+                .where(
+                    books.c.id.in_(book_ids),
+                    books.c.available_copies > 0,
+                    exists().where(readers.c.id == reader_id)
+                )
+                .values(available_copies=books.c.available_copies - 1, is_available=books.c.available_copies > 1)
+                .returning(books.c.id)
+                .cte("claimed")
+            )
+            stmt = (
+                insert(Loan)
+                .from_select(
+                    ["book_id", "reader_id", "loan_date", "expected_return_date"],
+                    select(claimed.c.id, literal(reader_id), literal(today), literal(expected_return))
+                )
+                .returning(Loan)
+            )
+            loans = list((await self.db.scalars(stmt)).all())
+            await self._loans_opened(reader_id, loans)
+            return loans
+
+        claimed_ids = (await self.db.scalars(
+            update(books)
+            .where(
+                books.c.id.in_(book_ids),
+                books.c.available_copies > 0,
+                exists().where(readers.c.id == reader_id)
+            )
+            .values(available_copies=books.c.available_copies - 1, is_available=books.c.available_copies > 1)
+            .returning(books.c.id)
+        )).all()
+        if not claimed_ids:
+            return []
+        rows = [
+            {"book_id": book_id, "reader_id": reader_id,
+             "loan_date": today, "expected_return_date": expected_return}
+            for book_id in claimed_ids
+        ]
+        loans = list((await self.db.scalars(insert(Loan).returning(Loan), rows)).all())
+        await self._loans_opened(reader_id, loans)
+        return loans
+
+    async def _loans_opened(self, reader_id: int, loans: List[Loan]) -> None:
+        await self.stats.loans_opened(loans)
+        if loans:
+            # Визит пишется отложенно, строка читателя не блокируется выдачей
+            await visit_tracker.record(reader_id)
+
+    async def _return_loans(self, loan_ids: List[int]) -> List[Loan]:
+        """Закрывает открытые займы из loan_ids и возвращает экземпляры на полку.
+
+        Если на книгу есть очередь, вернувшийся экземпляр в той же транзакции
+        выдаётся первому ожидающему читателю (_assign_holds).
+        """
+        loans, books = Loan.__table__, Book.__table__
+        today = date.today()
+        close_loans = (
+            update(loans)
+            .where(loans.c.id.in_(loan_ids), loans.c.return_date.is_(None))
+            .values(return_date=today)
+            .returning(*loans.c)
+        )
 
-        loan = Loan(
-            book_id=loan_data.book_id,
-            reader_id=loan_data.reader_id,
-            loan_date=today,
-            expected_return_date=expected_return
+        if dialect_name(self.db) == "postgresql":
+            returned = close_loans.cte("returned")
+            copies = (
+                select(returned.c.book_id, func.count().label("copies"))
+                .group_by(returned.c.book_id)
+                .cte("copies")
+            )
+            freed = (
+                update(books)
+                .where(books.c.id == copies.c.book_id)
+                .values(available_copies=books.c.available_copies + copies.c.copies, is_available=True)
+                .returning(books.c.id)
+                .cte("freed")
+            )
+            # CTE с изменением данных выполняется, даже если на неё нет ссылок
+            rows = (await self.db.execute(select(returned).add_cte(freed))).all()
+        else:
+            rows = (await self.db.execute(close_loans)).all()
+            if rows:
+                await self._shelve_copies(Counter(row.book_id for row in rows))
+
+        await self.stats.loans_returned(rows)
+        if rows:
+            await self._assign_holds(Counter(row.book_id for row in rows))
+        return [Loan(**row._mapping) for row in rows]
+
+    async def _shelve_copies(self, copies: Dict[int, int]) -> None:
+        """Прибавляет к available_copies книг число экземпляров (может быть отрицательным)."""
+        books = Book.__table__
+        available = books.c.available_copies + bindparam("copies")
+        await self.db.execute(
+            update(books)
+            .where(books.c.id == bindparam("shelved_book_id"))
+            .values(available_copies=available, is_available=available > 0),
+            [{"shelved_book_id": book_id, "copies": count} for book_id, count in copies.items()]
         )
 
-        book.is_available = False
-        self.db.add(loan)
+    async def _assign_holds(self, freed: Dict[int, int]) -> List[Loan]:
+        """Выдаёт освободившиеся экземпляры первым читателям из очереди (FIFO).
+
+        freed — сколько экземпляров каждой книги только что вернулось на полку.
+        Строки этих книг уже заблокированы обновлением available_copies, поэтому
+        одну очередь не разберут две транзакции сразу. Возвращает созданные займы.
+        """
+        position = func.row_number().over(partition_by=Hold.book_id, order_by=Hold.id).label("position")
+        queue = (
+            select(Hold.id, Hold.book_id, Hold.reader_id, position)
+            .where(Hold.book_id.in_(freed), Hold.fulfilled_at.is_(None))
+            .subquery()
+        )
+        result = await self.db.execute(
+            select(queue)
+            .where(queue.c.position <= max(freed.values()))
+            .order_by(queue.c.book_id, queue.c.position)
+        )
+        holds = [row for row in result if row.position <= freed[row.book_id]]
+        if not holds:
+            return []
+
+        now = datetime.utcnow()
+        today = now.date()
+        expected_return = today + timedelta(weeks=AVERAGE_LOAN_PERIOD_BY_WEEKS)
+        loans = list((await self.db.scalars(
+            insert(Loan).returning(Loan, sort_by_parameter_order=True),
+            [
+                {"book_id": hold.book_id, "reader_id": hold.reader_id,
+                 "loan_date": today, "expected_return_date": expected_return}
+                for hold in holds
+            ]
+        )).all())
+        hold_table = Hold.__table__
+        await self.db.execute(
+            update(hold_table)
+            .where(hold_table.c.id == bindparam("hold_id"))
+            .values(fulfilled_at=now, loan_id=bindparam("hold_loan_id")),
+            [{"hold_id": hold.id, "hold_loan_id": loan.id} for hold, loan in zip(holds, loans)]
+        )
+        await self._shelve_copies({book_id: -count for book_id, count in Counter(h.book_id for h in holds).items()})
+        await self.stats.loans_opened(loans)
+        logger.info(f"Assigned {len(loans)} returned copies to readers waiting in hold queues")
+        return loans
+
+    async def create_loans_bulk(
+            self, reader_id: int, book_ids: List[int], atomic: bool = False
+    ) -> Dict[int, Union[Loan, str]]:
+        """Выдаёт корзину книг за постоянное число запросов.
+
+        Возвращает для каждой книги созданный займ или текст ошибки.
+        """
+        book_ids = list(dict.fromkeys(book_ids))
+        loans = {loan.book_id: loan for loan in await self._checkout_books(reader_id, book_ids)}
+        failed = [book_id for book_id in book_ids if book_id not in loans]
+
+        errors: Dict[int, str] = {}
+        if failed:
+            reader_exists = await self.db.scalar(select(Reader.id).where(Reader.id == reader_id))
+            existing_books = set((await self.db.scalars(select(Book.id).where(Book.id.in_(failed)))).all())
+            for book_id in failed:
+                if not reader_exists:
+                    errors[book_id] = "Reader not found"
+                elif book_id not in existing_books:
+                    errors[book_id] = "Book not found"
+                else:
+                    errors[book_id] = "Book not available or already loaned out"
+
+        if errors and atomic:
+            await self.db.rollback()
+            return {
+                book_id: errors.get(book_id, "Cancelled: other books in the cart failed")
+                for book_id in book_ids
+            }
+
         await self.db.commit()
-        await self.db.refresh(loan)
-        return loan
+        await report_cache.bump("loans")
+        return {book_id: loans.get(book_id) or errors[book_id] for book_id in book_ids}
+
+    async def return_loans_bulk(self, loan_ids: List[int], atomic: bool = False) -> Dict[int, Union[Loan, str]]:
+        loan_ids = list(dict.fromkeys(loan_ids))
+        loans = {loan.id: loan for loan in await self._return_loans(loan_ids)}
+        failed = [loan_id for loan_id in loan_ids if loan_id not in loans]
+
+        errors: Dict[int, str] = {}
+        if failed:
+            existing_loans = set((await self.db.scalars(select(Loan.id).where(Loan.id.in_(failed)))).all())
+            existing_loans.update((await self.db.scalars(
+                select(ArchivedLoan.original_loan_id).where(ArchivedLoan.original_loan_id.in_(failed))
+            )).all())
+            for loan_id in failed:
+                if loan_id in existing_loans:
+                    errors[loan_id] = "Book has already been returned"
+                else:
+                    errors[loan_id] = "Loan not found"
+
+        if errors and atomic:
+            await self.db.rollback()
+            return {
+                loan_id: errors.get(loan_id, "Cancelled: other loans in the request failed")
+                for loan_id in loan_ids
+            }
 
-    async def return_loan(self, loan_id: int) -> Loan:
-        result = await self.db.execute(select(Loan).where(Loan.id == loan_id))
-        loan = result.scalar_one_or_none()
+        await self.db.commit()
+        await report_cache.bump("loans")
+        return {loan_id: loans.get(loan_id) or errors[loan_id] for loan_id in loan_ids}
+
+    async def create_loan(self, loan_data: LoanCreate) -> Loan:
+        loans = await self._checkout_books(loan_data.reader_id, [loan_data.book_id])
+        if not loans:
+            await self.db.rollback()
+            book_available = await self.db.scalar(
+                select(Book.id).where(Book.id == loan_data.book_id, Book.is_available == True)
+            )
+            if not book_available:
+                raise ValueError("Book not available or already loaned out")
+            raise ValueError("Reader not found")
 
-        if not loan:
-            raise HTTPException(status_code=404, detail="Loan not found")
+        await self.db.commit()
+        await report_cache.bump("loans")
+        return loans[0]
 
-        if loan.return_date is not None:
+    async def return_loan(self, loan_id: int) -> Loan:
+        loans = await self._return_loans([loan_id])
+        if not loans:
+            await self.db.rollback()
+            # Займ мог уйти в архив — он тоже уже возвращён
+            loan_exists = await self.db.scalar(
+                select(exists().where(Loan.id == loan_id))
+            ) or await self.db.scalar(
+                select(exists().where(ArchivedLoan.original_loan_id == loan_id))
+            )
+            if not loan_exists:
+                raise HTTPException(status_code=404, detail="Loan not found")
             logger.warning(f"Attempt to return already returned loan (id={loan_id}) on {date.today()}")
             raise HTTPException(status_code=409, detail="Book has already been returned")
 
-        loan.return_date = date.today()
+        await self.db.commit()
+        await report_cache.bump("loans")
+        return loans[0]
+
+    # === Hold Operations ===
+    @staticmethod
+    def _holds_query():
+        # Место в очереди: ожидающие той же книги, вставшие не позже (индекс ix_holds_waiting)
+        ahead = aliased(Hold)
+        position = (
+            select(func.count())
+            .where(ahead.book_id == Hold.book_id, ahead.fulfilled_at.is_(None), ahead.id <= Hold.id)
+            .correlate(Hold)
+            .scalar_subquery()
+        )
+        return select(
+            Hold.id, Hold.book_id, Hold.reader_id, Hold.created_at, Hold.fulfilled_at, Hold.loan_id,
+            case((Hold.fulfilled_at.is_(None), position)).label("position")
+        )
 
-        book = await self.get_book(loan.book_id)
-        if book:
-            book.is_available = True
+    async def place_hold(self, reader_id: int, book_id: int) -> dict:
+        """Ставит читателя в очередь на книгу, у которой нет свободных экземпляров."""
+        # Блокировка строки книги упорядочивает постановку в очередь с возвратами:
+        # вернувшийся экземпляр не останется на полке при непустой очереди
+        available = await self.db.scalar(
+            select(Book.available_copies).where(Book.id == book_id).with_for_update()
+        )
+        if available is None:
+            raise ValueError("Book not found")
+        if available > 0:
+            raise ValueError("Book is available, no hold needed")
+        if not await self.db.scalar(select(exists().where(Reader.id == reader_id))):
+            raise ValueError("Reader not found")
 
+        hold = Hold(book_id=book_id, reader_id=reader_id, created_at=datetime.utcnow())
+        self.db.add(hold)
+        try:
+            await self.db.flush()
+        except IntegrityError:
+            await self.db.rollback()
+            raise ValueError("Reader is already waiting for this book")
+        hold_id = hold.id
+        await self.db.commit()
+
+        result = await self.db.execute(self._holds_query().where(Hold.id == hold_id))
+        return dict(result.one()._mapping)
+
+    async def list_holds(
+            self,
+            reader_id: Optional[int] = None,
+            book_id: Optional[int] = None,
+            waiting_only: bool = True,
+            limit: int = 100
+    ) -> List[dict]:
+        stmt = self._holds_query().order_by(Hold.id).limit(limit)
+        if reader_id is not None:
+            stmt = stmt.where(Hold.reader_id == reader_id)
+        if book_id is not None:
+            stmt = stmt.where(Hold.book_id == book_id)
+        if waiting_only:
+            stmt = stmt.where(Hold.fulfilled_at.is_(None))
+        result = await self.db.execute(stmt)
+        return [dict(row._mapping) for row in result]
+
+    async def cancel_hold(self, hold_id: int) -> None:
+        book_id = await self.db.scalar(select(Hold.book_id).where(Hold.id == hold_id))
+        if book_id is None:
+            raise ValueError("Hold not found")
+        # Та же блокировка, что и при разборе очереди: отменённое место не получит экземпляр
+        await self.db.execute(select(Book.id).where(Book.id == book_id).with_for_update())
+        deleted = (await self.db.execute(
+            delete(Hold).where(Hold.id == hold_id, Hold.fulfilled_at.is_(None))
+        )).rowcount
+        if not deleted:
+            await self.db.rollback()
+            raise HTTPException(status_code=409, detail="Hold has already been fulfilled")
         await self.db.commit()
-        await self.db.refresh(loan)
-        return loan
@@ -0,0 +1,113 @@
+"""Перенос старых возвращённых займов из loans в archived_loans."""
+import logging
+from datetime import date, timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy import select, delete, insert, union_all, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.dialect import dialect_name
+from app.models import Loan, ArchivedLoan
+
+logger = logging.getLogger(__name__)
+
+_LOAN_COLUMNS = ["book_id", "reader_id", "loan_date", "expected_return_date", "return_date"]
+# book_deleted задаётся явно: INSERT ... SELECT не подставляет значение по умолчанию
+_ARCHIVE_COLUMNS = ["original_loan_id"] + _LOAN_COLUMNS + ["book_deleted"]
+
+
+def loan_history():
+    """Подзапрос со всей историей займов: горячая таблица loans и архив.
+
+    Архивные займы удалённых книг (book_deleted) не входят — история, как
+    и счётчики, ведётся по книгам, которые есть в каталоге. id архивного
+    займа — его исходный id в loans.
+    """
+    hot = select(Loan.id, *[getattr(Loan, name) for name in _LOAN_COLUMNS])
+    cold = (
+        select(ArchivedLoan.original_loan_id.label("id"), *[getattr(ArchivedLoan, name) for name in _LOAN_COLUMNS])
+        .where(ArchivedLoan.book_deleted.is_(False))
+    )
+    return union_all(hot, cold).subquery("loan_history")
+
+
+class LoanArchiver:
+    """Переносит возвращённые займы старше заданного возраста пачками.
+
+    Каждая пачка — отдельная короткая транзакция, поэтому блокировки
+    строк loans держатся только на время переноса одной пачки.
+    Счётчики займов не меняются: архивные займы остаются в истории.
+    """
+
+    def __init__(self, db: AsyncSession, batch_size: Optional[int] = None):
+        self.db = db
+        self.batch_size = batch_size or settings.LOAN_ARCHIVE_BATCH_SIZE
+
+    def _candidates(self, cutoff: date):
+        # Идёт по индексу ix_loans_returned; строки с пустыми полями архив не примет
+        return (
+            select(Loan.id)
+            .where(
+                Loan.return_date < cutoff,
+                *[getattr(Loan, name).is_not(None) for name in _LOAN_COLUMNS[:-1]]
+            )
+            .order_by(Loan.return_date)
+            .limit(self.batch_size)
+        )
+
+    async def archive_batch(self, cutoff: date) -> int:
+        """Переносит одну пачку займов, вернувшихся раньше cutoff; транзакцию фиксирует вызывающий код."""
+        if dialect_name(self.db) == "postgresql":
+            # Один запрос: DELETE ... RETURNING кормит INSERT в архив.
+            # SKIP LOCKED пропускает строки, занятые параллельным запуском
+            moved = (
+                delete(Loan)
+                .where(Loan.id.in_(self._candidates(cutoff).with_for_update(skip_locked=True)))
+                .returning(Loan.id, *[getattr(Loan, name) for name in _LOAN_COLUMNS])
+                .cte("moved")
+            )
+            stmt = (
+                insert(ArchivedLoan)
+                .from_select(_ARCHIVE_COLUMNS, select(moved, literal(False)))
+                .returning(ArchivedLoan.id)
+            )
+            return len((await self.db.scalars(stmt)).all())
+
+        loan_ids: List[int] = list((await self.db.scalars(self._candidates(cutoff))).all())
+        if not loan_ids:
+            return 0
+        await self.db.execute(
+            insert(ArchivedLoan).from_select(
+                _ARCHIVE_COLUMNS,
+                select(Loan.id, *[getattr(Loan, name) for name in _LOAN_COLUMNS], literal(False))
+                .where(Loan.id.in_(loan_ids))
+            )
+        )
+        await self.db.execute(delete(Loan).where(Loan.id.in_(loan_ids)))
+        return len(loan_ids)
+
+    async def archive(
+            self,
+            older_than_days: Optional[int] = None,
+            progress: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """Архивирует все займы, возвращённые более older_than_days дней назад."""
+        if older_than_days is None:
+            older_than_days = settings.LOAN_ARCHIVE_AFTER_DAYS
+        cutoff = date.today() - timedelta(days=older_than_days)
+
+        total = 0
+        while True:
+            moved = await self.archive_batch(cutoff)
+            await self.db.commit()
+            total += moved
+            if progress:
+                progress(total)
+            if moved < self.batch_size:
+                break
+        logger.info(f"Archived {total} loans returned before {cutoff}")
+        return total
+
+
+__all__ = ["LoanArchiver", "loan_history"]
@@ -0,0 +1,233 @@
+import logging
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, func, delete, insert, case, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.dialect import dialect_name, upsert_insert
+from app.models import (
+    Book, Loan, ArchivedLoan,
+    ReaderLoanStats, AuthorLoanStats, GenreLoanStats, ReaderGenreStats, DailyLoanStats
+)
+from app.services.loan_archive import loan_history
+
+logger = logging.getLogger(__name__)
+
+
+class LoanStatsService:
+    """Счётчики займов по читателям, авторам и жанрам и дневные итоги.
+
+    Счётчики меняются в той же транзакции, что и сами займы, поэтому отчёты
+    читают готовые строки вместо агрегации всей таблицы loans. Автор и жанр
+    займа берутся у книги; при их изменении счётчики книги переносятся.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    # === Incremental updates ===
+    async def loans_opened(self, loans: Sequence) -> None:
+        if not loans:
+            return
+        result = await self.db.execute(
+            select(Book.id, Book.author_id, Book.genre)
+            .where(Book.id.in_({loan.book_id for loan in loans}))
+        )
+        books = {row.id: (row.author_id, row.genre) for row in result}
+
+        deltas = _Deltas()
+        for loan in loans:
+            author_id, genre = books[loan.book_id]
+            deltas.add_history(loan.reader_id, author_id, genre, loan.loan_date, 1)
+            deltas.add_on_hand(loan.reader_id, 1)
+        await self._apply(deltas)
+
+    async def loans_returned(self, loans: Sequence) -> None:
+        deltas = _Deltas()
+        for loan in loans:
+            deltas.add_on_hand(loan.reader_id, -1)
+        await self._apply(deltas)
+
+    async def loans_removed(
+            self, entries: Iterable[Tuple[int, Optional[int], Optional[str], date, int]]
+    ) -> None:
+        """Убирает из счётчиков историю (reader_id, author_id, genre, loan_date, count)."""
+        deltas = _Deltas()
+        for reader_id, author_id, genre, loan_date, count in entries:
+            deltas.add_history(reader_id, author_id, genre, loan_date, -count)
+        await self._apply(deltas)
+
+    async def book_reclassified(
+            self,
+            book_id: int,
+            old_author_id: Optional[int],
+            old_genre: Optional[str],
+            new_author_id: Optional[int],
+            new_genre: Optional[str]
+    ) -> None:
+        if old_author_id == new_author_id and old_genre == new_genre:
+            return
+        # Переносится вся история книги, включая архив: её же считают rebuild и verify
+        history = loan_history()
+        result = await self.db.execute(
+            select(history.c.reader_id, history.c.loan_date, func.count(history.c.id))
+            .where(history.c.book_id == book_id)
+            .group_by(history.c.reader_id, history.c.loan_date)
+        )
+        deltas = _Deltas()
+        for reader_id, loan_date, count in result.all():
+            deltas.add_history(reader_id, old_author_id, old_genre, loan_date, -count, include_reader=False)
+            deltas.add_history(reader_id, new_author_id, new_genre, loan_date, count, include_reader=False)
+        await self._apply(deltas)
+
+    async def _apply(self, deltas: "_Deltas") -> None:
+        # Ключи сортируются, чтобы параллельные транзакции блокировали строки
+        # в одном порядке
+        await self._upsert(ReaderLoanStats, ["reader_id"], [
+            {"reader_id": reader_id, "total_loans": total, "on_hand": on_hand}
+            for reader_id, (total, on_hand) in sorted(deltas.readers.items())
+            if total or on_hand
+        ])
+        await self._upsert(AuthorLoanStats, ["author_id"], [
+            {"author_id": author_id, "loan_count": count}
+            for author_id, count in sorted(deltas.authors.items()) if count
+        ])
+        await self._upsert(GenreLoanStats, ["genre"], [
+            {"genre": genre, "loan_count": count}
+            for genre, count in sorted(deltas.genres.items()) if count
+        ])
+        await self._upsert(ReaderGenreStats, ["reader_id", "genre"], [
+            {"reader_id": reader_id, "genre": genre, "loan_count": count}
+            for (reader_id, genre), count in sorted(deltas.reader_genres.items()) if count
+        ])
+        await self._upsert(DailyLoanStats, ["day", "author_id", "genre"], [
+            {"day": day, "author_id": author_id, "genre": genre, "loan_count": count}
+            for (day, author_id, genre), count in sorted(deltas.daily.items()) if count
+        ])
+
+    async def _upsert(self, model, key_columns: List[str], rows: List[dict]) -> None:
+        if not rows:
+            return
+        counters = [name for name in rows[0] if name not in key_columns]
+        stmt = upsert_insert(self.db, model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={name: getattr(model, name) + getattr(stmt.excluded, name) for name in counters}
+        )
+        await self.db.execute(stmt, rows)
+
+    # === Rebuild / verify ===
+    @staticmethod
+    def _expected() -> Dict[str, Tuple[type, List[str], object]]:
+        # Счётчики покрывают и горячие займы, и архив
+        history = loan_history()
+        loans_with_books = select(
+            history.c.reader_id, history.c.loan_date, history.c.return_date, Book.author_id, Book.genre
+        ).join(Book, Book.id == history.c.book_id).subquery()
+        return {
+            "reader_loan_stats": (ReaderLoanStats, ["reader_id"], (
+                select(
+                    history.c.reader_id,
+                    func.count(),
+                    func.sum(case((history.c.return_date.is_(None), 1), else_=0))
+                ).where(history.c.reader_id.is_not(None)).group_by(history.c.reader_id)
+            )),
+            "author_loan_stats": (AuthorLoanStats, ["author_id"], (
+                select(loans_with_books.c.author_id, func.count())
+                .where(loans_with_books.c.author_id.is_not(None))
+                .group_by(loans_with_books.c.author_id)
+            )),
+            "genre_loan_stats": (GenreLoanStats, ["genre"], (
+                select(loans_with_books.c.genre, func.count())
+                .where(loans_with_books.c.genre.is_not(None))
+                .group_by(loans_with_books.c.genre)
+            )),
+            "reader_genre_stats": (ReaderGenreStats, ["reader_id", "genre"], (
+                select(loans_with_books.c.reader_id, loans_with_books.c.genre, func.count())
+                .where(loans_with_books.c.genre.is_not(None), loans_with_books.c.reader_id.is_not(None))
+                .group_by(loans_with_books.c.reader_id, loans_with_books.c.genre)
+            )),
+            "daily_loan_stats": (DailyLoanStats, ["day", "author_id", "genre"], (
+                select(
+                    loans_with_books.c.loan_date,
+                    loans_with_books.c.author_id,
+                    loans_with_books.c.genre,
+                    func.count()
+                )
+                .where(
+                    loans_with_books.c.loan_date.is_not(None),
+                    loans_with_books.c.author_id.is_not(None),
+                    loans_with_books.c.genre.is_not(None)
+                )
+                .group_by(loans_with_books.c.loan_date, loans_with_books.c.author_id, loans_with_books.c.genre)
+            )),
+        }
+
+    async def rebuild(self) -> None:
+        """Пересчитывает все счётчики по сырым займам в одной транзакции."""
+        if dialect_name(self.db) == "postgresql":
+            # Запрещаем запись и архивацию займов на время пересчёта, чтение остаётся доступным
+            await self.db.execute(
+                text(f"LOCK TABLE {Loan.__tablename__}, {ArchivedLoan.__tablename__} IN SHARE MODE")
+            )
+        for model, _, query in self._expected().values():
+            columns = [column.name for column in model.__table__.columns]
+            await self.db.execute(delete(model))
+            await self.db.execute(insert(model).from_select(columns, query))
+        await self.db.commit()
+
+    async def verify(self) -> List[dict]:
+        """Расхождения счётчиков с сырыми займами; пустой список — всё сходится."""
+        mismatches = []
+        for table, (model, key_columns, query) in self._expected().items():
+            columns = [column.name for column in model.__table__.columns]
+            value_columns = [name for name in columns if name not in key_columns]
+            split = len(key_columns)
+            expected = {
+                tuple(row)[:split]: tuple(row)[split:]
+                for row in (await self.db.execute(query)).all()
+            }
+            actual_rows = await self.db.execute(select(*[getattr(model, name) for name in columns]))
+            actual = {
+                tuple(row)[:split]: tuple(row)[split:]
+                for row in actual_rows.all()
+                if any(tuple(row)[split:])
+            }
+            for key in expected.keys() | actual.keys():
+                zeros = (0,) * len(value_columns)
+                if expected.get(key, zeros) != actual.get(key, zeros):
+                    mismatches.append({
+                        "table": table,
+                        "key": dict(zip(key_columns, key)),
+                        "expected": dict(zip(value_columns, expected.get(key, zeros))),
+                        "actual": dict(zip(value_columns, actual.get(key, zeros))),
+                    })
+        return mismatches
+
+
+class _Deltas:
+    def __init__(self):
+        self.readers: Dict[int, List[int]] = {}
+        self.authors: Counter = Counter()
+        self.genres: Counter = Counter()
+        self.reader_genres: Counter = Counter()
+        self.daily: Counter = Counter()
+
+    def add_history(self, reader_id, author_id, genre, loan_date, count: int, include_reader: bool = True) -> None:
+        if include_reader:
+            self.readers.setdefault(reader_id, [0, 0])[0] += count
+        if author_id is not None:
+            self.authors[author_id] += count
+        if genre is not None:
+            self.genres[genre] += count
+            self.reader_genres[(reader_id, genre)] += count
+        if loan_date is not None and author_id is not None and genre is not None:
+            self.daily[(loan_date, author_id, genre)] += count
+
+    def add_on_hand(self, reader_id, count: int) -> None:
+        self.readers.setdefault(reader_id, [0, 0])[1] += count
+
+
+__all__ = ["LoanStatsService"]
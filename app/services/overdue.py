@@ -0,0 +1,124 @@
+import logging
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.external.notifiers import Notifier
+from app.models import Loan, Book, Reader
+
+logger = logging.getLogger(__name__)
+
+
+def _overdue(as_of: date) -> list:
+    # Условия совпадают с частичным индексом ix_loans_overdue
+    return [Loan.return_date.is_(None), Loan.expected_return_date < as_of]
+
+
+class OverdueService:
+    """Просроченные займы: выборка, сводка по читателям и рассылка уведомлений.
+
+    Все запросы идут по частичному индексу открытых займов по сроку
+    возврата, поэтому возвращённые займы не читаются вовсе.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def list_overdue(
+            self, after_id: int = 0, limit: int = 50, as_of: Optional[date] = None
+    ) -> Tuple[List[dict], Optional[int]]:
+        as_of = as_of or date.today()
+        result = await self.db.execute(
+            self._notices_query(as_of)
+            .where(Loan.id > after_id)
+            .order_by(Loan.id)
+            .limit(limit)
+        )
+        items = [self._notice(row, as_of) for row in result.all()]
+        next_cursor = items[-1]["loan_id"] if len(items) == limit else None
+        return items, next_cursor
+
+    async def reader_summaries(
+            self,
+            reader_id: Optional[int] = None,
+            after_reader_id: int = 0,
+            limit: int = 50,
+            as_of: Optional[date] = None
+    ) -> Tuple[List[dict], Optional[int]]:
+        """Число просроченных займов и самый старый срок по каждому читателю."""
+        as_of = as_of or date.today()
+        stmt = (
+            select(Reader.id, Reader.name, func.count(Loan.id), func.min(Loan.expected_return_date))
+            .join(Loan, Loan.reader_id == Reader.id)
+            .where(*_overdue(as_of), Reader.id > after_reader_id)
+            .group_by(Reader.id, Reader.name)
+            .order_by(Reader.id)
+            .limit(limit)
+        )
+        if reader_id is not None:
+            stmt = stmt.where(Reader.id == reader_id)
+        items = [
+            {
+                "reader_id": row[0],
+                "name": row[1],
+                "overdue_loans": row[2],
+                "oldest_due_date": row[3],
+                "max_days_overdue": (as_of - row[3]).days,
+            }
+            for row in (await self.db.execute(stmt)).all()
+        ]
+        next_cursor = items[-1]["reader_id"] if len(items) == limit else None
+        return items, next_cursor
+
+    async def notify(
+            self, notifier: Notifier, as_of: Optional[date] = None, batch_size: Optional[int] = None
+    ) -> int:
+        """Отправляет уведомления по всем просроченным займам пачками.
+
+        Займы читаются серверным курсором в порядке индекса, поэтому
+        в памяти находится только текущая пачка.
+        """
+        as_of = as_of or date.today()
+        stmt = (
+            self._notices_query(as_of)
+            .order_by(Loan.expected_return_date, Loan.id)
+            .execution_options(yield_per=batch_size or settings.OVERDUE_NOTIFY_BATCH_SIZE)
+        )
+        sent = 0
+        result = await self.db.stream(stmt)
+        async for rows in result.partitions():
+            await notifier.send([self._notice(row, as_of) for row in rows])
+            sent += len(rows)
+        logger.info(f"Sent {sent} overdue notices as of {as_of}")
+        return sent
+
+    @staticmethod
+    def _notices_query(as_of: date):
+        return (
+            select(
+                Loan.id, Loan.book_id, Book.title, Loan.reader_id, Reader.name,
+                Loan.loan_date, Loan.expected_return_date
+            )
+            .join(Book, Book.id == Loan.book_id)
+            .join(Reader, Reader.id == Loan.reader_id)
+            .where(*_overdue(as_of))
+        )
+
+    @staticmethod
+    def _notice(row, as_of: date) -> dict:
+        return {
+            "loan_id": row[0],
+            "book_id": row[1],
+            "title": row[2],
+            "reader_id": row[3],
+            "reader_name": row[4],
+            "loan_date": row[5],
+            "expected_return_date": row[6],
+            "days_overdue": (as_of - row[6]).days,
+        }
+
+
+__all__ = ["OverdueService"]
@@ -0,0 +1,170 @@
+import functools
+import json
+import logging
+from typing import Any, Awaitable, Callable, Iterable, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+from app.core.instrumentation import timed_report
+from app.db.session import engine, read_engine
+
+logger = logging.getLogger(__name__)
+
+ENTITIES = ("loans", "books", "readers")
+
+
+class ReportCache:
+    """Кэш результатов отчётов с инвалидацией по счётчикам версий.
+
+    Ключ записи включает текущие версии сущностей, от которых зависит отчёт.
+    LibraryService увеличивает версию после каждой записи, поэтому старые
+    записи просто перестают находиться. Если задан REPORT_CACHE_REDIS_URL,
+    версии и результаты хранятся в Redis и общие для всех процессов API;
+    локальный LRU при этом остаётся первым уровнем.
+    """
+
+    def __init__(self, redis_url: Optional[str] = settings.REPORT_CACHE_REDIS_URL):
+        self._local = TTLCache(maxsize=settings.REPORT_CACHE_SIZE, ttl=settings.REPORT_CACHE_TTL)
+        self._versions = {entity: 0 for entity in ENTITIES}
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(redis_url)
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    @staticmethod
+    def _version_key(entity: str) -> str:
+        return f"report-cache:version:{entity}"
+
+    async def _current_versions(self, entities: Tuple[str, ...]) -> Tuple[int, ...]:
+        if self._redis is None:
+            return tuple(self._versions[entity] for entity in entities)
+        values = await self._redis.mget([self._version_key(entity) for entity in entities])
+        return tuple(int(value or 0) for value in values)
+
+    async def version(self, entity: str) -> int:
+        """Текущая версия сущности; по ней строятся производные индексы."""
+        try:
+            (value,) = await self._current_versions((entity,))
+        except Exception as e:
+            logger.warning(f"Report cache unavailable, using local {entity} version: {e}")
+            return self._versions[entity]
+        return value
+
+    async def bump(self, *entities: str) -> None:
+        for entity in entities:
+            self._versions[entity] += 1
+        if self._redis is not None:
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for entity in entities:
+                        pipe.incr(self._version_key(entity))
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Failed to bump report cache versions {entities}: {e}")
+
+    async def get_or_compute(
+            self,
+            name: str,
+            args: str,
+            depends_on: Tuple[str, ...],
+            compute: Callable[[], Awaitable[Any]],
+            fresh: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> Any:
+        """Результат из кэша или из compute().
+
+        fresh проверяется после чтения версий; если он вернул False, результат
+        отдаётся, но не кэшируется: данные могли быть старше этих версий.
+        """
+        try:
+            versions = await self._current_versions(depends_on)
+        except Exception as e:
+            logger.warning(f"Report cache unavailable, computing {name} directly: {e}")
+            return jsonable_encoder(await compute())
+
+        key = f"report-cache:{name}:{args}:{':'.join(map(str, versions))}"
+        value = self._local.get(key, MISSING)
+        if value is not MISSING:
+            return value
+
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(key)
+            except Exception as e:
+                logger.warning(f"Failed to read {name} from report cache: {e}")
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self._local.set(key, value)
+                return value
+
+        cacheable = fresh is None or await fresh()
+        value = jsonable_encoder(await compute())
+        if not cacheable:
+            return value
+        self._local.set(key, value)
+        if self._redis is not None:
+            try:
+                await self._redis.set(key, json.dumps(value), ex=settings.REPORT_CACHE_TTL)
+            except Exception as e:
+                logger.warning(f"Failed to store {name} in report cache: {e}")
+        return value
+
+    def stats(self) -> dict:
+        return self._local.stats()
+
+
+report_cache = ReportCache()
+
+
+async def replica_caught_up(db: AsyncSession) -> bool:
+    """Реплика применила весь WAL, записанный основной БД к моменту вызова."""
+    try:
+        async with engine.connect() as conn:
+            lsn = (await conn.execute(text("SELECT pg_current_wal_lsn()::text"))).scalar_one()
+        # Не в режиме восстановления — значит, это не реплика, а основная БД
+        result = await db.execute(
+            text("SELECT coalesce(pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn), NOT pg_is_in_recovery())"),
+            {"lsn": lsn}
+        )
+        return bool(result.scalar_one())
+    except Exception as e:
+        logger.warning(f"Failed to compare replica and primary WAL positions: {e}")
+        # Ошибка прерывает транзакцию сессии, а отчёт ещё будет читать через неё
+        await db.rollback()
+        return False
+
+
+def cached_report(name: str, depends_on: Iterable[str]):
+    """Кэширует результат метода ReportService с учётом его аргументов."""
+    depends_on = tuple(depends_on)
+
+    def decorator(method):
+        @timed_report(name)
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            key_args = json.dumps([args, kwargs], sort_keys=True, default=str)
+
+            fresh = None
+            if read_engine is not engine and self.db.bind is read_engine:
+                # Версия увеличивается после commit в основной БД, а реплика может
+                # ещё не видеть эту запись: отставшая реплика считает отчёт, но
+                # под новой версией он не кэшируется
+                fresh = functools.partial(replica_caught_up, self.db)
+
+            return await report_cache.get_or_compute(
+                name, key_args, depends_on, lambda: method(self, *args, **kwargs), fresh
+            )
+        return wrapper
+
+    return decorator
+
+
+__all__ = ["ReportCache", "report_cache", "cached_report", "replica_caught_up"]
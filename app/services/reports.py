@@ -1,154 +1,370 @@
 import json
-from datetime import date
-from typing import List
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut
-from sqlalchemy import select, func, desc, and_
+import os
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import List, Optional, Callable, Union
+from sqlalchemy import select, func, desc
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.models import Loan, Reader, Address, Book, Author
+from app.models import (
+    Loan, Reader, Address, Book, Author,
+    ReaderLoanStats, AuthorLoanStats, GenreLoanStats, ReaderGenreStats, DailyLoanStats
+)
+from app.services.geocoding import GeocodingService, normalize_address
+from app.services.loan_archive import loan_history
+from app.core.instrumentation import timed_report
+from app.services.report_cache import cached_report
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _day_range(column, date_from: Optional[date], date_to: Optional[date]) -> list:
+    conditions = []
+    if date_from is not None:
+        conditions.append(column >= date_from)
+    if date_to is not None:
+        conditions.append(column <= date_to)
+    return conditions
+
+
+def geojson_report_path(report_id: str) -> str:
+    return os.path.join(settings.REPORTS_DIR, f"geojson_{report_id}.geojson")
 
 
 class ReportService:
     def __init__(self, db: AsyncSession):
         self.db = db
-        self.geolocator = Nominatim(
-            user_agent=settings.PROJECT_NAME,
-            timeout=settings.GEOCODING_TIMEOUT
-        )
+        self.geocoder = GeocodingService(db)
 
-    async def generate_geojson(self) -> str:
-        result = await self.db.execute(
-            select(Address)
-            .join(Reader)
-            .join(Loan)
+    @timed_report("geojson")
+    async def generate_geojson(
+            self,
+            filename: Optional[str] = None,
+            progress: Optional[Callable[[int, int], None]] = None
+    ) -> str:
+        if filename is None:
+            filename = geojson_report_path(date.today().isoformat())
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        # Одна строка на адрес: сколько на нём активных читателей и открытых займов
+        grouped = (
+            select(
+                Address.city,
+                Address.street,
+                func.count(func.distinct(Reader.id)).label("active_readers"),
+                func.count(Loan.id).label("open_loans")
+            )
+            .join(Reader, Reader.address_id == Address.id)
+            .join(Loan, Loan.reader_id == Reader.id)
             .where(Loan.return_date.is_(None))
+            .group_by(Address.city, Address.street)
         )
+        total = await self.db.scalar(select(func.count()).select_from(grouped.subquery()))
+        stmt = (
+            grouped
+            .order_by(Address.city, Address.street)
+            .execution_options(yield_per=settings.REPORT_STREAM_BATCH_SIZE)
+        )
+        processed = 0
 
-        features = []
-        addresses = result.scalars().all()
-
-        for address in addresses:
-            try:
-                location = self.geolocator.geocode(
-                    f"{address.street}, {address.city}",
-                    timeout=10
-                )
-                if location:
-                    features.append({
-                        "type": "Feature",
-                        "geometry": {
-                            "type": "Point",
-                            "coordinates": [location.longitude, location.latitude]
-                        },
-                        "properties": {
-                            "city": address.city,
-                            "street": address.street
+        tmp_filename = f"{filename}.tmp"
+        try:
+            with open(tmp_filename, "w") as f:
+                f.write('{"type": "FeatureCollection", "features": [')
+                first = True
+                result = await self.db.stream(stmt)
+                async for rows in result.partitions():
+                    coordinates = await self.geocoder.geocode_many(
+                        (row.city, row.street) for row in rows
+                    )
+                    for row in rows:
+                        location = coordinates.get(normalize_address(row.city, row.street))
+                        if not location:
+                            continue
+                        latitude, longitude = location
+                        feature = {
+                            "type": "Feature",
+                            "geometry": {
+                                "type": "Point",
+                                "coordinates": [longitude, latitude]
+                            },
+                            "properties": {
+                                "city": row.city,
+                                "street": row.street,
+                                "active_readers": row.active_readers,
+                                "open_loans": row.open_loans
+                            }
                         }
-                    })
-            except GeocoderTimedOut:
-                continue
-
-        geojson = {
-            "type": "FeatureCollection",
-            "features": features
-        }
+                        f.write(("" if first else ",") + json.dumps(feature))
+                        first = False
+                    processed += len(rows)
+                    if progress:
+                        progress(processed, total)
+                f.write("]}")
+        except BaseException:
+            os.remove(tmp_filename)
+            raise
 
-        filename = f"reports/geojson_{date.today().isoformat()}.geojson"
-        with open(filename, "w") as f:
-            json.dump(geojson, f)
+        # Сохраняем новые результаты геокодирования
+        await self.db.commit()
+        os.replace(tmp_filename, filename)
 
         return filename
 
+    @cached_report("summary", depends_on=("books", "readers"))
     async def count_books_and_readers(self) -> dict:
         books_count = await self.db.scalar(select(func.count(Book.id)))
         readers_count = await self.db.scalar(select(func.count(Reader.id)))
         return {"total_books": books_count, "total_readers": readers_count}
 
-    async def books_taken_by_readers(self) -> List[dict]:
+    @cached_report("books-by-readers", depends_on=("loans", "readers"))
+    async def books_taken_by_readers(
+            self,
+            date_from: Optional[date] = None,
+            date_to: Optional[date] = None,
+            bucket: Optional[str] = None
+    ) -> List[dict]:
+        if date_from is not None or date_to is not None or bucket is not None:
+            return await self._books_taken_in_window(date_from, date_to, bucket)
+
         result = await self.db.execute(
-            select(Reader.id, Reader.name, func.count(Loan.id))
-            .join(Loan, Loan.reader_id == Reader.id)
-            .group_by(Reader.id)
+            select(Reader.id, Reader.name, ReaderLoanStats.total_loans)
+            .join(ReaderLoanStats, ReaderLoanStats.reader_id == Reader.id)
+            .where(ReaderLoanStats.total_loans > 0)
         )
         return [{"reader_id": row[0], "name": row[1], "total_books_taken": row[2]} for row in result.all()]
 
+    async def _books_taken_in_window(
+            self, date_from: Optional[date], date_to: Optional[date], bucket: Optional[str]
+    ) -> List[dict]:
+        # Окно читается по индексам loan_date горячей и архивной таблиц
+        history = loan_history()
+        window = _day_range(history.c.loan_date, date_from, date_to)
+        if bucket is None:
+            result = await self.db.execute(
+                select(Reader.id, Reader.name, func.count(history.c.id))
+                .join(history, history.c.reader_id == Reader.id)
+                .where(*window)
+                .group_by(Reader.id, Reader.name)
+            )
+            return [{"reader_id": row[0], "name": row[1], "total_books_taken": row[2]} for row in result.all()]
+
+        result = await self.db.execute(
+            select(Reader.id, Reader.name, history.c.loan_date, func.count(history.c.id))
+            .join(history, history.c.reader_id == Reader.id)
+            .where(*window)
+            .group_by(Reader.id, Reader.name, history.c.loan_date)
+        )
+        totals = defaultdict(int)
+        for reader_id, name, day, count in result.all():
+            totals[(bucket_start(day, bucket), reader_id, name)] += count
+        return [
+            {"bucket": start, "reader_id": reader_id, "name": name, "total_books_taken": count}
+            for (start, reader_id, name), count in sorted(totals.items())
+        ]
+
+    @cached_report("books-on-hands", depends_on=("loans", "readers"))
     async def books_currently_held_by_readers(self) -> List[dict]:
         result = await self.db.execute(
-            select(Reader.id, Reader.name, func.count(Loan.id))
-            .join(Loan, Loan.reader_id == Reader.id)
-            .where(Loan.return_date.is_(None))
-            .group_by(Reader.id)
+            select(Reader.id, Reader.name, ReaderLoanStats.on_hand)
+            .join(ReaderLoanStats, ReaderLoanStats.reader_id == Reader.id)
+            .where(ReaderLoanStats.on_hand > 0)
         )
         return [{"reader_id": row[0], "name": row[1], "books_on_hand": row[2]} for row in result.all()]
 
+    @cached_report("last-visits", depends_on=("loans", "readers"))
     async def last_visit_dates(self) -> List[dict]:
+        history = loan_history()
         result = await self.db.execute(
-            select(Reader.id, Reader.name, func.max(Loan.loan_date))
-            .join(Loan, Loan.reader_id == Reader.id)
+            select(Reader.id, Reader.name, func.max(history.c.loan_date))
+            .join(history, history.c.reader_id == Reader.id)
             .group_by(Reader.id)
         )
         return [{"reader_id": row[0], "name": row[1], "last_visit": row[2]} for row in result.all()]
 
-    async def most_read_author(self) -> dict:
+    @cached_report("top-author", depends_on=("loans", "books"))
+    async def most_read_author(
+            self,
+            date_from: Optional[date] = None,
+            date_to: Optional[date] = None,
+            bucket: Optional[str] = None
+    ) -> Union[dict, List[dict]]:
+        """Самый читаемый автор; с bucket — список победителей по интервалам."""
+        if bucket is not None:
+            return await self._top_author_by_bucket(date_from, date_to, bucket)
+        if date_from is not None or date_to is not None:
+            loan_count = func.sum(DailyLoanStats.loan_count)
+            result = await self.db.execute(
+                select(Author.name, loan_count)
+                .join(DailyLoanStats, DailyLoanStats.author_id == Author.id)
+                .where(*_day_range(DailyLoanStats.day, date_from, date_to), DailyLoanStats.loan_count > 0)
+                .group_by(Author.name)
+                .order_by(desc(loan_count))
+                .limit(1)
+            )
+            row = result.first()
+            return {"author": row[0], "loan_count": row[1]} if row else {}
+
         result = await self.db.execute(
-            select(Author.name, func.count(Loan.id).label("loan_count"))
-            .join(Book, Book.author_id == Author.id)
-            .join(Loan, Loan.book_id == Book.id)
-            .group_by(Author.name)
-            .order_by(desc("loan_count"))
+            select(Author.name, AuthorLoanStats.loan_count)
+            .join(AuthorLoanStats, AuthorLoanStats.author_id == Author.id)
+            .where(AuthorLoanStats.loan_count > 0)
+            .order_by(desc(AuthorLoanStats.loan_count))
             .limit(1)
         )
         row = result.first()
         return {"author": row[0], "loan_count": row[1]} if row else {}
 
-    async def popular_genres(self) -> List[dict]:
+    async def _top_author_by_bucket(
+            self, date_from: Optional[date], date_to: Optional[date], bucket: str
+    ) -> List[dict]:
         result = await self.db.execute(
-            select(Book.genre, func.count(Loan.id))
-            .join(Loan, Loan.book_id == Book.id)
-            .group_by(Book.genre)
-            .order_by(desc(func.count(Loan.id)))
+            select(DailyLoanStats.day, DailyLoanStats.author_id, func.sum(DailyLoanStats.loan_count))
+            .where(*_day_range(DailyLoanStats.day, date_from, date_to), DailyLoanStats.loan_count > 0)
+            .group_by(DailyLoanStats.day, DailyLoanStats.author_id)
         )
-        return [{"genre": row[0], "loan_count": row[1]} for row in result.all()]
+        totals = defaultdict(lambda: defaultdict(int))
+        for day, author_id, count in result.all():
+            totals[bucket_start(day, bucket)][author_id] += count
 
-    async def favorite_genre_per_reader(self) -> List[dict]:
-        # Предварительно
-        subquery = (
-            select(
-                Reader.id.label("reader_id"),
-                Book.genre,
-                func.count(Loan.id).label("genre_count")
-            )
-            .join(Loan, Loan.reader_id == Reader.id)
-            .join(Book, Loan.book_id == Book.id)
-            .group_by(Reader.id, Book.genre)
-            .subquery()
+        winners = {
+            start: max(counts.items(), key=lambda item: (item[1], -item[0]))
+            for start, counts in totals.items()
+        }
+        names = dict((await self.db.execute(
+            select(Author.id, Author.name)
+            .where(Author.id.in_({author_id for author_id, _ in winners.values()}))
+        )).all()) if winners else {}
+        return [
+            {"bucket": start, "author": names.get(author_id), "loan_count": count}
+            for start, (author_id, count) in sorted(winners.items())
+        ]
+
+    @cached_report("popular-genres", depends_on=("loans", "books"))
+    async def popular_genres(
+            self,
+            date_from: Optional[date] = None,
+            date_to: Optional[date] = None,
+            bucket: Optional[str] = None
+    ) -> List[dict]:
+        if date_from is not None or date_to is not None or bucket is not None:
+            return await self._popular_genres_in_window(date_from, date_to, bucket)
+
+        result = await self.db.execute(
+            select(GenreLoanStats.genre, GenreLoanStats.loan_count)
+            .where(GenreLoanStats.loan_count > 0)
+            .order_by(desc(GenreLoanStats.loan_count))
         )
+        return [{"genre": row[0], "loan_count": row[1]} for row in result.all()]
 
-        # Подзапрос с максимальным количеством для каждого читателя
-        max_counts = (
-            select(
-                subquery.c.reader_id,
-                func.max(subquery.c.genre_count).label("max_count")
+    async def _popular_genres_in_window(
+            self, date_from: Optional[date], date_to: Optional[date], bucket: Optional[str]
+    ) -> List[dict]:
+        # Переклассификация и списание книг оставляют обнулённые строки дневных итогов
+        window = [*_day_range(DailyLoanStats.day, date_from, date_to), DailyLoanStats.loan_count > 0]
+        loan_count = func.sum(DailyLoanStats.loan_count)
+        if bucket is None:
+            result = await self.db.execute(
+                select(DailyLoanStats.genre, loan_count)
+                .where(*window)
+                .group_by(DailyLoanStats.genre)
+                .order_by(desc(loan_count))
             )
-            .group_by(subquery.c.reader_id)
-            .subquery()
-        )
+            return [{"genre": row[0], "loan_count": row[1]} for row in result.all()]
 
-        # Финальный запрос
         result = await self.db.execute(
-            select(
-                subquery.c.reader_id,
-                subquery.c.genre,
-                subquery.c.genre_count
-            ).join(
-                max_counts,
-                onclause=and_(
-                    subquery.c.reader_id == max_counts.c.reader_id,
-                    subquery.c.genre_count == max_counts.c.max_count
+            select(DailyLoanStats.day, DailyLoanStats.genre, loan_count)
+            .where(*window)
+            .group_by(DailyLoanStats.day, DailyLoanStats.genre)
+        )
+        totals = defaultdict(int)
+        for day, genre, count in result.all():
+            totals[(bucket_start(day, bucket), genre)] += count
+        return [
+            {"bucket": start, "genre": genre, "loan_count": count}
+            for (start, genre), count in sorted(totals.items(), key=lambda item: (item[0][0], -item[1]))
+        ]
+
+    @cached_report("favorite-genres", depends_on=("loans", "books"))
+    async def favorite_genre_per_reader(
+            self,
+            top_n: int = 1,
+            ties: str = "all",
+            date_from: Optional[date] = None,
+            date_to: Optional[date] = None,
+            after_reader_id: int = 0,
+            limit: int = 100
+    ) -> dict:
+        """Любимые жанры читателей, страница по reader_id.
+
+        ties="all" оставляет все жанры, разделившие место в top_n,
+        ties="alphabetical" — ровно top_n жанров, при равенстве по алфавиту.
+        """
+        # Страница читателей по первичному ключу счётчиков
+        reader_ids = (await self.db.scalars(
+            select(ReaderLoanStats.reader_id)
+            .where(ReaderLoanStats.reader_id > after_reader_id, ReaderLoanStats.total_loans > 0)
+            .order_by(ReaderLoanStats.reader_id)
+            .limit(limit)
+        )).all()
+        if not reader_ids:
+            return {"items": [], "next_cursor": None}
+        first_id, last_id = reader_ids[0], reader_ids[-1]
+
+        if date_from is None and date_to is None:
+            counts = (
+                select(
+                    ReaderGenreStats.reader_id,
+                    ReaderGenreStats.genre,
+                    ReaderGenreStats.loan_count.label("genre_count")
+                )
+                .where(
+                    ReaderGenreStats.reader_id.between(first_id, last_id),
+                    ReaderGenreStats.loan_count > 0
                 )
             )
-        )
+        else:
+            history = loan_history()
+            counts = (
+                select(history.c.reader_id, Book.genre, func.count(history.c.id).label("genre_count"))
+                .join(Book, Book.id == history.c.book_id)
+                .where(
+                    history.c.reader_id.between(first_id, last_id),
+                    Book.genre.is_not(None),
+                    *_day_range(history.c.loan_date, date_from, date_to)
+                )
+                .group_by(history.c.reader_id, Book.genre)
+            )
+        counts = counts.subquery()
 
-        return [{"reader_id": row[0], "favorite_genre": row[1], "times_read": row[2]} for row in result.all()]
\ No newline at end of file
+        # Один проход: ранжирование жанров внутри каждого читателя
+        if ties == "alphabetical":
+            position = func.row_number().over(
+                partition_by=counts.c.reader_id,
+                order_by=(counts.c.genre_count.desc(), counts.c.genre)
+            )
+        else:
+            position = func.rank().over(
+                partition_by=counts.c.reader_id,
+                order_by=counts.c.genre_count.desc()
+            )
+        ranked = select(counts, position.label("position")).subquery()
+
+        result = await self.db.execute(
+            select(ranked.c.reader_id, ranked.c.genre, ranked.c.genre_count, ranked.c.position)
+            .where(ranked.c.position <= top_n)
+            .order_by(ranked.c.reader_id, ranked.c.position, ranked.c.genre)
+        )
+        items = [
+            {"reader_id": row[0], "favorite_genre": row[1], "times_read": row[2], "rank": row[3]}
+            for row in result.all()
+        ]
+        next_cursor = last_id if len(reader_ids) == limit else None
+        return {"items": items, "next_cursor": next_cursor}
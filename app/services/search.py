@@ -0,0 +1,279 @@
+import asyncio
+import logging
+import re
+import time
+from bisect import bisect_left
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, func, or_, case, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.db.dialect import dialect_name
+from app.models import Book, Author
+from app.services.report_cache import report_cache
+
+logger = logging.getLogger(__name__)
+
+# Должна совпадать с конфигурацией в триггере books_search_vector (миграция 0008)
+TS_CONFIG = "simple"
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, HighlightAll=true"
+
+# Веса полей в резервном индексе; соответствуют весам A, B, C в search_vector
+FIELD_WEIGHTS = {"title": 3.0, "author": 2.0, "genre": 1.0}
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+def _like_prefix(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def highlight(text: Optional[str], tokens: List[str]) -> Optional[str]:
+    """Выделяет слова, начинающиеся с одного из токенов запроса."""
+    if not text or not tokens:
+        return text
+    pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, tokens)) + r")\w*", re.IGNORECASE)
+    return pattern.sub(lambda m: f"<mark>{m.group(0)}</mark>", text)
+
+
+class CatalogIndex:
+    """Инвертированный индекс каталога в памяти процесса.
+
+    Используется вместо search_vector там, где нет PostgreSQL (SQLite в
+    тестовых окружениях). Токены хранятся отсортированными, поэтому все
+    слова с заданным префиксом находятся двоичным поиском.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._tokens: List[str] = []
+        self._version: Optional[int] = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def is_fresh(self, version: int) -> bool:
+        return (
+            self._version == version
+            and time.monotonic() - self._built_at < settings.SEARCH_FALLBACK_TTL
+        )
+
+    def build(self, rows: Iterable[Tuple[int, str, Optional[str], str]], version: int) -> None:
+        postings: Dict[str, Dict[int, float]] = {}
+        for book_id, title, author, genre in rows:
+            for field, text in (("title", title), ("author", author), ("genre", genre)):
+                for token in set(tokenize(text)):
+                    docs = postings.setdefault(token, {})
+                    docs[book_id] = docs.get(book_id, 0.0) + FIELD_WEIGHTS[field]
+        self._postings = postings
+        self._tokens = sorted(postings)
+        self._version = version
+        self._built_at = time.monotonic()
+
+    async def refresh(self, version: int, load: Callable[[], Awaitable[list]]) -> None:
+        """Перестраивает индекс, если каталог изменился или истёк SEARCH_FALLBACK_TTL."""
+        if self.is_fresh(version):
+            return
+        async with self._lock:
+            if not self.is_fresh(version):
+                self.build(await load(), version)
+                logger.info(f"Catalog search index rebuilt: {len(self._tokens)} tokens")
+
+    def _expand(self, prefix: str) -> List[str]:
+        start = bisect_left(self._tokens, prefix)
+        terms = []
+        for term in self._tokens[start:]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def search(self, tokens: List[str]) -> List[Tuple[int, float]]:
+        """Книги, содержащие все токены (как префиксы), по убыванию веса."""
+        scores: Optional[Dict[int, float]] = None
+        for token in tokens:
+            matched: Dict[int, float] = {}
+            for term in self._expand(token):
+                # Точное совпадение слова весит больше, чем совпадение префикса
+                factor = 1.0 if term == token else 0.5
+                for book_id, weight in self._postings[term].items():
+                    matched[book_id] = max(matched.get(book_id, 0.0), weight * factor)
+            if scores is None:
+                scores = matched
+            else:
+                scores = {book_id: scores[book_id] + w for book_id, w in matched.items() if book_id in scores}
+            if not scores:
+                return []
+        return sorted((scores or {}).items(), key=lambda item: (-item[1], item[0]))
+
+
+catalog_index = CatalogIndex()
+
+
+class SearchService:
+    """Полнотекстовый поиск по названию, автору и жанру и автодополнение.
+
+    В PostgreSQL поиск идёт по GIN-индексу search_vector с ранжированием
+    ts_rank_cd, автодополнение — по триграммным индексам названия и имени
+    автора. На других СУБД используется CatalogIndex.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def search(
+            self,
+            q: str,
+            cursor: int = 0,
+            limit: int = 20,
+            available_only: bool = False
+    ) -> Tuple[List[dict], Optional[int]]:
+        tokens = tokenize(q)
+        if not tokens:
+            return [], None
+        if dialect_name(self.db) == "postgresql":
+            ranked = await self._ranked_pg(tokens, cursor, limit + 1, available_only)
+        else:
+            ranked = await self._ranked_fallback(tokens, cursor, limit + 1, available_only)
+
+        next_cursor = cursor + limit if len(ranked) > limit else None
+        ranked = ranked[:limit]
+        if not ranked:
+            return [], None
+
+        result = await self.db.execute(
+            select(Book)
+            .options(selectinload(Book.author))
+            .where(Book.id.in_([book_id for book_id, _ in ranked]))
+        )
+        books = {book.id: book for book in result.scalars()}
+        headlines = await self._headlines(tokens, list(books))
+
+        items = []
+        for book_id, rank in ranked:
+            book = books.get(book_id)
+            if book is None:
+                continue
+            items.append({
+                "id": book.id,
+                "title": book.title,
+                "genre": book.genre,
+                "author": book.author,
+                "is_available": book.is_available,
+                "total_copies": book.total_copies,
+                "available_copies": book.available_copies,
+                "average_rating": book.average_rating,
+                "rank": rank,
+                "highlight": headlines.get(book_id) or self._highlight(book, tokens),
+            })
+        return items, next_cursor
+
+    async def autocomplete(self, q: str, limit: int = 10) -> List[dict]:
+        """Подсказки по началу названия или имени автора (без учёта регистра)."""
+        q = q.strip()
+        if not q:
+            return []
+        pattern = _like_prefix(q)
+        word_pattern = "% " + pattern
+
+        titles = await self.db.execute(
+            select(Book.id, Book.title)
+            .where(or_(Book.title.ilike(pattern, escape="\\"), Book.title.ilike(word_pattern, escape="\\")))
+            .order_by(case((Book.title.ilike(pattern, escape="\\"), 0), else_=1), func.length(Book.title), Book.id)
+            .limit(limit)
+        )
+        authors = await self.db.execute(
+            select(Author.id, Author.name)
+            .where(or_(Author.name.ilike(pattern, escape="\\"), Author.name.ilike(word_pattern, escape="\\")))
+            .order_by(case((Author.name.ilike(pattern, escape="\\"), 0), else_=1), func.length(Author.name), Author.id)
+            .limit(limit)
+        )
+        suggestions = [{"kind": "book", "id": row.id, "text": row.title} for row in titles]
+        suggestions += [{"kind": "author", "id": row.id, "text": row.name} for row in authors]
+        # Сначала подсказки, начинающиеся с запроса, затем более короткие
+        prefix = q.lower()
+        suggestions.sort(key=lambda s: (not s["text"].lower().startswith(prefix), len(s["text"])))
+        return suggestions[:limit]
+
+    @staticmethod
+    def _tsquery(tokens: List[str]):
+        # Токены содержат только буквы и цифры, экранирование не требуется
+        return func.to_tsquery(TS_CONFIG, " & ".join(f"{token}:*" for token in tokens))
+
+    async def _ranked_pg(
+            self, tokens: List[str], offset: int, limit: int, available_only: bool
+    ) -> List[Tuple[int, float]]:
+        tsq = self._tsquery(tokens)
+        conditions = [Book.search_vector.op("@@")(tsq)]
+        if available_only:
+            conditions.append(Book.is_available == true())
+        # Ранжируются не более SEARCH_MAX_CANDIDATES совпадений, чтобы запрос
+        # из одной частой буквы не считал ранг по всему каталогу; порядок по id
+        # делает набор кандидатов одинаковым для всех страниц курсора
+        candidates = (
+            select(Book.id, Book.search_vector)
+            .where(*conditions)
+            .order_by(Book.id)
+            .limit(settings.SEARCH_MAX_CANDIDATES)
+            .subquery()
+        )
+        rank = func.ts_rank_cd(candidates.c.search_vector, tsq).label("rank")
+        result = await self.db.execute(
+            select(candidates.c.id, rank)
+            .order_by(rank.desc(), candidates.c.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        return [(row.id, float(row.rank)) for row in result]
+
+    async def _ranked_fallback(
+            self, tokens: List[str], offset: int, limit: int, available_only: bool
+    ) -> List[Tuple[int, float]]:
+        async def load():
+            result = await self.db.execute(
+                select(Book.id, Book.title, Author.name, Book.genre).outerjoin(Book.author)
+            )
+            return result.all()
+
+        await catalog_index.refresh(await report_cache.version("books"), load)
+        ranked = catalog_index.search(tokens)[:settings.SEARCH_MAX_CANDIDATES]
+        if available_only and ranked:
+            result = await self.db.execute(
+                select(Book.id).where(Book.id.in_([book_id for book_id, _ in ranked]), Book.is_available == true())
+            )
+            available = set(result.scalars())
+            ranked = [item for item in ranked if item[0] in available]
+        return ranked[offset:offset + limit]
+
+    async def _headlines(self, tokens: List[str], book_ids: List[int]) -> Dict[int, dict]:
+        # ts_headline дорогой, поэтому считается только для строк текущей страницы
+        if not book_ids or dialect_name(self.db) != "postgresql":
+            return {}
+        tsq = self._tsquery(tokens)
+        result = await self.db.execute(
+            select(
+                Book.id,
+                func.ts_headline(TS_CONFIG, Book.title, tsq, HEADLINE_OPTIONS).label("title"),
+                func.ts_headline(TS_CONFIG, func.coalesce(Author.name, ""), tsq, HEADLINE_OPTIONS).label("author"),
+                func.ts_headline(TS_CONFIG, Book.genre, tsq, HEADLINE_OPTIONS).label("genre"),
+            )
+            .outerjoin(Book.author)
+            .where(Book.id.in_(book_ids))
+        )
+        return {row.id: {"title": row.title, "author": row.author, "genre": row.genre} for row in result}
+
+    @staticmethod
+    def _highlight(book: Book, tokens: List[str]) -> dict:
+        return {
+            "title": highlight(book.title, tokens),
+            "author": highlight(book.author.name if book.author else "", tokens),
+            "genre": highlight(book.genre, tokens),
+        }
+
+
+__all__ = ["SearchService", "CatalogIndex", "catalog_index", "tokenize", "highlight"]
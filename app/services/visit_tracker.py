@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from datetime import date
+from typing import Dict, Optional
+
+from sqlalchemy import update, bindparam, or_
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models import Reader
+from app.services.entity_cache import entity_cache
+
+logger = logging.getLogger(__name__)
+
+
+class VisitTracker:
+    """Отложенная запись даты последнего визита читателя.
+
+    Визиты копятся в памяти (или в Redis, если задан VISIT_TRACKER_REDIS_URL,
+    — тогда буфер общий для всех процессов API), по одному на читателя,
+    и раз в VISIT_FLUSH_INTERVAL секунд записываются одним пакетным UPDATE.
+    Запросы на чтение читателей при этом ничего не пишут в БД.
+    """
+    REDIS_KEY = "reader-visits"
+
+    def __init__(self, redis_url: Optional[str] = settings.VISIT_TRACKER_REDIS_URL):
+        self._pending: Dict[int, date] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(redis_url)
+
+    # === Lifecycle ===
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.VISIT_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Failed to flush reader visits: {e}")
+
+    # === Visits ===
+    async def record(self, reader_id: int, day: Optional[date] = None) -> None:
+        day = day or date.today()
+        if self._redis is not None:
+            try:
+                await self._redis.hset(self.REDIS_KEY, str(reader_id), day.isoformat())
+                return
+            except Exception as e:
+                logger.warning(f"Visit buffer unavailable, keeping visit of reader {reader_id} locally: {e}")
+        self._merge({reader_id: day})
+
+    def _merge(self, visits: Dict[int, date]) -> None:
+        for reader_id, day in visits.items():
+            if reader_id not in self._pending or self._pending[reader_id] < day:
+                self._pending[reader_id] = day
+
+    async def _take(self) -> Dict[int, date]:
+        visits, self._pending = self._pending, {}
+        if self._redis is not None:
+            # Чтение и удаление одной транзакцией: визит не потеряется и не запишется дважды
+            try:
+                async with self._redis.pipeline(transaction=True) as pipe:
+                    pipe.hgetall(self.REDIS_KEY)
+                    pipe.delete(self.REDIS_KEY)
+                    shared, _ = await pipe.execute()
+                for reader_id, day in shared.items():
+                    reader_id, day = int(reader_id), date.fromisoformat(day.decode())
+                    if reader_id not in visits or visits[reader_id] < day:
+                        visits[reader_id] = day
+            except Exception as e:
+                logger.warning(f"Failed to read shared visit buffer: {e}")
+        return visits
+
+    async def flush(self) -> int:
+        """Записывает накопленные визиты; возвращает число читателей."""
+        visits = await self._take()
+        if not visits:
+            return 0
+
+        readers = Reader.__table__
+        rows = [{"reader_id": reader_id, "visit": day} for reader_id, day in sorted(visits.items())]
+        try:
+            async with SessionLocal() as db:
+                # Дата визита только растёт: старый буфер не затрёт более свежую запись
+                await db.execute(
+                    update(readers)
+                    .where(
+                        readers.c.id == bindparam("reader_id"),
+                        or_(readers.c.last_visit.is_(None), readers.c.last_visit < bindparam("visit"))
+                    )
+                    .values(last_visit=bindparam("visit")),
+                    rows
+                )
+                await db.commit()
+        except Exception:
+            self._merge(visits)
+            raise
+        await entity_cache.invalidate("reader", *visits)
+        return len(rows)
+
+
+visit_tracker = VisitTracker()
+
+__all__ = ["VisitTracker", "visit_tracker"]
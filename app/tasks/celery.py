@@ -1,16 +1,126 @@
+import asyncio
+from typing import Optional
+
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import sessionmaker
+
 from app.core.config import settings
-from app.services.reports import ReportService
-from app.db.session import SessionLocal
+from app.external.book_rating_client import rating_client
+from app.services.library import LibraryService
+from app.services.loan_archive import LoanArchiver
+from app.services.overdue import OverdueService
+from app.external.notifiers import get_notifier
+from app.services.reports import ReportService, geojson_report_path
+from app.db.session import make_engine, make_session_factory
 
 celery = Celery(__name__)
 celery.conf.broker_url = settings.CELERY_BROKER_URL
 celery.conf.result_backend = settings.CELERY_RESULT_BACKEND
+celery.conf.result_expires = settings.REPORT_RESULT_EXPIRES
+celery.conf.task_track_started = True
+celery.conf.task_routes = {
+    "app.tasks.celery.generate_report_task": {"queue": settings.REPORTS_QUEUE},
+}
+celery.conf.beat_schedule = {
+    "refresh-book-ratings": {
+        "task": "app.tasks.celery.refresh_ratings_task",
+        "schedule": settings.RATING_REFRESH_INTERVAL,
+    },
+    "archive-returned-loans": {
+        "task": "app.tasks.celery.archive_loans_task",
+        "schedule": settings.LOAN_ARCHIVE_INTERVAL,
+    },
+    "notify-overdue-loans": {
+        "task": "app.tasks.celery.notify_overdue_task",
+        "schedule": settings.OVERDUE_SCAN_INTERVAL,
+    },
+}
+
+
+# Каждый процесс воркера держит собственный event loop и движок БД:
+# соединения asyncpg привязаны к циклу, в котором были созданы
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_engine: Optional[AsyncEngine] = None
+_sessions: Optional[sessionmaker] = None
+
+
+@worker_process_init.connect
+def _reset_worker_runtime(**kwargs):
+    global _loop, _engine, _sessions
+    # После fork состояние родителя непригодно
+    _loop, _engine, _sessions = None, None, None
+
+
+@worker_process_shutdown.connect
+def _dispose_worker_runtime(**kwargs):
+    global _loop, _engine, _sessions
+    if _loop is None:
+        return
+    # Сессия aiohttp клиента рейтингов создана в цикле воркера и закрывается в нём же
+    _loop.run_until_complete(rating_client.close())
+    if _engine is not None:
+        _loop.run_until_complete(_engine.dispose())
+    _loop.close()
+    _loop, _engine, _sessions = None, None, None
+
+
+def run_async(coro):
+    global _loop, _engine, _sessions
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+        _engine = make_engine()
+        _sessions = make_session_factory(_engine)
+    return _loop.run_until_complete(coro)
+
+
+async def _generate_report(task) -> dict:
+    filename = geojson_report_path(task.request.id)
+
+    def progress(processed: int, total: int):
+        task.update_state(state="PROGRESS", meta={"processed": processed, "total": total})
+
+    async with _sessions() as db:
+        await ReportService(db).generate_geojson(filename, progress=progress)
+    return {"filename": filename}
+
+
+@celery.task(bind=True)
+def generate_report_task(self):
+    return run_async(_generate_report(self))
+
+
+async def _refresh_ratings() -> int:
+    async with _sessions() as db:
+        return await LibraryService(db).refresh_stale_ratings()
+
+
+@celery.task
+def refresh_ratings_task():
+    return run_async(_refresh_ratings())
+
+
+async def _archive_loans(older_than_days: Optional[int]) -> int:
+    async with _sessions() as db:
+        return await LoanArchiver(db).archive(older_than_days)
+
+
+@celery.task
+def archive_loans_task(older_than_days: Optional[int] = None):
+    return run_async(_archive_loans(older_than_days))
+
+
+async def _notify_overdue(notifier_name: Optional[str]) -> int:
+    notifier = get_notifier(notifier_name)
+    try:
+        async with _sessions() as db:
+            return await OverdueService(db).notify(notifier)
+    finally:
+        await notifier.close()
 
 
 @celery.task
-def generate_report_task():
-    with SessionLocal() as db:
-        service = ReportService(db)
-        filename = service.generate_geojson()
-    return filename
+def notify_overdue_task(notifier_name: Optional[str] = None):
+    return run_async(_notify_overdue(notifier_name))
@@ -0,0 +1,247 @@
+"""Нагрузочный тест выдачи и возврата книг через LibraryService.
+
+    python -m benchmarks.checkout_load --workers 50 --duration 10
+    python -m benchmarks.checkout_load --mode service
+
+Сценарий race: --workers конкурентных выдач одной и той же книги, успешной
+должна быть ровно одна. Сценарий throughput: каждый воркер в своей сессии
+циклически выдаёт и возвращает собственную книгу, считаются операции в
+секунду и задержки. Режим baseline повторяет прежнюю выдачу — SELECT ...
+FOR UPDATE книги, отдельные запросы читателя и займа и refresh после
+commit; с --mode both оба режима прогоняются на одних данных и печатается
+их отношение. Тестовые данные создаются с префиксом loadtest- и удаляются
+после прогона.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import SessionLocal, engine
+from app.models import (
+    Address, Author, Book, Loan, Reader,
+    ReaderLoanStats, AuthorLoanStats, GenreLoanStats, ReaderGenreStats, DailyLoanStats
+)
+from app.schemas import LoanCreate
+from app.services import LibraryService
+from app.services.library import AVERAGE_LOAN_PERIOD_BY_WEEKS
+from app.services.loan_stats import LoanStatsService
+from app.services.report_cache import report_cache
+
+MODES = ("baseline", "service")
+
+
+class ServiceLoans:
+    """Выдача и возврат текущим LibraryService: по одному запросу на операцию."""
+
+    def __init__(self, db: AsyncSession):
+        self.service = LibraryService(db)
+
+    async def create_loan(self, book_id: int, reader_id: int) -> Loan:
+        return await self.service.create_loan(LoanCreate(book_id=book_id, reader_id=reader_id))
+
+    async def return_loan(self, loan_id: int) -> Loan:
+        return await self.service.return_loan(loan_id)
+
+
+class BaselineLoans:
+    """Прежняя выдача и возврат: блокировка строки книги и отдельные запросы.
+
+    Счётчики займов ведутся так же, как в LibraryService, чтобы режимы
+    отличались только числом обращений к БД и удержанием блокировки.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.stats = LoanStatsService(db)
+
+    async def _lock(self, model, row_id: int):
+        # populate_existing: объекты сессии не устаревают после commit
+        return await self.db.scalar(
+            select(model).where(model.id == row_id).with_for_update().execution_options(populate_existing=True)
+        )
+
+    async def create_loan(self, book_id: int, reader_id: int) -> Loan:
+        book = await self._lock(Book, book_id)
+        if book is None or book.available_copies <= 0:
+            await self.db.rollback()
+            raise ValueError("Book not available or already loaned out")
+        reader = await self.db.scalar(select(Reader).where(Reader.id == reader_id))
+        if reader is None:
+            await self.db.rollback()
+            raise ValueError("Reader not found")
+        today = date.today()
+        reader.last_visit = today
+
+        loan = Loan(book_id=book_id, reader_id=reader_id, loan_date=today,
+                    expected_return_date=today + timedelta(weeks=AVERAGE_LOAN_PERIOD_BY_WEEKS))
+        book.available_copies -= 1
+        book.is_available = book.available_copies > 0
+        self.db.add(loan)
+        await self.db.flush()
+        await self.stats.loans_opened([loan])
+        await self.db.commit()
+        await self.db.refresh(loan)
+        await report_cache.bump("loans")
+        return loan
+
+    async def return_loan(self, loan_id: int) -> Loan:
+        loan = await self._lock(Loan, loan_id)
+        if loan is None or loan.return_date is not None:
+            await self.db.rollback()
+            raise ValueError("Loan not found or already returned")
+        loan.return_date = date.today()
+        book = await self._lock(Book, loan.book_id)
+        book.available_copies += 1
+        book.is_available = True
+        await self.stats.loans_returned([loan])
+        await self.db.commit()
+        await self.db.refresh(loan)
+        await report_cache.bump("loans")
+        return loan
+
+
+FLOWS = {"baseline": BaselineLoans, "service": ServiceLoans}
+
+
+async def _create_fixtures(workers: int) -> dict:
+    marker = f"loadtest-{uuid.uuid4().hex[:8]}"
+    async with SessionLocal() as db:
+        author_id = await db.scalar(insert(Author).values(name=marker).returning(Author.id))
+        address_id = await db.scalar(
+            insert(Address).values(city=marker, street=marker).returning(Address.id)
+        )
+        book_ids = list((await db.scalars(
+            insert(Book).returning(Book.id),
+            [{"title": f"{marker}-{i}", "genre": marker, "author_id": author_id, "is_available": True}
+             for i in range(workers + 1)]
+        )).all())
+        reader_ids = list((await db.scalars(
+            insert(Reader).returning(Reader.id),
+            [{"name": f"{marker}-{i}", "address_id": address_id} for i in range(workers)]
+        )).all())
+        await db.commit()
+    return {"marker": marker, "author_id": author_id, "address_id": address_id,
+            "book_ids": book_ids, "reader_ids": reader_ids}
+
+
+async def _drop_fixtures(fixtures: dict) -> None:
+    # Удаление через LibraryService: счётчики займов и дневные итоги уменьшаются
+    # вместе с удалёнными займами, жанр loadtest- не остаётся в отчётах
+    async with SessionLocal() as db:
+        service = LibraryService(db)
+        open_loans = list((await db.scalars(
+            select(Loan.id).where(Loan.book_id.in_(fixtures["book_ids"]), Loan.return_date.is_(None))
+        )).all())
+        if open_loans:
+            await service.return_loans_bulk(open_loans)
+        await service.delete_books_bulk(book_ids=fixtures["book_ids"])
+        for reader_id in fixtures["reader_ids"]:
+            await service.delete_reader(reader_id)
+        # Обнулённые строки счётчиков тестовых автора, жанра и читателей
+        marker = fixtures["marker"]
+        for model, condition in (
+                (AuthorLoanStats, AuthorLoanStats.author_id == fixtures["author_id"]),
+                (GenreLoanStats, GenreLoanStats.genre == marker),
+                (ReaderGenreStats, ReaderGenreStats.genre == marker),
+                (DailyLoanStats, DailyLoanStats.genre == marker),
+        ):
+            await db.execute(delete(model).where(condition, model.loan_count == 0))
+        await db.execute(delete(ReaderLoanStats).where(
+            ReaderLoanStats.reader_id.in_(fixtures["reader_ids"]),
+            ReaderLoanStats.total_loans == 0, ReaderLoanStats.on_hand == 0
+        ))
+        await db.execute(delete(Address).where(Address.id == fixtures["address_id"]))
+        await db.execute(delete(Author).where(Author.id == fixtures["author_id"]))
+        await db.commit()
+
+
+async def _race_same_book(fixtures: dict, flow) -> dict:
+    book_id = fixtures["book_ids"][-1]
+
+    async def attempt(reader_id: int) -> bool:
+        async with SessionLocal() as db:
+            try:
+                await flow(db).create_loan(book_id, reader_id)
+                return True
+            except ValueError:
+                return False
+
+    results = await asyncio.gather(*(attempt(reader_id) for reader_id in fixtures["reader_ids"]))
+    async with SessionLocal() as db:
+        open_loans = list((await db.scalars(
+            select(Loan.id).where(Loan.book_id == book_id, Loan.return_date.is_(None))
+        )).all())
+        # Книга возвращается на полку для следующего режима
+        if open_loans:
+            await LibraryService(db).return_loans_bulk(open_loans)
+    return {
+        "attempts": len(results),
+        "successful": sum(results),
+        "open_loans": len(open_loans),
+        "correct": sum(results) == 1 and len(open_loans) == 1,
+    }
+
+
+async def _throughput(fixtures: dict, duration: float, flow) -> dict:
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def worker(book_id: int, reader_id: int):
+        async with SessionLocal() as db:
+            loans = flow(db)
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                loan = await loans.create_loan(book_id, reader_id)
+                await loans.return_loan(loan.id)
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        worker(book_id, reader_id)
+        for book_id, reader_id in zip(fixtures["book_ids"], fixtures["reader_ids"])
+    ))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "cycles": len(latencies),
+        "cycles_per_second": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None,
+    }
+
+
+async def main(workers: int, duration: float, modes=MODES) -> dict:
+    fixtures = await _create_fixtures(workers)
+    try:
+        results = {"workers": workers}
+        for mode in modes:
+            results[mode] = {
+                "race": await _race_same_book(fixtures, FLOWS[mode]),
+                "throughput": await _throughput(fixtures, duration, FLOWS[mode]),
+            }
+        if len(modes) == len(MODES):
+            baseline = results["baseline"]["throughput"]["cycles_per_second"]
+            service = results["service"]["throughput"]["cycles_per_second"]
+            results["speedup"] = service / baseline if baseline else None
+    finally:
+        await _drop_fixtures(fixtures)
+        await engine.dispose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="длительность сценария throughput, с")
+    parser.add_argument("--mode", choices=MODES + ("both",), default="both",
+                        help="baseline — прежняя выдача с SELECT ... FOR UPDATE, service — LibraryService")
+    args = parser.parse_args()
+    modes = MODES if args.mode == "both" else (args.mode,)
+    print(json.dumps(asyncio.run(main(args.workers, args.duration, modes)), indent=2))
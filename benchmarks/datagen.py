@@ -0,0 +1,187 @@
+"""Генератор синтетических данных библиотеки для нагрузочных тестов.
+
+    python -m benchmarks.datagen --loans 1000000
+    python -m benchmarks.datagen --url sqlite+aiosqlite:///bench.db --create-schema --loans 200000
+
+Заполняет authors, books, addresses, readers и loans на пустой базе
+(PostgreSQL со схемой из миграций или SQLite, схема которой создаётся
+флагом --create-schema). Распределения скошенные: популярность авторов,
+книг и жанров и активность читателей подчиняются закону Ципфа. Открытые
+займы не повторяют книги, их книги помечаются выданными, часть займов
+просрочена. В конце счётчики займов пересчитываются по сгенерированной
+истории. Один и тот же --seed даёт одни и те же данные.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+from typing import List
+
+from sqlalchemy import func, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db.session import make_engine, make_session_factory
+from app.models import Address, Author, Base, Book, Loan, Reader
+from app.services.loan_stats import LoanStatsService
+
+INSERT_BATCH = 10000
+HISTORY_DAYS = 3 * 365
+LOAN_PERIOD = timedelta(weeks=2)
+CITIES = ["Москва", "Санкт-Петербург", "Казань", "Новосибирск", "Екатеринбург", "Самара", "Пермь", "Томск"]
+GENRES = [
+    "Роман", "Детектив", "Фантастика", "Фэнтези", "Поэзия", "История", "Биография", "Наука",
+    "Психология", "Философия", "Приключения", "Драма", "Комедия", "Ужасы", "Детская", "Путешествия",
+]
+
+
+def zipf_weights(n: int, s: float = 1.0) -> List[float]:
+    return [1 / (rank + 1) ** s for rank in range(n)]
+
+
+async def _insert(engine: AsyncEngine, table, rows: List[dict]) -> None:
+    async with engine.begin() as conn:
+        for offset in range(0, len(rows), INSERT_BATCH):
+            await conn.execute(insert(table), rows[offset:offset + INSERT_BATCH])
+
+
+async def _reset_sequences(engine: AsyncEngine) -> None:
+    # Явные id не двигают последовательности PostgreSQL
+    async with engine.begin() as conn:
+        for table in ("authors", "books", "addresses", "readers", "loans"):
+            await conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT COALESCE(max(id), 1) FROM {table}))"
+            ))
+
+
+async def _insert_loans(engine: AsyncEngine, args, rng: random.Random, open_books: List[int]) -> None:
+    # Займы генерируются и вставляются пачками, чтобы не держать всю историю в памяти
+    today = date.today()
+    history_start = today - timedelta(days=HISTORY_DAYS)
+    reader_ids, book_ids = range(1, args.readers + 1), range(1, args.books + 1)
+    reader_weights = list(itertools.accumulate(zipf_weights(args.readers, 0.8)))
+    book_weights = list(itertools.accumulate(zipf_weights(args.books, 0.9)))
+
+    async with engine.begin() as conn:
+        for offset in range(0, args.loans, INSERT_BATCH):
+            size = min(INSERT_BATCH, args.loans - offset)
+            readers = rng.choices(reader_ids, cum_weights=reader_weights, k=size)
+            books = rng.choices(book_ids, cum_weights=book_weights, k=size)
+            rows = []
+            for i in range(size):
+                loan_id = offset + i + 1
+                if loan_id <= len(open_books):
+                    book_id = open_books[loan_id - 1]
+                    # Часть открытых займов выдана дольше двух недель назад — они просрочены
+                    loan_date = today - timedelta(days=rng.randint(0, 60))
+                    return_date = None
+                else:
+                    book_id = books[i]
+                    loan_date = history_start + timedelta(days=rng.randint(0, HISTORY_DAYS - 1))
+                    return_date = min(loan_date + timedelta(days=rng.randint(1, 30)), today)
+                rows.append({
+                    "id": loan_id, "book_id": book_id, "reader_id": readers[i], "loan_date": loan_date,
+                    "expected_return_date": loan_date + LOAN_PERIOD, "return_date": return_date,
+                })
+            await conn.execute(insert(Loan.__table__), rows)
+
+
+async def generate(engine: AsyncEngine, args) -> dict:
+    rng = random.Random(args.seed)
+
+    authors = [{"id": i + 1, "name": f"Автор {i + 1}"} for i in range(args.authors)]
+    addresses = [
+        {"id": i + 1, "city": rng.choice(CITIES), "street": f"ул. Синтетическая, {i + 1}"}
+        for i in range(args.addresses)
+    ]
+    readers = [
+        {"id": i + 1, "name": f"Читатель {i + 1}", "address_id": rng.randint(1, args.addresses)}
+        for i in range(args.readers)
+    ]
+    n_open = min(int(args.loans * args.open_ratio), args.books)
+    open_books = rng.sample(range(1, args.books + 1), n_open)
+    on_loan = set(open_books)
+    author_ids = rng.choices(range(1, args.authors + 1), zipf_weights(args.authors), k=args.books)
+    genres = rng.choices(GENRES, zipf_weights(len(GENRES), 0.7), k=args.books)
+    books = [
+        {
+            "id": i + 1, "title": f"Книга {i + 1}", "genre": genres[i], "author_id": author_ids[i],
+            "is_available": i + 1 not in on_loan, "available_copies": 0 if i + 1 in on_loan else 1,
+            # Рейтинг считается свежим, чтобы бенчмарки не обращались к Google Books
+            "average_rating": round(rng.uniform(2.5, 5.0), 1), "rating_fetched_at": datetime.utcnow(),
+        }
+        for i in range(args.books)
+    ]
+
+    timings = {}
+    for name, table, rows in (
+            ("authors", Author.__table__, authors),
+            ("addresses", Address.__table__, addresses),
+            ("readers", Reader.__table__, readers),
+            ("books", Book.__table__, books),
+    ):
+        started = time.perf_counter()
+        await _insert(engine, table, rows)
+        timings[f"{name}_seconds"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await _insert_loans(engine, args, rng, open_books)
+    timings["loans_seconds"] = time.perf_counter() - started
+
+    readers_table, loans_table = Reader.__table__, Loan.__table__
+    async with engine.begin() as conn:
+        await conn.execute(
+            update(readers_table).values(last_visit=(
+                select(func.max(loans_table.c.loan_date))
+                .where(loans_table.c.reader_id == readers_table.c.id)
+                .scalar_subquery()
+            ))
+        )
+    if engine.dialect.name == "postgresql":
+        await _reset_sequences(engine)
+
+    started = time.perf_counter()
+    async with make_session_factory(engine)() as db:
+        await LoanStatsService(db).rebuild()
+    timings["loan_stats_seconds"] = time.perf_counter() - started
+
+    return {
+        "authors": args.authors, "books": args.books, "addresses": args.addresses,
+        "readers": args.readers, "loans": args.loans, "open_loans": n_open,
+        "seed": args.seed, **timings,
+    }
+
+
+async def main(args) -> dict:
+    engine = make_engine(args.url)
+    try:
+        if args.create_schema:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        async with engine.connect() as conn:
+            if await conn.scalar(select(func.count()).select_from(Book.__table__)):
+                raise SystemExit("Database already contains books: datagen needs an empty database")
+        return await generate(engine, args)
+    finally:
+        await engine.dispose()
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--url", help="URL базы, по умолчанию DATABASE_URL из настроек")
+    parser.add_argument("--create-schema", action="store_true", help="создать таблицы по моделям (для SQLite)")
+    parser.add_argument("--loans", type=int, default=1_000_000)
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--authors", type=int, default=10_000)
+    parser.add_argument("--readers", type=int, default=50_000)
+    parser.add_argument("--addresses", type=int, default=20_000)
+    parser.add_argument("--open-ratio", type=float, default=0.01, help="доля открытых займов")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -0,0 +1,131 @@
+"""Планы горячих запросов с индексами ревизии 0003 и без них.
+
+Запуск на копии рабочей базы (нужна применённая миграция 0003):
+
+    python -m benchmarks.explain_hot_queries
+
+Все запросы выполняются в одной транзакции: сначала EXPLAIN ANALYZE с
+индексами, затем индексы удаляются и планы снимаются повторно, после чего
+транзакция откатывается. DROP INDEX берёт эксклюзивную блокировку таблиц,
+поэтому скрипт не предназначен для работающей production-базы.
+"""
+import argparse
+import asyncio
+import json
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+
+HOT_INDEXES = [
+    "ix_loans_book_id",
+    "ix_loans_reader_id",
+    "ix_loans_open_book_id",
+    "ix_loans_open_reader_id",
+    "ix_books_available_id",
+    "ix_books_genre_id",
+    "ix_books_author_id_id",
+    "ix_books_title_prefix",
+    "ix_readers_address_id",
+]
+
+HOT_QUERIES = {
+    "open_loan_by_book": (
+        "SELECT id FROM loans WHERE book_id = :book_id AND return_date IS NULL"
+    ),
+    "open_loans_by_reader": (
+        "SELECT id FROM loans WHERE reader_id = :reader_id AND return_date IS NULL"
+    ),
+    "loan_history_by_reader": (
+        "SELECT count(*) FROM loans WHERE reader_id = :reader_id"
+    ),
+    "available_books_page": (
+        "SELECT id, title FROM books WHERE is_available AND id > 0 ORDER BY id LIMIT 50"
+    ),
+    "books_by_genre_page": (
+        "SELECT id, title FROM books WHERE genre = :genre AND id > 0 ORDER BY id LIMIT 50"
+    ),
+    "books_by_author_page": (
+        "SELECT id, title FROM books WHERE author_id = :author_id AND id > 0 ORDER BY id LIMIT 50"
+    ),
+    "books_by_title_prefix": (
+        "SELECT id, title FROM books WHERE title LIKE :title_prefix ORDER BY id LIMIT 50"
+    ),
+    "address_lookup": (
+        "SELECT id FROM addresses WHERE city = :city AND street = :street"
+    ),
+    "readers_by_address": (
+        "SELECT id FROM readers WHERE address_id = :address_id"
+    ),
+}
+
+
+async def _sample_params(conn) -> dict:
+    book = (await conn.execute(text(
+        "SELECT id, genre, author_id, title FROM books ORDER BY random() LIMIT 1"
+    ))).first()
+    reader = (await conn.execute(text(
+        "SELECT id, address_id FROM readers ORDER BY random() LIMIT 1"
+    ))).first()
+    address = (await conn.execute(text(
+        "SELECT city, street FROM addresses WHERE id = :id"
+    ), {"id": reader.address_id})).first()
+    return {
+        "book_id": book.id,
+        "genre": book.genre,
+        "author_id": book.author_id,
+        "title_prefix": (book.title or "")[:3] + "%",
+        "reader_id": reader.id,
+        "address_id": reader.address_id,
+        "city": address.city,
+        "street": address.street,
+    }
+
+
+async def _explain(conn, params: dict) -> dict:
+    plans = {}
+    for name, sql in HOT_QUERIES.items():
+        query_params = {key: value for key, value in params.items() if f":{key}" in sql}
+        result = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), query_params)
+        plan = result.scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        plans[name] = plan[0]
+    return plans
+
+
+def _summary(plan: dict) -> str:
+    root = plan["Plan"]
+    return f"{plan['Execution Time']:9.3f} ms  {root['Node Type']}"
+
+
+async def main(verbose: bool) -> None:
+    engine = create_async_engine(settings.DATABASE_URL)
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            params = await _sample_params(conn)
+            with_indexes = await _explain(conn, params)
+            for index in HOT_INDEXES:
+                await conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+            await conn.execute(text(
+                "ALTER TABLE addresses DROP CONSTRAINT IF EXISTS uq_addresses_city_street"
+            ))
+            without_indexes = await _explain(conn, params)
+        finally:
+            await transaction.rollback()
+    await engine.dispose()
+
+    print(f"{'query':<26} {'without indexes':<40} {'with indexes'}")
+    for name in HOT_QUERIES:
+        print(f"{name:<26} {_summary(without_indexes[name]):<40} {_summary(with_indexes[name])}")
+        if verbose:
+            print(json.dumps({"without": without_indexes[name], "with": with_indexes[name]}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--verbose", action="store_true", help="печатать полные планы")
+    args = parser.parse_args()
+    asyncio.run(main(args.verbose))
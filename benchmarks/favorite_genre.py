@@ -0,0 +1,140 @@
+"""Сравнение прежнего и оконного запроса «любимый жанр читателя».
+
+    python -m benchmarks.favorite_genre --loans 1000000
+    python -m benchmarks.favorite_genre --url sqlite+aiosqlite:///bench.db --loans 200000
+
+Скрипт создаёт собственные таблицы bench_fg_books и bench_fg_loans со
+скошенным распределением жанров и читателей, выполняет оба запроса по всей
+истории займов и печатает время и совпадение результатов. Таблицы
+удаляются после прогона.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import Column, Date, Integer, MetaData, String, Table, and_, func, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+
+metadata = MetaData()
+books = Table(
+    "bench_fg_books", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("genre", String, nullable=False),
+)
+loans = Table(
+    "bench_fg_loans", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("book_id", Integer, nullable=False, index=True),
+    Column("reader_id", Integer, nullable=False, index=True),
+    Column("loan_date", Date, nullable=False),
+)
+
+INSERT_BATCH = 10000
+
+
+def legacy_query():
+    per_genre = (
+        select(loans.c.reader_id, books.c.genre, func.count(loans.c.id).label("genre_count"))
+        .join(books, books.c.id == loans.c.book_id)
+        .group_by(loans.c.reader_id, books.c.genre)
+        .subquery()
+    )
+    max_counts = (
+        select(per_genre.c.reader_id, func.max(per_genre.c.genre_count).label("max_count"))
+        .group_by(per_genre.c.reader_id)
+        .subquery()
+    )
+    return select(per_genre.c.reader_id, per_genre.c.genre, per_genre.c.genre_count).join(
+        max_counts,
+        onclause=and_(
+            per_genre.c.reader_id == max_counts.c.reader_id,
+            per_genre.c.genre_count == max_counts.c.max_count
+        )
+    )
+
+
+def ranking_query(top_n: int = 1):
+    counts = (
+        select(loans.c.reader_id, books.c.genre, func.count(loans.c.id).label("genre_count"))
+        .join(books, books.c.id == loans.c.book_id)
+        .group_by(loans.c.reader_id, books.c.genre)
+        .subquery()
+    )
+    position = func.rank().over(partition_by=counts.c.reader_id, order_by=counts.c.genre_count.desc())
+    ranked = select(counts, position.label("position")).subquery()
+    return select(ranked.c.reader_id, ranked.c.genre, ranked.c.genre_count).where(ranked.c.position <= top_n)
+
+
+async def _fill(conn, n_loans: int, n_readers: int, n_books: int, n_genres: int, seed: int) -> None:
+    rng = random.Random(seed)
+    genres = [f"genre-{i}" for i in range(n_genres)]
+    genre_weights = [1 / (i + 1) for i in range(n_genres)]
+    await conn.execute(insert(books), [
+        {"id": i + 1, "genre": rng.choices(genres, genre_weights)[0]} for i in range(n_books)
+    ])
+
+    reader_weights = [1 / (i + 1) ** 0.8 for i in range(n_readers)]
+    start = date.today() - timedelta(days=3 * 365)
+    for offset in range(0, n_loans, INSERT_BATCH):
+        size = min(INSERT_BATCH, n_loans - offset)
+        readers = rng.choices(range(1, n_readers + 1), reader_weights, k=size)
+        await conn.execute(insert(loans), [
+            {
+                "id": offset + i + 1,
+                "book_id": rng.randint(1, n_books),
+                "reader_id": readers[i],
+                "loan_date": start + timedelta(days=rng.randint(0, 3 * 365)),
+            }
+            for i in range(size)
+        ])
+
+
+async def _time(conn, query, repeats: int):
+    timings, rows = [], None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        rows = (await conn.execute(query)).all()
+        timings.append(time.perf_counter() - started)
+    return min(timings), {tuple(row) for row in rows}
+
+
+async def main(args) -> dict:
+    engine = create_async_engine(args.url or settings.DATABASE_URL)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(metadata.drop_all)
+            await conn.run_sync(metadata.create_all)
+            await _fill(conn, args.loans, args.readers, args.books, args.genres, args.seed)
+        async with engine.connect() as conn:
+            legacy_time, legacy_rows = await _time(conn, legacy_query(), args.repeats)
+            ranking_time, ranking_rows = await _time(conn, ranking_query(), args.repeats)
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(metadata.drop_all)
+        await engine.dispose()
+
+    return {
+        "loans": args.loans,
+        "readers": args.readers,
+        "legacy_seconds": legacy_time,
+        "ranking_seconds": ranking_time,
+        "speedup": legacy_time / ranking_time if ranking_time else None,
+        "same_result": legacy_rows == ranking_rows,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="URL базы, по умолчанию DATABASE_URL из настроек")
+    parser.add_argument("--loans", type=int, default=1_000_000)
+    parser.add_argument("--readers", type=int, default=50_000)
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--genres", type=int, default=40)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -0,0 +1,177 @@
+"""HTTP-нагрузка на запущенный API: выдачи, возвраты, списки и отчёты.
+
+    uvicorn app.main:app --host 127.0.0.1 --port 8080
+    python -m benchmarks.http_load --users 50 --duration 60
+    python -m benchmarks.http_load --mix checkout=5,return=5,list=3,report=1 --compare benchmarks/results/http_load-<commit>.json
+
+Каждый виртуальный пользователь в цикле выбирает действие по весам --mix:
+checkout выдаёт случайную доступную книгу случайному читателю, return
+возвращает одну из выданных в этом прогоне книг, list читает страницу
+доступных книг, report запрашивает случайный отчёт. Идентификаторы
+читателей и книг берутся из базы (например, заполненной benchmarks.datagen).
+По каждому действию считаются пропускная способность, задержки и ошибки;
+результат пишется в benchmarks/results/http_load-<commit>.json. Займы,
+оставшиеся открытыми, возвращаются в конце прогона.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import aiohttp
+from sqlalchemy import select
+
+from app.db.session import SessionLocal, engine
+from app.models import Book, Reader
+from benchmarks import results
+
+REPORTS = [
+    "/api/v1/reports/summary",
+    "/api/v1/reports/books-on-hands",
+    "/api/v1/reports/top-author",
+    "/api/v1/reports/popular-genres",
+    "/api/v1/reports/popular-genres?bucket=month",
+    "/api/v1/reports/favorite-genres?limit=100",
+    "/api/v1/reports/books-by-readers?bucket=week",
+]
+
+
+class LoadState:
+    def __init__(self, book_ids: List[int], reader_ids: List[int]):
+        self.available = list(book_ids)
+        self.reader_ids = reader_ids
+        self.open_loans: List[int] = []
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+
+async def _checkout(http: aiohttp.ClientSession, base_url: str, state: LoadState) -> bool:
+    if not state.available:
+        return True
+    book_id = state.available.pop(random.randrange(len(state.available)))
+    payload = {"book_id": book_id, "reader_id": random.choice(state.reader_ids)}
+    async with http.post(f"{base_url}/api/v1/loans/", json=payload) as response:
+        if response.status == 200:
+            state.open_loans.append((await response.json())["id"])
+            return True
+        # Книгу мог выдать кто-то другой: это не ошибка сервиса
+        return response.status == 400
+
+
+async def _return(http: aiohttp.ClientSession, base_url: str, state: LoadState) -> bool:
+    if not state.open_loans:
+        return True
+    loan_id = state.open_loans.pop(random.randrange(len(state.open_loans)))
+    async with http.put(f"{base_url}/api/v1/loans/{loan_id}/return") as response:
+        if response.status == 200:
+            state.available.append((await response.json())["book_id"])
+        return response.status == 200
+
+
+async def _list(http: aiohttp.ClientSession, base_url: str, state: LoadState) -> bool:
+    async with http.get(f"{base_url}/api/v1/books/available", params={"limit": 50}) as response:
+        await response.read()
+        return response.status == 200
+
+
+async def _report(http: aiohttp.ClientSession, base_url: str, state: LoadState) -> bool:
+    async with http.get(base_url + random.choice(REPORTS)) as response:
+        await response.read()
+        return response.status == 200
+
+
+ACTIONS = {"checkout": _checkout, "return": _return, "list": _list, "report": _report}
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, weight = part.split("=")
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"Unknown action: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+async def _user(http: aiohttp.ClientSession, base_url: str, state: LoadState, mix: Dict[str, float],
+                deadline: float) -> None:
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        name = random.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            ok = await ACTIONS[name](http, base_url, state)
+        except aiohttp.ClientError:
+            ok = False
+        state.latencies[name].append(time.perf_counter() - started)
+        if not ok:
+            state.errors[name] += 1
+
+
+async def _load_ids(sample: int):
+    async with SessionLocal() as db:
+        book_ids = list((await db.scalars(
+            select(Book.id).where(Book.is_available == True).limit(sample)
+        )).all())
+        reader_ids = list((await db.scalars(select(Reader.id).limit(sample))).all())
+    await engine.dispose()
+    return book_ids, reader_ids
+
+
+async def main(args) -> dict:
+    random.seed(args.seed)
+    state = LoadState(*await _load_ids(args.sample))
+    connector = aiohttp.TCPConnector(limit=args.users)
+    async with aiohttp.ClientSession(connector=connector) as http:
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(_user(http, args.base_url, state, args.mix, deadline) for _ in range(args.users)))
+        elapsed = time.perf_counter() - started
+
+        # Возвращаем всё, что осталось на руках после прогона
+        while state.open_loans:
+            await _return(http, args.base_url, state)
+
+    actions = {
+        name: {
+            **results.summarize(latencies),
+            "requests_per_second": len(latencies) / elapsed,
+            "errors": state.errors.get(name, 0),
+        }
+        for name, latencies in state.latencies.items()
+    }
+    total = sum(len(latencies) for latencies in state.latencies.values())
+    return {
+        "users": args.users,
+        "duration_seconds": elapsed,
+        "mix": args.mix,
+        "requests_per_second": total / elapsed,
+        "results": actions,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8080")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("checkout=4,return=4,list=3,report=1"))
+    parser.add_argument("--sample", type=int, default=5000, help="сколько книг и читателей взять из базы")
+    parser.add_argument("--output", help="файл результата, по умолчанию benchmarks/results/http_load-<commit>.json")
+    parser.add_argument("--compare", help="JSON прошлого прогона для поиска регрессий")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    payload = asyncio.run(main(args))
+    path = results.save("http_load", payload, args.output)
+    print(f"Results saved to {path}", file=sys.stderr)
+    if args.compare:
+        regressions = results.compare(payload["results"], results.load(args.compare)["results"],
+                                      threshold=args.threshold)
+        print(json.dumps(regressions, indent=2))
+        sys.exit(1 if regressions else 0)
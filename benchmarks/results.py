@@ -0,0 +1,65 @@
+"""Сохранение результатов бенчмарков в JSON и сравнение с прошлым прогоном."""
+import json
+import os
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    """Минимум, медиана, p95 и среднее в миллисекундах."""
+    ordered = sorted(timings)
+    return {
+        "runs": len(ordered),
+        "min_ms": ordered[0] * 1000,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+    }
+
+
+def save(name: str, payload: dict, output: Optional[str] = None) -> str:
+    commit = git_commit()
+    document = {
+        "benchmark": name,
+        "commit": commit,
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        **payload,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{commit or 'nogit'}.json")
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2, default=str)
+    return output
+
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict], key: str = "p50_ms",
+            threshold: float = 1.2) -> List[dict]:
+    """Операции, ставшие медленнее базового прогона более чем в threshold раз."""
+    regressions = []
+    for name, result in current.items():
+        before = baseline.get(name, {}).get(key)
+        after = result.get(key)
+        if before and after and after / before > threshold:
+            regressions.append({"operation": name, "baseline": before, "current": after, "ratio": after / before})
+    return regressions
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,416 @@
+"""Микробенчмарки операций LibraryService, ReportService и OverdueService.
+
+    python -m benchmarks.datagen --loans 1000000
+    python -m benchmarks.suite --runs 20
+    python -m benchmarks.suite --runs 20 --compare benchmarks/results/suite-<commit>.json
+
+Каждая операция выполняется --runs раз в новой сессии, время подготовки
+(создание книг, займов, читателей) в замер не входит. Отчёты вызываются
+в обход кэша отчётов. Результат пишется в benchmarks/results/suite-<commit>.json;
+с --compare печатаются операции, медиана которых выросла больше чем в
+--threshold раз, и код выхода становится 1. Созданные данные помечаются
+префиксом bench- и удаляются в конце прогона. Операции, обращающиеся к
+внешним API (GeoJSON, обновление рейтингов), по умолчанию пропускаются.
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, select, update
+
+from app.core.config import settings
+from app.db.session import make_engine, make_session_factory
+from app.models import Address, Author, Book, Loan, Reader
+from app.schemas import BookCreate, BookUpdate, LoanCreate, ReaderCreate, ReaderUpdate, ReaderResponse, AddressCreate
+from app.services import LibraryService, ReportService
+from app.services.loan_archive import LoanArchiver
+from app.services.overdue import OverdueService
+from benchmarks import results
+
+Prepare = Callable[[LibraryService, dict], Awaitable[object]]
+Run = Callable[..., Awaitable[object]]
+
+BENCHMARKS: Dict[str, tuple] = {}
+
+ARCHIVE_CUTOFF = date(1900, 1, 2)
+
+
+def benchmark(name: str, prepare: Optional[Prepare] = None, external: bool = False):
+    def decorator(run: Run) -> Run:
+        BENCHMARKS[name] = (prepare, run, external)
+        return run
+    return decorator
+
+
+def uncached(method):
+    # Декораторы кэша и замеров сохраняют исходный метод в __wrapped__
+    return inspect.unwrap(method)
+
+
+# === Подготовка ===
+async def new_book(service: LibraryService, ctx: dict) -> int:
+    ctx["seq"] += 1
+    book = await service.create_book(
+        BookCreate(title=f"{ctx['marker']}-{ctx['seq']}", genre=ctx["marker"], author_name=ctx["marker"])
+    )
+    ctx["books"].append(book.id)
+    return book.id
+
+
+async def new_books(service: LibraryService, ctx: dict, count: int = 10) -> List[int]:
+    return [await new_book(service, ctx) for _ in range(count)]
+
+
+async def new_reader(service: LibraryService, ctx: dict) -> int:
+    ctx["seq"] += 1
+    reader = await service.create_reader(ReaderCreate(
+        name=f"{ctx['marker']}-{ctx['seq']}", address=AddressCreate(city=ctx["marker"], street=ctx["marker"])
+    ))
+    # Та же проверка, что у ответа POST /api/v1/readers/: last_visit должен быть датой
+    ReaderResponse.model_validate(reader)
+    ctx["readers"].append(reader.id)
+    return reader.id
+
+
+async def new_loan(service: LibraryService, ctx: dict) -> int:
+    book_id = await new_book(service, ctx)
+    loan = await service.create_loan(LoanCreate(book_id=book_id, reader_id=random.choice(ctx["reader_ids"])))
+    return loan.id
+
+
+async def new_archivable_loan(service: LibraryService, ctx: dict) -> int:
+    # Дата возврата раньше ARCHIVE_CUTOFF: в архив попадают только займы бенчмарка
+    loan_id = await new_loan(service, ctx)
+    await service.return_loan(loan_id)
+    await service.db.execute(
+        update(Loan).where(Loan.id == loan_id).values(return_date=ARCHIVE_CUTOFF - timedelta(days=1))
+    )
+    await service.db.commit()
+    return loan_id
+
+
+async def new_bulk_loans(service: LibraryService, ctx: dict) -> List[int]:
+    book_ids = await new_books(service, ctx)
+    loans = await service.create_loans_bulk(random.choice(ctx["reader_ids"]), book_ids)
+    return [loan.id for loan in loans.values()]
+
+
+async def new_weeding_batch(service: LibraryService, ctx: dict) -> str:
+    genre = f"{ctx['marker']}-weed-{ctx['seq']}"
+    for _ in range(20):
+        ctx["seq"] += 1
+        book = await service.create_book(
+            BookCreate(title=f"{ctx['marker']}-{ctx['seq']}", genre=genre, author_name=ctx["marker"])
+        )
+        ctx["books"].append(book.id)
+    return genre
+
+
+# === LibraryService ===
+@benchmark("library.create_book")
+async def bench_library_create_book(db, ctx, _arg):
+    await new_book(LibraryService(db), ctx)
+
+
+@benchmark("library.get_book")
+async def bench_library_get_book(db, ctx, _arg):
+    await LibraryService(db).get_book(random.choice(ctx["book_ids"]))
+
+
+@benchmark("library.get_book_with_rating")
+async def bench_library_get_book_with_rating(db, ctx, _arg):
+    await LibraryService(db).get_book_with_rating(random.choice(ctx["book_ids"]))
+
+
+@benchmark("library.update_book", prepare=new_book)
+async def bench_library_update_book(db, ctx, book_id):
+    await LibraryService(db).update_book(book_id, BookUpdate(title="bk", genre=ctx["marker"], author_name=None))
+
+
+@benchmark("library.delete_book", prepare=new_book)
+async def bench_library_delete_book(db, ctx, book_id):
+    await LibraryService(db).delete_book(book_id)
+
+
+@benchmark("library.delete_books_bulk", prepare=new_weeding_batch)
+async def bench_library_delete_books_bulk(db, ctx, genre):
+    await LibraryService(db).delete_books_bulk(genre=genre)
+
+
+@benchmark("library.list_books")
+async def bench_library_list_books(db, ctx, _arg):
+    await LibraryService(db).list_books(after_id=random.choice(ctx["book_ids"]))
+
+
+@benchmark("library.list_books_by_genre")
+async def bench_library_list_books_by_genre(db, ctx, _arg):
+    await LibraryService(db).list_books(genre=random.choice(ctx["genres"]))
+
+
+@benchmark("library.list_books_by_author")
+async def bench_library_list_books_by_author(db, ctx, _arg):
+    await LibraryService(db).list_books(author=random.choice(ctx["authors"]))
+
+
+@benchmark("library.list_books_by_title_prefix")
+async def bench_library_list_books_by_title_prefix(db, ctx, _arg):
+    await LibraryService(db).list_books(title_prefix="Книга 1")
+
+
+@benchmark("library.get_available_books")
+async def bench_library_get_available_books(db, ctx, _arg):
+    await LibraryService(db).get_available_books()
+
+
+@benchmark("library.stream_books")
+async def bench_library_stream_books(db, ctx, _arg):
+    count = 0
+    async for _book in LibraryService(db).stream_books():
+        count += 1
+        if count >= settings.BOOK_STREAM_BATCH_SIZE * 5:
+            break
+
+
+@benchmark("library.create_reader")
+async def bench_library_create_reader(db, ctx, _arg):
+    await new_reader(LibraryService(db), ctx)
+
+
+@benchmark("library.get_reader")
+async def bench_library_get_reader(db, ctx, _arg):
+    await LibraryService(db).get_reader(random.choice(ctx["reader_ids"]))
+
+
+@benchmark("library.update_reader", prepare=new_reader)
+async def bench_library_update_reader(db, ctx, reader_id):
+    reader = await LibraryService(db).update_reader(reader_id, ReaderUpdate(
+        name=f"{ctx['marker']}-updated", address=AddressCreate(city=ctx["marker"], street=ctx["marker"])
+    ))
+    ReaderResponse.model_validate(reader)
+
+
+@benchmark("library.delete_reader", prepare=new_reader)
+async def bench_library_delete_reader(db, ctx, reader_id):
+    await LibraryService(db).delete_reader(reader_id)
+    ctx["readers"].remove(reader_id)
+
+
+@benchmark("library.create_loan", prepare=new_book)
+async def bench_library_create_loan(db, ctx, book_id):
+    await LibraryService(db).create_loan(LoanCreate(book_id=book_id, reader_id=random.choice(ctx["reader_ids"])))
+
+
+@benchmark("library.return_loan", prepare=new_loan)
+async def bench_library_return_loan(db, ctx, loan_id):
+    await LibraryService(db).return_loan(loan_id)
+
+
+@benchmark("library.create_loans_bulk", prepare=new_books)
+async def bench_library_create_loans_bulk(db, ctx, book_ids):
+    await LibraryService(db).create_loans_bulk(random.choice(ctx["reader_ids"]), book_ids)
+
+
+@benchmark("library.return_loans_bulk", prepare=new_bulk_loans)
+async def bench_library_return_loans_bulk(db, ctx, loan_ids):
+    await LibraryService(db).return_loans_bulk(loan_ids)
+
+
+@benchmark("loan_archive.archive_batch", prepare=new_archivable_loan)
+async def bench_loan_archive_archive_batch(db, ctx, loan_id):
+    # На PostgreSQL идёт через ветку DELETE ... RETURNING -> INSERT
+    moved = await LoanArchiver(db, batch_size=10).archive_batch(ARCHIVE_CUTOFF)
+    await db.commit()
+    if not moved:
+        raise RuntimeError(f"Loan {loan_id} was not archived")
+
+
+@benchmark("library.refresh_stale_ratings", external=True)
+async def bench_library_refresh_stale_ratings(db, ctx, _arg):
+    await LibraryService(db).refresh_stale_ratings()
+
+
+# === ReportService ===
+def _window() -> dict:
+    return {"date_from": date.today() - timedelta(days=90), "date_to": date.today()}
+
+
+@benchmark("reports.count_books_and_readers")
+async def bench_reports_count_books_and_readers(db, ctx, _arg):
+    await uncached(ReportService.count_books_and_readers)(ReportService(db))
+
+
+@benchmark("reports.books_taken_by_readers")
+async def bench_reports_books_taken_by_readers(db, ctx, _arg):
+    await uncached(ReportService.books_taken_by_readers)(ReportService(db))
+
+
+@benchmark("reports.books_taken_by_readers_window")
+async def bench_reports_books_taken_by_readers_window(db, ctx, _arg):
+    await uncached(ReportService.books_taken_by_readers)(ReportService(db), **_window())
+
+
+@benchmark("reports.books_taken_by_readers_monthly")
+async def bench_reports_books_taken_by_readers_monthly(db, ctx, _arg):
+    await uncached(ReportService.books_taken_by_readers)(ReportService(db), bucket="month", **_window())
+
+
+@benchmark("reports.books_currently_held_by_readers")
+async def bench_reports_books_currently_held_by_readers(db, ctx, _arg):
+    await uncached(ReportService.books_currently_held_by_readers)(ReportService(db))
+
+
+@benchmark("reports.last_visit_dates")
+async def bench_reports_last_visit_dates(db, ctx, _arg):
+    await uncached(ReportService.last_visit_dates)(ReportService(db))
+
+
+@benchmark("reports.most_read_author")
+async def bench_reports_most_read_author(db, ctx, _arg):
+    await uncached(ReportService.most_read_author)(ReportService(db))
+
+
+@benchmark("reports.most_read_author_monthly")
+async def bench_reports_most_read_author_monthly(db, ctx, _arg):
+    await uncached(ReportService.most_read_author)(ReportService(db), bucket="month")
+
+
+@benchmark("reports.popular_genres")
+async def bench_reports_popular_genres(db, ctx, _arg):
+    await uncached(ReportService.popular_genres)(ReportService(db))
+
+
+@benchmark("reports.popular_genres_window")
+async def bench_reports_popular_genres_window(db, ctx, _arg):
+    await uncached(ReportService.popular_genres)(ReportService(db), **_window())
+
+
+@benchmark("reports.favorite_genre_per_reader")
+async def bench_reports_favorite_genre_per_reader(db, ctx, _arg):
+    await uncached(ReportService.favorite_genre_per_reader)(ReportService(db), limit=1000)
+
+
+@benchmark("reports.favorite_genre_per_reader_window")
+async def bench_reports_favorite_genre_per_reader_window(db, ctx, _arg):
+    await uncached(ReportService.favorite_genre_per_reader)(ReportService(db), limit=1000, **_window())
+
+
+@benchmark("reports.generate_geojson", external=True)
+async def bench_reports_generate_geojson(db, ctx, _arg):
+    await ReportService(db).generate_geojson(f"{settings.REPORTS_DIR}/bench_{ctx['marker']}.geojson")
+
+
+# === OverdueService ===
+@benchmark("overdue.list_overdue")
+async def bench_overdue_list_overdue(db, ctx, _arg):
+    await OverdueService(db).list_overdue(limit=500)
+
+
+@benchmark("overdue.reader_summaries")
+async def bench_overdue_reader_summaries(db, ctx, _arg):
+    await OverdueService(db).reader_summaries(limit=500)
+
+
+# === Прогон ===
+async def _sample_context(sessions, marker: str) -> dict:
+    async with sessions() as db:
+        sample = func.random()
+        return {
+            "marker": marker,
+            "seq": 0,
+            "books": [],
+            "readers": [],
+            "book_ids": list((await db.scalars(select(Book.id).order_by(sample).limit(1000))).all()),
+            "reader_ids": list((await db.scalars(select(Reader.id).order_by(sample).limit(1000))).all()),
+            "genres": list((await db.scalars(select(Book.genre).distinct().limit(100))).all()),
+            "authors": list((await db.scalars(select(Author.name).order_by(sample).limit(100))).all()),
+            "dataset": {
+                "books": await db.scalar(select(func.count()).select_from(Book)),
+                "readers": await db.scalar(select(func.count()).select_from(Reader)),
+                "loans": await db.scalar(select(func.count()).select_from(Loan)),
+            },
+        }
+
+
+async def _cleanup(sessions, ctx: dict) -> None:
+    async with sessions() as db:
+        service = LibraryService(db)
+        open_loans = list((await db.scalars(
+            select(Loan.id).where(Loan.book_id.in_(ctx["books"]), Loan.return_date.is_(None))
+        )).all()) if ctx["books"] else []
+        if open_loans:
+            await service.return_loans_bulk(open_loans)
+        if ctx["books"]:
+            await service.delete_books_bulk(book_ids=ctx["books"])
+        for reader_id in ctx["readers"]:
+            await service.delete_reader(reader_id)
+        await db.execute(delete(Author).where(Author.name == ctx["marker"]))
+        await db.execute(delete(Address).where(Address.city == ctx["marker"]))
+        await db.commit()
+
+
+async def _measure(sessions, ctx: dict, prepare: Optional[Prepare], run: Run, runs: int) -> List[float]:
+    timings = []
+    for _ in range(runs):
+        arg = None
+        if prepare is not None:
+            async with sessions() as db:
+                arg = await prepare(LibraryService(db), ctx)
+        async with sessions() as db:
+            started = time.perf_counter()
+            await run(db, ctx, arg)
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def main(args) -> dict:
+    engine = make_engine(args.url)
+    sessions = make_session_factory(engine)
+    random.seed(args.seed)
+    ctx = await _sample_context(sessions, f"bench-{uuid.uuid4().hex[:8]}")
+    measured, skipped = {}, {}
+    try:
+        for name, (prepare, run, external) in BENCHMARKS.items():
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            if external and not args.include_external:
+                skipped[name] = "external API"
+                continue
+            await _measure(sessions, ctx, prepare, run, args.warmup)
+            measured[name] = results.summarize(await _measure(sessions, ctx, prepare, run, args.runs))
+            print(f"{name}: p50 {measured[name]['p50_ms']:.2f} ms", file=sys.stderr)
+    finally:
+        await _cleanup(sessions, ctx)
+        await engine.dispose()
+
+    return {"dialect": engine.dialect.name, "dataset": ctx["dataset"], "runs": args.runs,
+            "results": measured, "skipped": skipped}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="URL базы, по умолчанию DATABASE_URL из настроек")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--only", nargs="*", help="префиксы операций, например reports. library.list")
+    parser.add_argument("--include-external", action="store_true", help="включить операции с внешними API")
+    parser.add_argument("--output", help="файл результата, по умолчанию benchmarks/results/suite-<commit>.json")
+    parser.add_argument("--compare", help="JSON прошлого прогона для поиска регрессий")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    payload = asyncio.run(main(args))
+    path = results.save("suite", payload, args.output)
+    print(f"Results saved to {path}", file=sys.stderr)
+    if args.compare:
+        regressions = results.compare(payload["results"], results.load(args.compare)["results"],
+                                      threshold=args.threshold)
+        print(json.dumps(regressions, indent=2))
+        sys.exit(1 if regressions else 0)
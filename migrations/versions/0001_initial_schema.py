@@ -0,0 +1,86 @@
+"""initial schema
+
+Схема, которую создавал Base.metadata.create_all до перехода на миграции.
+Существующую базу с такой схемой достаточно пометить: alembic stamp 0001
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "authors",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_table(
+        "addresses",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("city", sa.String(), nullable=True),
+        sa.Column("street", sa.String(), nullable=True),
+    )
+    op.create_table(
+        "books",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(), nullable=True),
+        sa.Column("genre", sa.String(), nullable=True),
+        sa.Column("author_id", sa.Integer(), sa.ForeignKey("authors.id"), nullable=True),
+        sa.Column("is_available", sa.Boolean(), nullable=True),
+    )
+    op.create_table(
+        "readers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("address_id", sa.Integer(), sa.ForeignKey("addresses.id"), nullable=True),
+        sa.Column("last_visit", sa.Date(), nullable=True),
+    )
+    op.create_index("ix_readers_id", "readers", ["id"])
+    op.create_table(
+        "loans",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("book_id", sa.Integer(), sa.ForeignKey("books.id"), nullable=True),
+        sa.Column("reader_id", sa.Integer(), sa.ForeignKey("readers.id"), nullable=True),
+        sa.Column("loan_date", sa.Date(), nullable=True),
+        sa.Column("expected_return_date", sa.Date(), nullable=True),
+        sa.Column("return_date", sa.Date(), nullable=True),
+    )
+    op.create_index("ix_loans_id", "loans", ["id"])
+    op.create_table(
+        "archived_books",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("original_book_id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("genre", sa.String(), nullable=False),
+        sa.Column("author_name", sa.String(), nullable=False),
+    )
+    op.create_table(
+        "archived_loans",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("original_loan_id", sa.Integer(), nullable=False),
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("reader_id", sa.Integer(), nullable=False),
+        sa.Column("loan_date", sa.Date(), nullable=False),
+        sa.Column("expected_return_date", sa.Date(), nullable=False),
+        sa.Column("return_date", sa.Date(), nullable=True),
+    )
+    op.create_index("ix_archived_loans_original_loan_id", "archived_loans", ["original_loan_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("archived_loans")
+    op.drop_table("archived_books")
+    op.drop_table("loans")
+    op.drop_table("readers")
+    op.drop_table("books")
+    op.drop_table("addresses")
+    op.drop_table("authors")
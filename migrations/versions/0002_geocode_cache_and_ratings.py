@@ -0,0 +1,34 @@
+"""geocode cache and stored book ratings
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "address_geocodes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("city_key", sa.String(), nullable=False),
+        sa.Column("street_key", sa.String(), nullable=False),
+        sa.Column("latitude", sa.Float(), nullable=True),
+        sa.Column("longitude", sa.Float(), nullable=True),
+        sa.Column("fetched_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("city_key", "street_key", name="uq_address_geocodes_key"),
+    )
+    op.add_column("books", sa.Column("average_rating", sa.Float(), nullable=True))
+    op.add_column("books", sa.Column("rating_fetched_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("books", "rating_fetched_at")
+    op.drop_column("books", "average_rating")
+    op.drop_table("address_geocodes")
@@ -0,0 +1,77 @@
+"""indexes for hot lookup columns
+
+Индексы создаются с CONCURRENTLY, чтобы не блокировать запись в рабочие
+таблицы. Перед созданием уникального индекса по адресам дубликаты
+(city, street) сливаются в строку с минимальным id.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+OPEN_LOAN = sa.text("return_date IS NULL")
+AVAILABLE_BOOK = sa.text("is_available")
+
+
+def upgrade() -> None:
+    op.execute("""
+        UPDATE readers SET address_id = d.keep_id
+        FROM (SELECT id, min(id) OVER (PARTITION BY city, street) AS keep_id FROM addresses) AS d
+        WHERE readers.address_id = d.id AND d.id <> d.keep_id
+    """)
+    op.execute("""
+        DELETE FROM addresses
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, min(id) OVER (PARTITION BY city, street) AS keep_id FROM addresses
+            ) AS d
+            WHERE d.id <> d.keep_id
+        )
+    """)
+
+    with op.get_context().autocommit_block():
+        op.create_index("ix_loans_book_id", "loans", ["book_id"], postgresql_concurrently=True)
+        op.create_index("ix_loans_reader_id", "loans", ["reader_id"], postgresql_concurrently=True)
+        op.create_index("ix_loans_open_book_id", "loans", ["book_id"],
+                        postgresql_where=OPEN_LOAN, sqlite_where=OPEN_LOAN, postgresql_concurrently=True)
+        op.create_index("ix_loans_open_reader_id", "loans", ["reader_id"],
+                        postgresql_where=OPEN_LOAN, sqlite_where=OPEN_LOAN, postgresql_concurrently=True)
+        op.create_index("ix_books_available_id", "books", ["id"],
+                        postgresql_where=AVAILABLE_BOOK, sqlite_where=AVAILABLE_BOOK, postgresql_concurrently=True)
+        op.create_index("ix_books_genre_id", "books", ["genre", "id"], postgresql_concurrently=True)
+        op.create_index("ix_books_author_id_id", "books", ["author_id", "id"], postgresql_concurrently=True)
+        op.create_index("ix_books_title_prefix", "books", ["title"],
+                        postgresql_ops={"title": "text_pattern_ops"}, postgresql_concurrently=True)
+        op.create_index("ix_readers_address_id", "readers", ["address_id"], postgresql_concurrently=True)
+        op.create_index("uq_addresses_city_street", "addresses", ["city", "street"],
+                        unique=True, postgresql_concurrently=True)
+
+    # Ограничение поверх готового индекса берётся без долгой блокировки
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "ALTER TABLE addresses ADD CONSTRAINT uq_addresses_city_street "
+            "UNIQUE USING INDEX uq_addresses_city_street"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_constraint("uq_addresses_city_street", "addresses", type_="unique")
+    else:
+        op.drop_index("uq_addresses_city_street", table_name="addresses")
+    op.drop_index("ix_readers_address_id", table_name="readers")
+    op.drop_index("ix_books_title_prefix", table_name="books")
+    op.drop_index("ix_books_author_id_id", table_name="books")
+    op.drop_index("ix_books_genre_id", table_name="books")
+    op.drop_index("ix_books_available_id", table_name="books")
+    op.drop_index("ix_loans_open_reader_id", table_name="loans")
+    op.drop_index("ix_loans_open_book_id", table_name="loans")
+    op.drop_index("ix_loans_reader_id", table_name="loans")
+    op.drop_index("ix_loans_book_id", table_name="loans")
@@ -0,0 +1,69 @@
+"""incrementally maintained loan counters
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "reader_loan_stats",
+        sa.Column("reader_id", sa.Integer(), primary_key=True),
+        sa.Column("total_loans", sa.Integer(), nullable=False),
+        sa.Column("on_hand", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "author_loan_stats",
+        sa.Column("author_id", sa.Integer(), primary_key=True),
+        sa.Column("loan_count", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_author_loan_stats_loan_count", "author_loan_stats", ["loan_count"])
+    op.create_table(
+        "genre_loan_stats",
+        sa.Column("genre", sa.String(), primary_key=True),
+        sa.Column("loan_count", sa.Integer(), nullable=False),
+    )
+    op.create_table(
+        "reader_genre_stats",
+        sa.Column("reader_id", sa.Integer(), primary_key=True),
+        sa.Column("genre", sa.String(), primary_key=True),
+        sa.Column("loan_count", sa.Integer(), nullable=False),
+    )
+
+    # Начальное заполнение по существующим займам
+    op.execute("""
+        INSERT INTO reader_loan_stats (reader_id, total_loans, on_hand)
+        SELECT reader_id, count(*), sum(CASE WHEN return_date IS NULL THEN 1 ELSE 0 END)
+        FROM loans WHERE reader_id IS NOT NULL GROUP BY reader_id
+    """)
+    op.execute("""
+        INSERT INTO author_loan_stats (author_id, loan_count)
+        SELECT b.author_id, count(*) FROM loans l JOIN books b ON b.id = l.book_id
+        WHERE b.author_id IS NOT NULL GROUP BY b.author_id
+    """)
+    op.execute("""
+        INSERT INTO genre_loan_stats (genre, loan_count)
+        SELECT b.genre, count(*) FROM loans l JOIN books b ON b.id = l.book_id
+        WHERE b.genre IS NOT NULL GROUP BY b.genre
+    """)
+    op.execute("""
+        INSERT INTO reader_genre_stats (reader_id, genre, loan_count)
+        SELECT l.reader_id, b.genre, count(*) FROM loans l JOIN books b ON b.id = l.book_id
+        WHERE b.genre IS NOT NULL AND l.reader_id IS NOT NULL GROUP BY l.reader_id, b.genre
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("reader_genre_stats")
+    op.drop_table("genre_loan_stats")
+    op.drop_index("ix_author_loan_stats_loan_count", table_name="author_loan_stats")
+    op.drop_table("author_loan_stats")
+    op.drop_table("reader_loan_stats")
@@ -0,0 +1,40 @@
+"""daily loan rollups and loan_date index
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "daily_loan_stats",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("author_id", sa.Integer(), primary_key=True),
+        sa.Column("genre", sa.String(), primary_key=True),
+        sa.Column("loan_count", sa.Integer(), nullable=False),
+    )
+
+    # Начальное заполнение по существующим займам
+    op.execute("""
+        INSERT INTO daily_loan_stats (day, author_id, genre, loan_count)
+        SELECT l.loan_date, b.author_id, b.genre, count(*) FROM loans l JOIN books b ON b.id = l.book_id
+        WHERE l.loan_date IS NOT NULL AND b.author_id IS NOT NULL AND b.genre IS NOT NULL
+        GROUP BY l.loan_date, b.author_id, b.genre
+    """)
+
+    with op.get_context().autocommit_block():
+        op.create_index("ix_loans_loan_date", "loans", ["loan_date"], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_loans_loan_date", table_name="loans", postgresql_concurrently=True)
+    op.drop_table("daily_loan_stats")
@@ -0,0 +1,32 @@
+"""indexes for loan archival and history over archived loans
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+RETURNED_LOAN = sa.text("return_date IS NOT NULL")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index("ix_loans_returned", "loans", ["return_date"],
+                        postgresql_where=RETURNED_LOAN, sqlite_where=RETURNED_LOAN, postgresql_concurrently=True)
+        op.create_index("ix_archived_loans_book_id", "archived_loans", ["book_id"], postgresql_concurrently=True)
+        op.create_index("ix_archived_loans_reader_id", "archived_loans", ["reader_id"], postgresql_concurrently=True)
+        op.create_index("ix_archived_loans_loan_date", "archived_loans", ["loan_date"], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_archived_loans_loan_date", table_name="archived_loans", postgresql_concurrently=True)
+        op.drop_index("ix_archived_loans_reader_id", table_name="archived_loans", postgresql_concurrently=True)
+        op.drop_index("ix_archived_loans_book_id", table_name="archived_loans", postgresql_concurrently=True)
+        op.drop_index("ix_loans_returned", table_name="loans", postgresql_concurrently=True)
@@ -0,0 +1,26 @@
+"""partial index for overdue loan scans
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+OPEN_LOAN = sa.text("return_date IS NULL")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index("ix_loans_overdue", "loans", ["expected_return_date", "id"],
+                        postgresql_where=OPEN_LOAN, sqlite_where=OPEN_LOAN, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_loans_overdue", table_name="loans", postgresql_concurrently=True)
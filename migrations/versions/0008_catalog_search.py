@@ -0,0 +1,77 @@
+"""full-text search vector and trigram indexes for the catalog
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+# Конфигурация 'simple' должна совпадать с TS_CONFIG в app/services/search.py
+BOOK_SEARCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION books_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce((SELECT name FROM authors WHERE id = NEW.author_id), '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(NEW.genre, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+# Переименование автора пересчитывает векторы его книг через триггер books
+AUTHOR_SEARCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION authors_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE books SET author_id = author_id WHERE author_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column("books", sa.Column("search_vector", TSVECTOR(), nullable=True))
+    op.execute(BOOK_SEARCH_FUNCTION)
+    op.execute("""
+        CREATE TRIGGER books_search_vector
+        BEFORE INSERT OR UPDATE OF title, genre, author_id ON books
+        FOR EACH ROW EXECUTE FUNCTION books_search_vector_update()
+    """)
+    op.execute(AUTHOR_SEARCH_FUNCTION)
+    op.execute("""
+        CREATE TRIGGER authors_search_vector
+        AFTER UPDATE OF name ON authors
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION authors_search_vector_update()
+    """)
+    # Заполнение существующих книг через тот же триггер
+    op.execute("UPDATE books SET title = title")
+
+    with op.get_context().autocommit_block():
+        op.create_index("ix_books_search_vector", "books", ["search_vector"],
+                        postgresql_using="gin", postgresql_concurrently=True)
+        op.create_index("ix_books_title_trgm", "books", ["title"], postgresql_using="gin",
+                        postgresql_ops={"title": "gin_trgm_ops"}, postgresql_concurrently=True)
+        op.create_index("ix_authors_name_trgm", "authors", ["name"], postgresql_using="gin",
+                        postgresql_ops={"name": "gin_trgm_ops"}, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_authors_name_trgm", table_name="authors", postgresql_concurrently=True)
+        op.drop_index("ix_books_title_trgm", table_name="books", postgresql_concurrently=True)
+        op.drop_index("ix_books_search_vector", table_name="books", postgresql_concurrently=True)
+    op.execute("DROP TRIGGER IF EXISTS authors_search_vector ON authors")
+    op.execute("DROP FUNCTION IF EXISTS authors_search_vector_update()")
+    op.execute("DROP TRIGGER IF EXISTS books_search_vector ON books")
+    op.execute("DROP FUNCTION IF EXISTS books_search_vector_update()")
+    op.drop_column("books", "search_vector")
@@ -0,0 +1,53 @@
+"""copy counts per book and hold queue
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+WAITING = sa.text("fulfilled_at IS NULL")
+
+
+def upgrade() -> None:
+    # Столбцы с константным DEFAULT добавляются без перезаписи таблицы
+    op.add_column("books", sa.Column("total_copies", sa.Integer(), nullable=False, server_default="1"))
+    op.add_column("books", sa.Column("available_copies", sa.Integer(), nullable=False, server_default="1"))
+    op.execute("UPDATE books SET available_copies = 0 WHERE NOT is_available")
+    # NOT VALID + VALIDATE: проверка существующих строк без блокировки записи
+    op.execute(
+        "ALTER TABLE books ADD CONSTRAINT ck_books_copies "
+        "CHECK (available_copies >= 0 AND available_copies <= total_copies) NOT VALID"
+    )
+    op.execute("ALTER TABLE books VALIDATE CONSTRAINT ck_books_copies")
+
+    op.create_table(
+        "holds",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("book_id", sa.Integer(), sa.ForeignKey("books.id"), nullable=False),
+        sa.Column("reader_id", sa.Integer(), sa.ForeignKey("readers.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("fulfilled_at", sa.DateTime(), nullable=True),
+        sa.Column("loan_id", sa.Integer(), nullable=True),
+    )
+    op.create_index("ix_holds_reader_id", "holds", ["reader_id"])
+    op.create_index("ix_holds_waiting", "holds", ["book_id", "id"],
+                    postgresql_where=WAITING, sqlite_where=WAITING)
+    op.create_index("ux_holds_waiting_reader", "holds", ["book_id", "reader_id"], unique=True,
+                    postgresql_where=WAITING, sqlite_where=WAITING)
+
+
+def downgrade() -> None:
+    op.drop_index("ux_holds_waiting_reader", table_name="holds")
+    op.drop_index("ix_holds_waiting", table_name="holds")
+    op.drop_index("ix_holds_reader_id", table_name="holds")
+    op.drop_table("holds")
+    op.drop_constraint("ck_books_copies", "books", type_="check")
+    op.drop_column("books", "available_copies")
+    op.drop_column("books", "total_copies")
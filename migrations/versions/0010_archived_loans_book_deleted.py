@@ -0,0 +1,27 @@
+"""explicit deleted-book flag on archived loans
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("archived_loans", sa.Column("book_deleted", sa.Boolean(), nullable=False,
+                                              server_default=sa.false()))
+    # До миграции удаление книги определялось по отсутствию её id в books
+    op.execute("""
+        UPDATE archived_loans SET book_deleted = true
+        WHERE NOT EXISTS (SELECT 1 FROM books WHERE books.id = archived_loans.book_id)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column("archived_loans", "book_deleted")